@@ -1,5 +1,7 @@
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from jose import jwt, JWTError
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
@@ -7,6 +9,13 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from database import SessionLocal, get_db 
 from models import User
 from sqlalchemy.future import select
+from sqlalchemy.orm import make_transient_to_detached
+from user_cache import user_cache
+from config import settings
+import asyncio
+import math
+import threading
+import time
 
 SECRET_KEY = "asdAODam"
 ALGORITHM = "HS256"
@@ -22,6 +31,56 @@ def hash_password(password: str) -> str:
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
+# bcrypt is deliberately slow (hundreds of ms) and releases the GIL, so it runs on a
+# small dedicated pool instead of blocking the event loop or starving run_in_executor(None).
+_password_pool = ThreadPoolExecutor(max_workers=settings.password_hash_workers, thread_name_prefix="bcrypt")
+
+async def hash_password_async(password: str) -> str:
+    return await asyncio.get_running_loop().run_in_executor(_password_pool, hash_password, password)
+
+async def verify_password_async(plain_password, hashed_password) -> bool:
+    return await asyncio.get_running_loop().run_in_executor(_password_pool, verify_password, plain_password, hashed_password)
+
+class LoginRateLimiter:
+    """
+    Sliding-window limit on login attempts per username, checked before any bcrypt work,
+    so a burst against one account cannot tie up the password pool.
+    """
+
+    def __init__(self, max_attempts: int, window: float, max_usernames: int = 100000):
+        self.max_attempts = max_attempts
+        self.window = window
+        self.max_usernames = max_usernames
+        self._attempts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def check(self, username: str):
+        """Record an attempt, raising 429 if the username is over its limit."""
+        now = time.monotonic()
+        with self._lock:
+            attempts = self._attempts.get(username)
+            if attempts is None:
+                attempts = self._attempts[username] = deque()
+            self._attempts.move_to_end(username)
+            while attempts and attempts[0] <= now - self.window:
+                attempts.popleft()
+            if len(attempts) >= self.max_attempts:
+                retry_after = math.ceil(attempts[0] + self.window - now)
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Too many login attempts, try again later",
+                    headers={"Retry-After": str(retry_after)},
+                )
+            attempts.append(now)
+            while len(self._attempts) > self.max_usernames:
+                self._attempts.popitem(last=False)
+
+    def reset(self, username: str):
+        with self._lock:
+            self._attempts.pop(username, None)
+
+login_limiter = LoginRateLimiter(settings.login_attempts_per_window, settings.login_attempt_window)
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
@@ -39,21 +98,37 @@ async def get_user_by_username(db: AsyncSession, username: str):
     return result.scalars().first()
 
 async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
+    return await get_user_from_token(db, token)
+
+async def get_user_from_token(db: AsyncSession, token: str):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        if payload.get("type") != "access":
-            raise credentials_exception
-        username: str = payload.get("sub")
-        if username is None:
+    payload = user_cache.get_token(token)
+    if payload is None:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
             raise credentials_exception
-    except JWTError:
+        user_cache.set_token(token, payload)
+    if payload.get("type") != "access":
         raise credentials_exception
+    username: str = payload.get("sub")
+    if username is None:
+        raise credentials_exception
+
+    snapshot = user_cache.get_user(username)
+    if snapshot is not None:
+        # Attach a copy of the cached row to this request's session without a SELECT,
+        # so handlers can still modify and commit the user as usual.
+        user = User(**snapshot)
+        make_transient_to_detached(user)
+        return await db.merge(user, load=False)
+
     user = await get_user_by_username(db, username)
     if user is None:
         raise credentials_exception
-    return user
\ No newline at end of file
+    user_cache.set_user(user)
+    return user
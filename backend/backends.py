@@ -0,0 +1,148 @@
+import logging
+import os
+import threading
+from config import settings
+from metrics import observe_tokens, span
+
+logger = logging.getLogger(__name__)
+
+class InferenceBackend:
+    """
+    Turns batches of texts into summaries for summarize_batch.
+    Subclasses load a seq2seq model and tokenizer in load(); the tokenizer is also used
+    for length checks and chunking, so every backend must provide a Hugging Face tokenizer.
+    """
+    name = None
+
+    def __init__(self, model_name: str, max_input_tokens: int = 512):
+        self.model_name = model_name
+        self.max_input_tokens = max_input_tokens
+        self.model = None
+        self.tokenizer = None
+
+    def load(self):
+        raise NotImplementedError
+
+    def _tokenize(self, texts: list[str]):
+        return self.tokenizer(
+            texts,
+            return_tensors="pt",
+            max_length=self.max_input_tokens,
+            truncation=True,
+            padding=True,
+        )
+
+    def _generate_ids(self, inputs, generate_kwargs: dict):
+        return self.model.generate(
+            inputs["input_ids"],
+            attention_mask=inputs["attention_mask"],
+            **generate_kwargs
+        )
+
+    def generate(self, texts: list[str], generate_kwargs: dict, timings: dict = None) -> list[str]:
+        """
+        Summarize a batch of texts. When given, timings collects the tokenize, generate and
+        decode times of the batch and the tokens_in and tokens_out of each text.
+        """
+        timings = {} if timings is None else timings
+        with span("tokenize", timings):
+            inputs = self._tokenize(texts)
+        with span("generate", timings):
+            summary_ids = self._generate_ids(inputs, generate_kwargs)
+        with span("decode", timings):
+            summaries = self.tokenizer.batch_decode(summary_ids, skip_special_tokens=True)
+        timings["tokens_in"] = inputs["attention_mask"].sum(dim=1).tolist()
+        timings["tokens_out"] = (summary_ids != self.tokenizer.pad_token_id).sum(dim=1).tolist()
+        observe_tokens(timings["tokens_in"], timings["tokens_out"])
+        return summaries
+
+    def generate_stream(self, text: str, generate_kwargs: dict):
+        """
+        Yield the summary of one text in decoded pieces while generate runs on a helper thread.
+        Pieces only arrive early with greedy or sampled decoding; beam search finishes first.
+        """
+        from transformers import TextIteratorStreamer
+        streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True)
+        inputs = self._tokenize([text])
+        errors = []
+
+        def run():
+            try:
+                self._generate_ids(inputs, {**generate_kwargs, "streamer": streamer})
+            except Exception as e:
+                errors.append(e)
+                streamer.end()
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        yield from streamer
+        thread.join()
+        if errors:
+            raise errors[0]
+
+class TorchBackend(InferenceBackend):
+    """fp32 PyTorch BART, the original implementation."""
+    name = "torch"
+
+    def load(self):
+        from transformers import BartForConditionalGeneration, BartTokenizer
+        self.model = BartForConditionalGeneration.from_pretrained(self.model_name).eval()
+        self.tokenizer = BartTokenizer.from_pretrained(self.model_name)
+
+    def _generate_ids(self, inputs, generate_kwargs: dict):
+        # Entered on the generating thread, which for streaming is not the caller's.
+        import torch
+        with torch.inference_mode():
+            return super()._generate_ids(inputs, generate_kwargs)
+
+class QuantizedTorchBackend(TorchBackend):
+    """
+    PyTorch BART with every nn.Linear dynamically quantized to int8. Weights are stored
+    as int8 and activations are quantized on the fly, which speeds up CPU matmuls and
+    roughly quarters the size of the linear layers.
+    """
+    name = "torch-int8"
+
+    def load(self):
+        import torch
+        super().load()
+        self.model = torch.ao.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+
+class OnnxBackend(InferenceBackend):
+    """
+    BART exported to ONNX and run with ONNX Runtime through optimum.
+    The exported graph is saved under onnx_dir so the export only happens once.
+    """
+    name = "onnx"
+
+    def __init__(self, model_name: str, max_input_tokens: int = 512, onnx_dir: str = None):
+        super().__init__(model_name, max_input_tokens)
+        self.onnx_dir = onnx_dir or settings.onnx_model_dir
+
+    def load(self):
+        try:
+            from optimum.onnxruntime import ORTModelForSeq2SeqLM
+        except ImportError:
+            raise RuntimeError("The onnx inference backend requires optimum[onnxruntime] (pip install optimum[onnxruntime])")
+        from transformers import AutoTokenizer
+
+        export_path = os.path.join(self.onnx_dir, self.model_name.replace("/", "__"))
+        if os.path.isdir(export_path):
+            self.model = ORTModelForSeq2SeqLM.from_pretrained(export_path)
+        else:
+            logger.info(f"Exporting {self.model_name} to ONNX at {export_path}")
+            self.model = ORTModelForSeq2SeqLM.from_pretrained(self.model_name, export=True)
+            self.model.save_pretrained(export_path)
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+
+BACKENDS = {backend.name: backend for backend in (TorchBackend, QuantizedTorchBackend, OnnxBackend)}
+
+def create_backend(kind: str, model_name: str, **kwargs) -> InferenceBackend:
+    """
+    Instantiate and load the backend registered under kind.
+    """
+    if kind not in BACKENDS:
+        raise ValueError(f"Unknown inference backend {kind!r}, expected one of {sorted(BACKENDS)}")
+    backend = BACKENDS[kind](model_name, **kwargs)
+    backend.load()
+    return backend
@@ -0,0 +1,56 @@
+"""
+Startup time and memory of the API import path.
+
+Each run imports main in a fresh interpreter and reports wall time and peak RSS.
+--eager-model additionally loads the summarization model right after import, which
+is what every API process paid before the model was loaded lazily in the worker.
+
+    cd backend
+    python -m benchmarks.bench_api_import --runs 5
+    python -m benchmarks.bench_api_import --runs 5 --eager-model
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+import main
+if {eager}:
+    import utils
+    utils.load_backend()
+elapsed = time.perf_counter() - start
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{"seconds": elapsed, "max_rss_mb": rss_kb / 1024, "torch_loaded": "torch" in sys.modules}}))
+"""
+
+
+def measure(eager: bool) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE.format(eager=eager)],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--eager-model", action="store_true", help="also load the model at import (pre-change behaviour)")
+    args = parser.parse_args()
+
+    samples = [measure(args.eager_model) for _ in range(args.runs)]
+    seconds = [s["seconds"] for s in samples]
+    rss = [s["max_rss_mb"] for s in samples]
+    label = "import main + load_backend()" if args.eager_model else "import main"
+    print(label)
+    print(f"  import time: median {statistics.median(seconds):.3f}s  min {min(seconds):.3f}s  max {max(seconds):.3f}s")
+    print(f"  peak RSS:    median {statistics.median(rss):.1f} MB")
+    print(f"  torch imported: {samples[-1]['torch_loaded']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Database work per authenticated request, with and without the user cache.
+
+Runs the API in-process against a throwaway SQLite database, signs up one user and
+replays --requests polls of GET /credits and GET /jobs/my, the requests the frontend
+sends on a timer. Reports SQL statements per request and latency for each cache TTL.
+
+    cd backend
+    python -m benchmarks.bench_auth_cache --requests 500
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+
+async def run(requests: int, ttls: list[float]) -> dict:
+    import httpx
+    import main
+    from database import count_queries
+    from user_cache import user_cache
+
+    await main.on_startup()
+    transport = httpx.ASGITransport(app=main.app)
+    results = {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.post("/auth/signup", json={"username": "bench", "email": "bench@example.com", "password": "bench-password"})
+        response = await client.post("/auth/token", json={"username": "bench", "password": "bench-password"})
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        for ttl in ttls:
+            user_cache.ttl = ttl
+            user_cache.clear()
+            samples = []
+            with count_queries() as stats:
+                for i in range(requests):
+                    path = "/credits" if i % 2 else "/jobs/my"
+                    start = time.perf_counter()
+                    response = await client.get(path, headers=headers)
+                    samples.append(time.perf_counter() - start)
+                    response.raise_for_status()
+            results[ttl] = {"queries": stats["queries"] / requests, "samples": samples, "cache": user_cache.stats()}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--ttls", type=float, nargs="+", default=[0, 5])
+    args = parser.parse_args()
+
+    # The API's database, summary cache and event broker all stay inside a temp directory.
+    os.chdir(tempfile.mkdtemp())
+    os.environ.setdefault("EVENT_BROKER", "memory")
+    import logging
+    logging.disable(logging.WARNING)
+    from database import engine
+    engine.echo = False
+
+    results = asyncio.run(run(args.requests, args.ttls))
+    print(f"{args.requests} authenticated requests, alternating GET /credits and GET /jobs/my")
+    for ttl, result in results.items():
+        samples = result["samples"]
+        label = f"ttl {ttl:g}s" if ttl else "no cache"
+        print(f"  {label:>10}: {result['queries']:.2f} queries/request  "
+              f"median {statistics.median(samples) * 1000:6.2f} ms  "
+              f"user hit rate {result['cache']['users']['hit_rate']:.1%}  "
+              f"token hit rate {result['cache']['tokens']['hit_rate']:.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Latency/throughput comparison of the CPU inference backends.
+
+Loads each backend in turn, summarizes the same documents in batches and reports load
+time, median batch latency, documents per second and agreement with the fp32 torch
+output (unigram F1). The onnx backend needs optimum[onnxruntime].
+
+    cd backend
+    python -m benchmarks.bench_backends --backends torch torch-int8 onnx --docs 32 --batch-size 8
+"""
+import argparse
+import statistics
+import time
+
+from benchmarks.bench_batching import make_documents
+
+
+def unigram_f1(a: str, b: str) -> float:
+    a_words, b_words = a.lower().split(), b.lower().split()
+    common = sum(min(a_words.count(w), b_words.count(w)) for w in set(a_words))
+    if not common:
+        return 0.0
+    precision, recall = common / len(a_words), common / len(b_words)
+    return 2 * precision * recall / (precision + recall)
+
+
+def run(kinds: list[str], model_name: str, docs: list[str], batch_size: int, profile_name: str) -> list[dict]:
+    from backends import create_backend
+    from models import GenerationProfile
+    from profiles import generation_kwargs
+
+    kwargs = generation_kwargs(GenerationProfile(profile_name))
+    reference = None
+    results = []
+    for kind in kinds:
+        start = time.perf_counter()
+        backend = create_backend(kind, model_name)
+        load_seconds = time.perf_counter() - start
+
+        backend.generate(docs[:1], kwargs)
+        outputs, latencies = [], []
+        for i in range(0, len(docs), batch_size):
+            start = time.perf_counter()
+            outputs += backend.generate(docs[i:i + batch_size], kwargs)
+            latencies.append(time.perf_counter() - start)
+
+        if reference is None:
+            reference = outputs
+        results.append({
+            "backend": kind,
+            "load_s": load_seconds,
+            "batch_p50_ms": statistics.median(latencies) * 1000,
+            "docs_per_second": len(docs) / sum(latencies),
+            "agreement": statistics.mean(unigram_f1(a, b) for a, b in zip(reference, outputs)),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=["torch", "torch-int8"])
+    parser.add_argument("--model", default="sshleifer/distilbart-cnn-6-6")
+    parser.add_argument("--docs", type=int, default=32)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--profile", default="balanced", choices=["fast", "balanced", "quality"])
+    args = parser.parse_args()
+
+    results = run(args.backends, args.model, make_documents(args.docs, seed=2), args.batch_size, args.profile)
+    print(f"{'backend':>11} {'load s':>7} {'batch p50 ms':>13} {'docs/s':>7} {'vs first':>9}")
+    for r in results:
+        print(f"{r['backend']:>11} {r['load_s']:>7.1f} {r['batch_p50_ms']:>13.1f} {r['docs_per_second']:>7.2f} {r['agreement']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Submitting many documents: one POST /jobs/submit per document vs one POST /jobs/batch.
+
+Runs the API in-process against a throwaway SQLite database and submits --jobs documents
+each way, reporting wall time, SQL statements and commits. Celery publishing is replaced
+with a no-op so the numbers do not depend on a running Redis; with a broker, the single
+submits additionally pay one publish each while the batch sends one group.
+
+    cd backend
+    python -m benchmarks.bench_batch_submit --jobs 1000
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+
+async def run(jobs: int) -> dict:
+    import httpx
+    import celery_config
+    import main
+    from database import count_queries
+
+    celery_config.enqueue_jobs = lambda jobs: None
+    await main.on_startup()
+    transport = httpx.ASGITransport(app=main.app)
+    documents = [{"input_text": f"Document {i}. " * 50, "profile": "fast"} for i in range(jobs)]
+    results = {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        await client.post("/auth/signup", json={"username": "bench", "email": "bench@example.com", "password": "bench-password"})
+        response = await client.post("/auth/token", json={"username": "bench", "password": "bench-password"})
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        await client.post("/credits/add", json={"credits": jobs * 4 * 3}, headers=headers)
+
+        async def singles():
+            for document in documents:
+                (await client.post("/jobs/submit", json=document, headers=headers)).raise_for_status()
+
+        async def batch():
+            (await client.post("/jobs/batch", json={"jobs": documents}, headers=headers)).raise_for_status()
+
+        async def ndjson():
+            body = "".join(json.dumps(document) + "\n" for document in documents)
+            (await client.post("/jobs/batch/ndjson", content=body, headers=headers)).raise_for_status()
+
+        for label, submit in ((f"{jobs} x /jobs/submit", singles), ("1 x /jobs/batch", batch), ("1 x /jobs/batch/ndjson", ndjson)):
+            with count_queries() as stats:
+                start = time.perf_counter()
+                await submit()
+                elapsed = time.perf_counter() - start
+            results[label] = {"seconds": elapsed, **stats}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=1000)
+    args = parser.parse_args()
+
+    # The API's database, summary cache and event broker all stay inside a temp directory.
+    os.chdir(tempfile.mkdtemp())
+    os.environ.setdefault("EVENT_BROKER", "memory")
+    import logging
+    logging.disable(logging.WARNING)
+
+    results = asyncio.run(run(args.jobs))
+    print(f"submitting {args.jobs} documents")
+    for label, result in results.items():
+        print(f"  {label:>24}: {result['seconds']:7.2f} s  {args.jobs / result['seconds']:8.0f} jobs/s  "
+              f"{result['queries']:6d} queries  {result['commits']:5d} commits")
+
+
+if __name__ == "__main__":
+    main()
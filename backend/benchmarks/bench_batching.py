@@ -0,0 +1,81 @@
+"""
+Throughput of batched summarization on CPU.
+
+Runs summarize_batch over the same set of documents at batch sizes 1, 4, 8 and 16
+and reports documents per second for each. Uses the small distilbart model by default.
+
+    cd backend
+    python -m benchmarks.bench_batching --docs 32
+"""
+import argparse
+import os
+import random
+import time
+
+os.environ.setdefault("SUMMARY_MODEL_NAME", "sshleifer/distilbart-cnn-6-6")
+# Every batch size reruns the same documents, so cached summaries would skip the model.
+os.environ["SUMMARY_CACHE_ENABLED"] = "false"
+
+WORDS = (
+    "the council approved a new budget for public transport after months of debate "
+    "residents raised concerns about rising costs while officials promised better service "
+    "engineers expect the upgraded network to reduce travel times across the city "
+    "critics argue the plan relies on optimistic ridership forecasts and federal grants"
+).split()
+
+
+def make_documents(count: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    docs = []
+    for _ in range(count):
+        sentences = []
+        for _ in range(rng.randint(8, 20)):
+            sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(10, 25)))
+            sentences.append(sentence.capitalize() + ".")
+        docs.append(" ".join(sentences))
+    return docs
+
+
+def run(batch_sizes: list[int], docs: list[str]) -> list[dict]:
+    import torch
+    from utils import summarize_batch
+
+    # Warm-up so the first measured batch does not pay for lazy initialisation.
+    summarize_batch(docs[:1])
+
+    results = []
+    for batch_size in batch_sizes:
+        start = time.perf_counter()
+        with torch.inference_mode():
+            for i in range(0, len(docs), batch_size):
+                summarize_batch(docs[i:i + batch_size])
+        elapsed = time.perf_counter() - start
+        results.append({
+            "batch_size": batch_size,
+            "docs": len(docs),
+            "seconds": elapsed,
+            "docs_per_second": len(docs) / elapsed,
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=32, help="number of documents to summarize per batch size")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--threads", type=int, default=None, help="torch intra-op threads")
+    args = parser.parse_args()
+
+    if args.threads:
+        import torch
+        torch.set_num_threads(args.threads)
+
+    results = run(args.batch_sizes, make_documents(args.docs))
+    baseline = results[0]["docs_per_second"]
+    print(f"{'batch':>6} {'docs':>6} {'seconds':>9} {'docs/s':>8} {'speedup':>8}")
+    for r in results:
+        print(f"{r['batch_size']:>6} {r['docs']:>6} {r['seconds']:>9.2f} {r['docs_per_second']:>8.2f} {r['docs_per_second'] / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Model work and job latency on a high-duplicate workload, with job coalescing off and on.
+
+--jobs documents are submitted through the API at --rate jobs/s by --users users, each
+picked at random from only --distinct different texts, so most jobs repeat one that is
+queued or running. Jobs run on the real worker code with the in-process stand-ins of
+bench_load (--workers jobs at a time, --model-ms per generate call plus --per-text-ms per
+text). The summary cache is disabled so that only coalescing removes repeated work. Each
+mode runs in its own process on a fresh SQLite database in a temp directory.
+
+Reports the texts the model generated, jobs/s until the last job finished, submit-to-finish
+latency and how many jobs were coalesced within a batch or onto a job already running.
+
+    cd backend
+    python -m benchmarks.bench_coalescing --jobs 400 --distinct 20 --rate 100
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.bench_load import WORDS, InProcessWorkers, percentile, stand_in_summarizer
+
+
+async def _submit_all(args, workers):
+    import httpx
+    import main
+
+    rng = random.Random(args.seed)
+    texts = [" ".join(rng.choice(WORDS) for _ in range(args.words)) for _ in range(args.distinct)]
+    submitted = {}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench") as client:
+        headers = []
+        for n in range(args.users):
+            credentials = {"username": f"bench{n}", "password": "bench-password"}
+            await client.post("/auth/signup", json={**credentials, "email": f"bench{n}@example.com"})
+            token = (await client.post("/auth/token", json=credentials)).json()["access_token"]
+            headers.append({"Authorization": f"Bearer {token}"})
+            await client.post("/credits/add", json={"credits": 10 ** 6}, headers=headers[-1])
+
+        start = time.perf_counter()
+        for i in range(args.jobs):
+            await asyncio.sleep(max(0.0, start + i / args.rate - time.perf_counter()))
+            response = await client.post(
+                "/jobs/submit", json={"input_text": rng.choice(texts), "profile": args.profile}, headers=rng.choice(headers)
+            )
+            submitted[response.json()["id"]] = time.perf_counter()
+    await workers.drain(args.drain_timeout)
+    await main.on_shutdown()
+    return start, submitted
+
+
+async def _bench(args) -> dict:
+    import celery_config
+    import main
+    from sqlalchemy import select
+    from database import SessionLocal
+    from models import Job, JobStatus
+
+    generated = {"calls": 0, "texts": 0}
+    summarize = stand_in_summarizer(args.model_ms, args.per_text_ms)
+
+    def counting_summarizer(texts, profile=None, timings=None, looked_up=()):
+        generated["calls"] += 1
+        generated["texts"] += len(texts)
+        return summarize(texts, profile, timings)
+
+    finished = {}
+    finish_job = celery_config.finish_job
+
+    async def timed_finish_job(db, job, *args, **kwargs):
+        result = await finish_job(db, job, *args, **kwargs)
+        finished[job.id] = time.perf_counter()
+        return result
+
+    workers = InProcessWorkers(args.workers)
+    celery_config.enqueue_jobs = workers.enqueue
+    celery_config.summarize_batch = counting_summarizer
+    celery_config.finish_job = timed_finish_job
+    await main.on_startup()
+
+    start, submitted = await _submit_all(args, workers)
+    async with SessionLocal() as db:
+        jobs = (await db.execute(select(Job.status, Job.timings))).all()
+    timings = [row.timings or {} for row in jobs]
+    latencies = [finished[job_id] - submitted[job_id] for job_id in submitted if job_id in finished]
+    return {
+        "seconds": max(finished.values(), default=start) - start,
+        "completed": sum(row.status == JobStatus.COMPLETED for row in jobs),
+        "texts_generated": generated["texts"],
+        "model_calls": generated["calls"],
+        "coalesced_batch": sum(t.get("coalesced") == "batch" for t in timings),
+        "coalesced_running": sum(t.get("coalesced") == "running" for t in timings),
+        "p50_s": percentile(latencies, 0.50),
+        "p99_s": percentile(latencies, 0.99),
+    }
+
+
+def _run(coalescing: bool, args, results):
+    os.chdir(tempfile.mkdtemp())
+    os.environ["EVENT_BROKER"] = "memory"
+    os.environ["SUMMARY_CACHE_ENABLED"] = "false"
+    os.environ["JOB_COALESCING_ENABLED"] = str(coalescing).lower()
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    results.put(asyncio.run(_bench(args)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=400)
+    parser.add_argument("--distinct", type=int, default=20, help="different texts among the submitted jobs")
+    parser.add_argument("--rate", type=float, default=100.0, help="jobs submitted per second")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--profile", default="fast")
+    parser.add_argument("--words", type=int, default=200, help="words per document")
+    parser.add_argument("--workers", type=int, default=4, help="jobs processed at once")
+    parser.add_argument("--model-ms", type=float, default=200.0)
+    parser.add_argument("--per-text-ms", type=float, default=20.0)
+    parser.add_argument("--drain-timeout", type=float, default=300.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    print(f"{args.jobs} {args.profile} jobs of {args.distinct} distinct texts at {args.rate:g}/s, {args.workers} workers, "
+          f"{args.model_ms:g} ms + {args.per_text_ms:g} ms/text per generate call")
+    for coalescing in (False, True):
+        results = ctx.Queue()
+        process = ctx.Process(target=_run, args=(coalescing, args, results))
+        process.start()
+        result = results.get()
+        process.join()
+        print(f"  coalescing {'on ' if coalescing else 'off'}: {result['texts_generated']:5d} texts generated in {result['model_calls']:4d} calls  "
+              f"{result['completed'] / result['seconds']:6.1f} jobs/s  latency p50 {result['p50_s']:6.2f} s  p99 {result['p99_s']:6.2f} s  "
+              f"coalesced {result['coalesced_batch']} in batch, {result['coalesced_running']} onto running jobs  ({result['completed']} completed)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Nightly credit reset over a large user table.
+
+Seeds a throwaway SQLite database with --users users (about two thirds of them below the
+reset amount) and times crud.reset_credits. The previous per-user loop (load every User,
+one create_notification commit and refresh each) is timed on --legacy-users users and
+extrapolated, since running it on a million rows takes hours.
+
+    cd backend
+    python -m benchmarks.bench_credit_reset --users 1000000 --legacy-users 2000
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+
+async def seed(users: int):
+    from sqlalchemy import insert
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+    from sqlalchemy.orm import sessionmaker
+    from database import Base
+    from models import User
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    Session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with Session() as db:
+        for start in range(0, users, 50000):
+            await db.execute(insert(User), [
+                {"username": f"user{i}", "email": f"user{i}@example.com", "hashed_password": "x", "credits": 100 if i % 3 == 0 else i % 100}
+                for i in range(start, min(users, start + 50000))
+            ])
+        await db.commit()
+    return engine, Session
+
+
+async def set_based(users: int, chunk_size: int) -> tuple:
+    from crud import reset_credits
+
+    engine, Session = await seed(users)
+    async with Session() as db:
+        start = time.perf_counter()
+        reset = await reset_credits(db, 100, "Your credits have been reset to 100!", chunk_size=chunk_size)
+        elapsed = time.perf_counter() - start
+    await engine.dispose()
+    return reset, elapsed
+
+
+async def per_user(users: int) -> tuple:
+    from sqlalchemy.future import select
+    from crud import create_notification
+    from models import User
+
+    engine, Session = await seed(users)
+    async with Session() as db:
+        start = time.perf_counter()
+        reset = 0
+        for user in (await db.execute(select(User))).scalars().all():
+            if user.credits != 100:
+                user.credits = 100
+                await create_notification(db, user, "Your credits have been reset to 100!", "info")
+                reset += 1
+        await db.commit()
+        elapsed = time.perf_counter() - start
+    await engine.dispose()
+    return reset, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--legacy-users", type=int, default=2000)
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    reset, elapsed = asyncio.run(per_user(args.legacy_users))
+    per_row = elapsed / max(reset, 1)
+    print(f"per-user loop, {args.legacy_users} users: {reset} reset in {elapsed:.2f} s "
+          f"({per_row * 1000:.2f} ms/user, ~{per_row * reset * args.users / args.legacy_users / 60:.0f} min for {args.users})")
+
+    reset, elapsed = asyncio.run(set_based(args.users, args.chunk_size))
+    print(f"set-based, {args.users} users, chunks of {args.chunk_size}: {reset} reset in {elapsed:.2f} s "
+          f"({reset / elapsed:,.0f} users/s)")
+
+
+if __name__ == "__main__":
+    main()
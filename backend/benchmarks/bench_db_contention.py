@@ -0,0 +1,157 @@
+"""
+Job submissions per second while workers write completions to the same database.
+
+For each configuration, one "API" process submits jobs (create_job plus the submission
+notification, as POST /jobs/submit does) from --concurrency concurrent tasks, while
+--workers processes claim pending jobs and write completions (status, credits and a
+notification in one transaction). Everything runs for --seconds against a fresh SQLite
+file. "default" reproduces the old connection setup (rollback journal, synchronous=full,
+no mmap); "tuned" uses the WAL settings from config.py.
+
+    cd backend
+    python -m benchmarks.bench_db_contention --seconds 10 --workers 2
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import time
+from datetime import datetime
+
+CONFIGS = {
+    "default": {"SQLITE_JOURNAL_MODE": "delete", "SQLITE_SYNCHRONOUS": "full", "SQLITE_BUSY_TIMEOUT_MS": "5000", "SQLITE_MMAP_SIZE": "0"},
+    "tuned": {},
+}
+
+
+def _setup(env: dict):
+    os.environ.update(env)
+    from database import Base, SessionLocal, engine
+    from models import User
+
+    async def setup():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with SessionLocal() as db:
+            db.add(User(username="bench", email="bench@example.com", hashed_password="x", credits=10 ** 9))
+            await db.commit()
+        await engine.dispose()
+
+    asyncio.run(setup())
+
+
+def _submitter(env: dict, start_at: float, deadline: float, concurrency: int, results):
+    os.environ.update(env)
+    from sqlalchemy.exc import OperationalError
+    from crud import create_job, create_notification
+    from database import SessionLocal, engine
+    from models import User
+
+    async def submit_loop(counts):
+        while time.time() < deadline:
+            start = time.perf_counter()
+            try:
+                async with SessionLocal() as db:
+                    user = await db.get(User, 1)
+                    job = await create_job(db, user, "benchmark text " * 20, commit=False)
+                    # Stand in for the scheduler so the workers below can claim the job.
+                    job.dispatched_at = datetime.utcnow()
+                    await db.commit()
+                    await create_notification(db, user, "Job submitted", "job_submitted")
+                counts["submitted"] += 1
+                counts["latency"].append(time.perf_counter() - start)
+            except OperationalError:
+                counts["errors"] += 1
+
+    async def run():
+        counts = {"submitted": 0, "errors": 0, "latency": []}
+        await asyncio.sleep(max(0.0, start_at - time.time()))
+        await asyncio.gather(*(submit_loop(counts) for _ in range(concurrency)))
+        await engine.dispose()
+        return counts
+
+    results.put(("submitter", asyncio.run(run())))
+
+
+def _worker(env: dict, start_at: float, deadline: float, results):
+    os.environ.update(env)
+    from sqlalchemy.exc import OperationalError
+    from crud import claim_pending_jobs, create_notification, deduct_credits, update_job_status
+    from database import SessionLocal, engine
+    from models import GenerationProfile, JobStatus, User
+
+    async def run():
+        counts = {"completed": 0, "errors": 0}
+        await asyncio.sleep(max(0.0, start_at - time.time()))
+        async with SessionLocal() as db:
+            while time.time() < deadline:
+                try:
+                    jobs = await claim_pending_jobs(db, GenerationProfile.QUALITY, limit=1, worker_id=f"bench:{os.getpid()}")
+                    if not jobs:
+                        await asyncio.sleep(0.01)
+                        continue
+                    job = jobs[0]
+                    user = await db.get(User, job.user_id)
+                    await update_job_status(db, job.id, JobStatus.COMPLETED, "summary", commit=False)
+                    await deduct_credits(db, user, 10, commit=False)
+                    await create_notification(db, user, "Job completed", "job_completed", commit=False)
+                    await db.commit()
+                    counts["completed"] += 1
+                except OperationalError:
+                    await db.rollback()
+                    counts["errors"] += 1
+        await engine.dispose()
+        return counts
+
+    results.put(("worker", asyncio.run(run())))
+
+
+def run_config(label: str, seconds: float, workers: int, concurrency: int) -> dict:
+    path = os.path.join(tempfile.mkdtemp(), f"{label}.db")
+    env = {**CONFIGS[label], "DATABASE_URL": f"sqlite+aiosqlite:///{path}", "EVENT_BROKER": "memory"}
+    ctx = multiprocessing.get_context("spawn")
+    setup = ctx.Process(target=_setup, args=(env,))
+    setup.start()
+    setup.join()
+
+    results = ctx.Queue()
+    start_at = time.time() + 3  # leave the children time to import before the clock starts
+    deadline = start_at + seconds
+    processes = [ctx.Process(target=_submitter, args=(env, start_at, deadline, concurrency, results))]
+    processes += [ctx.Process(target=_worker, args=(env, start_at, deadline, results)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    collected = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    submitter = next(counts for role, counts in collected if role == "submitter")
+    completed = sum(counts["completed"] for role, counts in collected if role == "worker")
+    worker_errors = sum(counts["errors"] for role, counts in collected if role == "worker")
+    latency = sorted(submitter["latency"]) or [0.0]
+    return {
+        "submissions_per_s": submitter["submitted"] / seconds,
+        "completions_per_s": completed / seconds,
+        "submit_p99_ms": latency[min(len(latency) - 1, int(0.99 * len(latency)))] * 1000,
+        "errors": submitter["errors"] + worker_errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    print(f"{args.seconds:g}s, 1 submitting process x {args.concurrency} tasks, {args.workers} completing workers")
+    for label in CONFIGS:
+        result = run_config(label, args.seconds, args.workers, args.concurrency)
+        print(f"  {label:>8}: {result['submissions_per_s']:7.1f} submissions/s  "
+              f"{result['completions_per_s']:7.1f} completions/s  "
+              f"submit p99 {result['submit_p99_ms']:7.1f} ms  {result['errors']} lock errors")
+
+
+if __name__ == "__main__":
+    main()
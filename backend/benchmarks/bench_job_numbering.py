@@ -0,0 +1,84 @@
+"""
+Cost of numbering a new job for a user who already has many jobs.
+
+Seeds a throwaway SQLite database with one user owning --existing jobs, then times
+--submits job creations with the previous approach (load every job row and len())
+and with the per-user counter stored on User.
+
+    cd backend
+    python -m benchmarks.bench_job_numbering --existing 100000 --submits 200
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+
+async def run(existing: int, submits: int) -> dict:
+    from sqlalchemy import insert, select
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+    from sqlalchemy.orm import sessionmaker
+    from database import Base
+    from models import Job, JobStatus, User
+    from crud import create_job
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    Session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    async with Session() as db:
+        user = User(username="heavy", email="heavy@example.com", hashed_password="x", credits=100, job_count=existing)
+        db.add(user)
+        await db.commit()
+        rows = [
+            {"user_id": user.id, "user_job_number": n + 1, "input_text": "seed", "status": JobStatus.COMPLETED}
+            for n in range(existing)
+        ]
+        for i in range(0, len(rows), 10000):
+            await db.execute(insert(Job), rows[i:i + 10000])
+        await db.commit()
+
+        async def scan_and_create():
+            result = await db.execute(select(Job).where(Job.user_id == user.id))
+            number = len(result.scalars().all()) + 1
+            job = Job(user_id=user.id, input_text="new", status=JobStatus.PENDING, user_job_number=number)
+            db.add(job)
+            await db.commit()
+            db.expunge_all()
+
+        async def counter_create():
+            await create_job(db, user, "new")
+            db.expunge_all()
+
+        timings = {}
+        for label, submit in (("scan + len()", scan_and_create), ("counter column", counter_create)):
+            samples = []
+            for _ in range(submits):
+                start = time.perf_counter()
+                await submit()
+                samples.append(time.perf_counter() - start)
+            timings[label] = samples
+
+    await engine.dispose()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--existing", type=int, default=100_000)
+    parser.add_argument("--submits", type=int, default=200)
+    args = parser.parse_args()
+
+    timings = asyncio.run(run(args.existing, args.submits))
+    print(f"user with {args.existing} existing jobs, {args.submits} submits each")
+    for label, samples in timings.items():
+        print(f"  {label:>15}: median {statistics.median(samples) * 1000:8.2f} ms  "
+              f"total {sum(samples):7.2f} s  ({len(samples) / sum(samples):8.1f} submits/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""
+End-to-end load test of the API, offline, with in-process stand-ins for Redis and the model.
+
+--users virtual users each sign up, log in and then, for --duration seconds, pick actions
+from --mix (weights for submit, poll and login; a poll reads either the job list or one of
+the user's jobs). Requests go straight to main.app over httpx's ASGI transport. Instead of
+publishing to Celery, submitted jobs run the real worker code (celery_config.process_job:
+claim, batch, settle, notify) as tasks on the same event loop, at most --workers at a time,
+when the API's outbox dispatcher publishes them.
+Summaries come from a stand-in that sleeps --model-ms per batch plus --per-text-ms per text.
+Events use the in-memory broker and the database is a fresh SQLite file in a temp directory.
+
+Reports requests/s, p50/p95/p99 latency and SQL statements per request for each endpoint,
+and how the jobs fared. Results are saved as JSON tagged with the git commit; pass an earlier
+file to --compare to see the change.
+
+    cd backend
+    python -m benchmarks.bench_load --users 20 --duration 30 --mix submit=1,poll=4,login=0.1
+    python -m benchmarks.bench_load --compare benchmarks/results/load-1a2b3c4d-20250101-120000.json
+"""
+import argparse
+import asyncio
+import contextvars
+import json
+import os
+import random
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+PROFILES = ("fast", "balanced", "quality")
+WORDS = "the council budget transport plan approved service airport critics estimate grant city tram bus line".split()
+
+
+def percentile(samples: list[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else None
+
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for part in text.split(","):
+        action, weight = part.split("=")
+        if action not in ("submit", "poll", "login"):
+            raise argparse.ArgumentTypeError(f"Unknown action {action!r}, expected submit, poll or login")
+        mix[action] = float(weight)
+    return mix
+
+
+def git_commit() -> dict:
+    def git(*args):
+        result = subprocess.run(["git", *args], capture_output=True, text=True, cwd=os.path.dirname(RESULTS_DIR))
+        return result.stdout.strip() if result.returncode == 0 else None
+    status = git("status", "--porcelain")
+    return {"commit": git("rev-parse", "HEAD"), "dirty": bool(status) if status is not None else None}
+
+
+class InProcessWorkers:
+    """Stands in for Celery: runs each enqueued job's process_job as a task on the running loop."""
+
+    def __init__(self, concurrency: int):
+        self.loop = asyncio.get_running_loop()
+        self.slots = asyncio.Semaphore(concurrency)
+        self.tasks = set()
+
+    def enqueue(self, jobs):
+        # The outbox publishes from a worker thread, as it would to Redis.
+        for job in jobs:
+            self.loop.call_soon_threadsafe(self.start, job.id)
+
+    def start(self, job_id: int):
+        # A fresh context, so worker queries do not count towards the request that dispatched the job.
+        task = self.loop.create_task(self.run(job_id), context=contextvars.Context())
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def run(self, job_id: int):
+        import celery_config
+        async with self.slots:
+            await celery_config.process_job(job_id)
+
+    async def drain(self, timeout: float):
+        """Wait until the outbox is empty and every published job has run."""
+        from sqlalchemy import func, select
+        from database import SessionLocal
+        from models import JobDispatch
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            if self.tasks:
+                await asyncio.wait(set(self.tasks), timeout=deadline - time.perf_counter())
+                continue
+            async with SessionLocal() as db:
+                if not (await db.execute(select(func.count(JobDispatch.id)))).scalar():
+                    return
+            await asyncio.sleep(0.05)
+
+
+def stand_in_summarizer(model_ms: float, per_text_ms: float):
+    def summarize_batch(texts, profile=None, timings=None, looked_up=()):
+        time.sleep((model_ms + per_text_ms * len(texts)) / 1000)
+        return [" ".join(text.split()[:20]) for text in texts]
+    return summarize_batch
+
+
+async def timed(stats: dict, endpoint: str, request):
+    from database import count_queries
+    with count_queries() as queries:
+        start = time.perf_counter()
+        response = await request
+        elapsed = time.perf_counter() - start
+    record = stats.setdefault(endpoint, {"latencies": [], "queries": 0, "errors": 0})
+    record["latencies"].append(elapsed)
+    record["queries"] += queries["queries"]
+    if response.status_code >= 400:
+        record["errors"] += 1
+    return response
+
+
+async def virtual_user(client, n: int, args, stats: dict, deadline: float):
+    rng = random.Random(args.seed * 100003 + n)
+    credentials = {"username": f"load{n}", "password": "load-password"}
+    await timed(stats, "signup", client.post("/auth/signup", json={**credentials, "email": f"load{n}@example.com"}))
+
+    async def login():
+        response = await timed(stats, "login", client.post("/auth/token", json=credentials))
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    headers = await login()
+    await timed(stats, "credits", client.post("/credits/add", json={"credits": 10 ** 6}, headers=headers))
+    job_ids = []
+    actions, weights = list(args.mix), list(args.mix.values())
+    while time.perf_counter() < deadline:
+        action = rng.choices(actions, weights)[0]
+        if action == "submit":
+            document = " ".join(rng.choice(WORDS) for _ in range(args.words))
+            response = await timed(stats, "submit", client.post(
+                "/jobs/submit", json={"input_text": document, "profile": rng.choice(PROFILES)}, headers=headers
+            ))
+            if response.status_code == 200:
+                job_ids.append(response.json()["id"])
+        elif action == "poll" and job_ids and rng.random() < 0.5:
+            await timed(stats, "poll_job", client.get(f"/jobs/{rng.choice(job_ids)}", headers=headers))
+        elif action == "poll":
+            await timed(stats, "poll_list", client.get("/jobs/my", headers=headers))
+        else:
+            headers = await login()
+        if args.think_ms:
+            await asyncio.sleep(rng.expovariate(1000 / args.think_ms))
+
+
+async def run(args) -> dict:
+    import httpx
+    import celery_config
+    import main
+    from sqlalchemy import func, select
+    from database import SessionLocal
+    from models import Job, JobStatus
+
+    workers = InProcessWorkers(args.workers)
+    celery_config.enqueue_jobs = workers.enqueue
+    celery_config.summarize_batch = stand_in_summarizer(args.model_ms, args.per_text_ms)
+    await main.on_startup()
+
+    stats = {}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://load", timeout=None) as client:
+        start = time.perf_counter()
+        deadline = start + args.duration
+        await asyncio.gather(*(virtual_user(client, n, args, stats, deadline) for n in range(args.users)))
+        elapsed = time.perf_counter() - start
+    await workers.drain(args.drain_timeout)
+    await main.on_shutdown()
+
+    async with SessionLocal() as db:
+        by_status = dict((await db.execute(select(Job.status, func.count(Job.id)).group_by(Job.status))).all())
+        timings = (await db.execute(select(Job.timings).where(Job.status == JobStatus.COMPLETED))).scalars().all()
+    queue_ms = [t["queue_ms"] for t in timings if t and "queue_ms" in t]
+
+    endpoints = {}
+    for endpoint, record in sorted(stats.items()):
+        latencies = record["latencies"]
+        endpoints[endpoint] = {
+            "requests": len(latencies),
+            "rps": len(latencies) / elapsed,
+            "p50_ms": percentile(latencies, 0.50) * 1000,
+            "p95_ms": percentile(latencies, 0.95) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000,
+            "queries_per_request": record["queries"] / len(latencies),
+            "errors": record["errors"],
+        }
+    requests = sum(endpoint["requests"] for endpoint in endpoints.values())
+    return {
+        **git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "seconds": elapsed,
+        "total": {"requests": requests, "rps": requests / elapsed},
+        "endpoints": endpoints,
+        "jobs": {
+            **{status.value: by_status.get(status, 0) for status in JobStatus},
+            "queue_p50_ms": percentile(queue_ms, 0.50),
+            "queue_p99_ms": percentile(queue_ms, 0.99),
+        },
+    }
+
+
+def report(results: dict, baseline: dict = None):
+    def change(new, old):
+        return f" ({(new - old) / old * 100:+5.1f}%)" if baseline and old else ""
+
+    print(f"{results['total']['requests']} requests in {results['seconds']:.1f} s: {results['total']['rps']:.1f} req/s"
+          f"{change(results['total']['rps'], baseline and baseline['total']['rps'])}")
+    print(f"  {'endpoint':>10} {'requests':>8} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>7} {'errors':>6}")
+    for name, endpoint in results["endpoints"].items():
+        old = (baseline or {}).get("endpoints", {}).get(name, {})
+        print(f"  {name:>10} {endpoint['requests']:8d} {endpoint['rps']:7.1f} {endpoint['p50_ms']:8.1f} {endpoint['p95_ms']:8.1f} "
+              f"{endpoint['p99_ms']:8.1f} {endpoint['queries_per_request']:7.1f} {endpoint['errors']:6d}{change(endpoint['p99_ms'], old.get('p99_ms'))}")
+    jobs = results["jobs"]
+    print(f"  jobs: {jobs['completed']} completed, {jobs['failed']} failed, {jobs['pending'] + jobs['processing']} unfinished; "
+          f"queue wait p50 {jobs['queue_p50_ms'] or 0:.0f} ms, p99 {jobs['queue_p99_ms'] or 0:.0f} ms")
+    if baseline:
+        print(f"  compared with {baseline['commit'] or 'unknown commit'} ({baseline['timestamp']}); percentages are req/s overall and p99 per endpoint")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("submit=1,poll=4,login=0.1"))
+    parser.add_argument("--think-ms", type=float, default=0.0, help="mean pause between a user's requests")
+    parser.add_argument("--words", type=int, default=200, help="words per submitted document")
+    parser.add_argument("--workers", type=int, default=4, help="jobs processed at once")
+    parser.add_argument("--model-ms", type=float, default=200.0)
+    parser.add_argument("--per-text-ms", type=float, default=20.0)
+    parser.add_argument("--drain-timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="results file (default benchmarks/results/load-<commit>-<time>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    output = os.path.abspath(args.output) if args.output else None
+
+    # The API's database and summary cache stay inside a temp directory; everything runs in this process.
+    os.chdir(tempfile.mkdtemp())
+    os.environ["EVENT_BROKER"] = "memory"
+    os.environ["SUMMARY_CACHE_ENABLED"] = "false"
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    results = asyncio.run(run(args))
+    report(results, baseline)
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"load-{(results['commit'] or 'unknown')[:8]}-{datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
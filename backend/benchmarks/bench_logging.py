@@ -0,0 +1,113 @@
+"""
+Worker throughput with the old inline payload logging vs the queued structured logging.
+
+Each mode runs in its own process: --threads worker threads push --jobs documents of
+--chars characters through utils.summarize_batch, with a stand-in backend that takes
+--inference-ms per call. "inline" emulates the old setup: basicConfig text logging,
+written synchronously by the calling thread, plus the input text, raw summary and
+generated summary lines the old code logged for every job. "queued" is
+logging_config.setup_logging: JSON events with ids, sizes and durations, written by a
+background thread. Logs go to a file in a temp directory; reports jobs/s, the time
+callers spent inside logging calls and the bytes logged.
+
+    cd backend
+    python -m benchmarks.bench_logging --jobs 200 --chars 1000000
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+
+class StandInBackend:
+    name = "stand-in"
+    model_name = "stand-in"
+    tokenizer = None
+
+    def __init__(self, inference_ms: float):
+        self.inference_ms = inference_ms
+
+    def generate(self, texts, generate_kwargs, timings=None):
+        time.sleep(self.inference_ms / 1000)
+        return [text[:300] for text in texts]
+
+
+def _run(mode: str, args, log_path: str, results):
+    import logging
+    from config import settings
+    settings.summary_cache_enabled = False
+    settings.summary_max_input_tokens = 10 ** 9
+    sys.stderr = open(log_path, "w")
+    if mode == "inline":
+        logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    else:
+        from logging_config import setup_logging
+        setup_logging()
+    import utils
+    from models import GenerationProfile
+    utils._backend = StandInBackend(args.inference_ms)
+    logger = logging.getLogger("celery_config")
+
+    text = ("The committee met on Tuesday to review the proposal. " * (args.chars // 52 + 1))[:args.chars]
+    logging_seconds = []
+    lock = threading.Lock()
+    job_ids = iter(range(args.jobs))
+
+    def work():
+        spent = 0.0
+        for job_id in job_ids:
+            if mode == "inline":
+                start = time.perf_counter()
+                utils.logger.info(f"Input text: {text}")
+                spent += time.perf_counter() - start
+            (summary,) = utils.summarize_batch([text], GenerationProfile.FAST)
+            start = time.perf_counter()
+            if mode == "inline":
+                utils.logger.info(f"Raw summary: {summary}")
+                logger.info(f"Generated summary for job {job_id}: {summary}")
+            logger.info(f"Job {job_id} finished", extra={"event": "job.finished", "job_id": job_id, "output_chars": len(summary)})
+            spent += time.perf_counter() - start
+        with lock:
+            logging_seconds.append(spent)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=work) for _ in range(args.threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    if mode == "queued":
+        from logging_config import stop_logging
+        stop_logging()
+    sys.stderr.flush()
+    results.put({"seconds": elapsed, "logging_seconds": sum(logging_seconds), "log_bytes": os.path.getsize(log_path)})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=200)
+    parser.add_argument("--chars", type=int, default=1_000_000)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--inference-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    ctx = multiprocessing.get_context("spawn")
+    print(f"{args.jobs} jobs of {args.chars} chars on {args.threads} threads, {args.inference_ms:g} ms inference each")
+    for mode in ("inline", "queued"):
+        results = ctx.Queue()
+        process = ctx.Process(target=_run, args=(mode, args, os.path.join(directory, f"{mode}.log"), results))
+        process.start()
+        result = results.get()
+        process.join()
+        print(f"  {mode:>6}: {args.jobs / result['seconds']:7.1f} jobs/s  "
+              f"{result['logging_seconds'] / args.jobs * 1000:8.3f} ms/job in logging calls  "
+              f"{result['log_bytes'] / args.jobs / 1024:9.1f} KiB logged/job")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Latency of cheap requests while a burst of logins is being verified.
+
+Runs the API in-process against a throwaway SQLite database with --users accounts, then
+fires one concurrent login per account while a prober keeps requesting GET /ping and
+GET /jobs/my. Compares bcrypt run inline on the event loop (the previous behaviour)
+with bcrypt on the password thread pool, reporting p50/p99 probe latency.
+
+    cd backend
+    python -m benchmarks.bench_login_concurrency --users 50
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+
+def percentile(samples: list[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def run(users: int) -> dict:
+    import httpx
+    import auth
+    import crud
+    import main
+
+    await main.on_startup()
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        await asyncio.gather(*(
+            client.post("/auth/signup", json={"username": f"user{i}", "email": f"user{i}@example.com", "password": "bench-password"})
+            for i in range(users)
+        ))
+        response = await client.post("/auth/token", json={"username": "user0", "password": "bench-password"})
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        async def verify_inline(plain_password, hashed_password):
+            return auth.verify_password(plain_password, hashed_password)
+
+        results = {}
+        for label, verify in (("inline", verify_inline), ("thread pool", auth.verify_password_async)):
+            crud.verify_password_async = verify
+            for i in range(users):
+                auth.login_limiter.reset(f"user{i}")
+            probes = {"/ping": [], "/jobs/my": []}
+
+            async def login(i):
+                r = await client.post("/auth/token", json={"username": f"user{i}", "password": "bench-password"})
+                r.raise_for_status()
+
+            async def probe(done: asyncio.Event):
+                while not done.is_set():
+                    for path, samples in probes.items():
+                        start = time.perf_counter()
+                        await client.get(path, headers=headers)
+                        samples.append(time.perf_counter() - start)
+                    await asyncio.sleep(0.005)
+
+            done = asyncio.Event()
+            prober = asyncio.create_task(probe(done))
+            start = time.perf_counter()
+            await asyncio.gather(*(login(i) for i in range(users)))
+            elapsed = time.perf_counter() - start
+            done.set()
+            await prober
+            results[label] = {"elapsed": elapsed, "probes": probes}
+        crud.verify_password_async = auth.verify_password_async
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50)
+    args = parser.parse_args()
+
+    # The API's database, summary cache and event broker all stay inside a temp directory.
+    os.chdir(tempfile.mkdtemp())
+    os.environ.setdefault("EVENT_BROKER", "memory")
+    import logging
+    logging.disable(logging.WARNING)
+    from database import engine
+    engine.echo = False
+    from config import settings
+
+    results = asyncio.run(run(args.users))
+    print(f"{args.users} concurrent logins, password pool of {settings.password_hash_workers} threads")
+    for label, result in results.items():
+        print(f"  {label:>11}: logins done in {result['elapsed']:.2f} s")
+        for path, samples in result["probes"].items():
+            print(f"      {path:>9}: {len(samples):4d} probes  p50 {statistics.median(samples) * 1000:8.2f} ms  "
+                  f"p99 {percentile(samples, 0.99) * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
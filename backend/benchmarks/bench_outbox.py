@@ -0,0 +1,154 @@
+"""
+Submit latency and lost jobs with a slow, briefly unavailable broker: publishing inline in the
+request (the old path) vs the outbox.
+
+--users users submit jobs back to back for --duration seconds through the API, in process.
+Publishing goes to a stand-in broker that takes --broker-ms per publish and refuses every
+publish for --outage seconds starting --outage-at seconds in. "inline" publishes the jobs a
+submission dispatched right after its commit, blocking the event loop like the old
+enqueue_jobs call; a failed publish fails the request with the job already committed.
+"outbox" is the current path: the OutboxDispatcher publishes from a thread and retries.
+No workers run; the scheduler's in-flight limits are lifted so every job is dispatched.
+Each mode runs in its own process on a fresh SQLite database in a temp directory.
+
+Reports submit p50/p99 latency, failed requests, and how many accepted jobs never reached
+the broker once it has been back for up to --drain-timeout seconds.
+
+    cd backend
+    python -m benchmarks.bench_outbox --users 20 --duration 10 --broker-ms 50 --outage-at 3 --outage 3
+"""
+import argparse
+import asyncio
+import contextvars
+import multiprocessing
+import os
+import tempfile
+import time
+
+from benchmarks.bench_load import percentile
+
+
+class StandInBroker:
+    def __init__(self, latency_ms: float, outage_at: float, outage: float):
+        self.latency = latency_ms / 1000
+        self.outage_at = outage_at
+        self.outage = outage
+        self.start = time.perf_counter()
+        self.published = set()
+
+    def publish(self, jobs):
+        time.sleep(self.latency)
+        if 0 <= time.perf_counter() - self.start - self.outage_at < self.outage:
+            raise ConnectionError("broker unavailable")
+        self.published.update(job.id for job in jobs)
+
+
+async def _bench(mode: str, args) -> dict:
+    import httpx
+    import celery_config
+    import main
+    from sqlalchemy import func, select
+    from database import SessionLocal
+    from models import Job, JobDispatch
+
+    broker = StandInBroker(args.broker_ms, args.outage_at, args.outage)
+    celery_config.enqueue_jobs = broker.publish
+    if mode == "inline":
+        dispatched = contextvars.ContextVar("dispatched", default=[])
+        dispatch_pending = main.dispatch_pending
+
+        async def remember_dispatch(db, commit=True):
+            jobs = await dispatch_pending(db, commit)
+            dispatched.set(jobs)
+            return jobs
+
+        class InlineDispatcher:
+            def start(self):
+                pass
+
+            async def stop(self):
+                pass
+
+            def wake(self):
+                broker.publish(dispatched.get())
+
+        main.dispatch_pending = remember_dispatch
+        main.outbox_dispatcher = InlineDispatcher()
+    await main.on_startup()
+
+    latencies, errors = [], 0
+    transport = httpx.ASGITransport(app=main.app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def login(n: int) -> dict:
+            credentials = {"username": f"bench{n}", "password": "bench-password"}
+            await client.post("/auth/signup", json={**credentials, "email": f"bench{n}@example.com"})
+            token = (await client.post("/auth/token", json=credentials)).json()["access_token"]
+            headers = {"Authorization": f"Bearer {token}"}
+            await client.post("/credits/add", json={"credits": 10 ** 6}, headers=headers)
+            return headers
+
+        async def user(headers: dict, deadline: float):
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                response = await client.post("/jobs/submit", json={"input_text": "The council met. " * 20, "profile": "fast"}, headers=headers)
+                latencies.append(time.perf_counter() - start)
+                errors += response.status_code >= 400
+
+        users = await asyncio.gather(*(login(n) for n in range(args.users)))
+        broker.start = time.perf_counter()
+        await asyncio.gather(*(user(headers, broker.start + args.duration) for headers in users))
+
+    deadline = time.perf_counter() + args.drain_timeout
+    async with SessionLocal() as db:
+        while mode == "outbox" and time.perf_counter() < deadline:
+            if not (await db.execute(select(func.count(JobDispatch.id)))).scalar():
+                break
+            await asyncio.sleep(0.1)
+        accepted = (await db.execute(select(Job.id))).scalars().all()
+    await main.on_shutdown()
+    return {
+        "submits": len(latencies),
+        "errors": errors,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "accepted": len(accepted),
+        "lost": len(set(accepted) - broker.published),
+    }
+
+
+def _run(mode: str, args, results):
+    os.chdir(tempfile.mkdtemp())
+    os.environ["EVENT_BROKER"] = "memory"
+    os.environ["SCHEDULER_MAX_IN_FLIGHT"] = str(10 ** 9)
+    os.environ["SCHEDULER_MAX_IN_FLIGHT_PER_USER"] = str(10 ** 9)
+    os.environ["OUTBOX_RETRY_MAX"] = "2"
+    os.environ.setdefault("LOG_LEVEL", "ERROR")
+    results.put(asyncio.run(_bench(mode, args)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--broker-ms", type=float, default=50.0, help="time per publish")
+    parser.add_argument("--outage-at", type=float, default=3.0)
+    parser.add_argument("--outage", type=float, default=3.0, help="seconds the broker refuses publishes (0 for none)")
+    parser.add_argument("--drain-timeout", type=float, default=30.0)
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    print(f"{args.users} users for {args.duration:g} s, broker {args.broker_ms:g} ms per publish, "
+          f"down from {args.outage_at:g} s for {args.outage:g} s")
+    for mode in ("inline", "outbox"):
+        results = ctx.Queue()
+        process = ctx.Process(target=_run, args=(mode, args, results))
+        process.start()
+        result = results.get()
+        process.join()
+        print(f"  {mode:>6}: {result['submits']:5d} submits  p50 {result['p50_ms']:7.1f} ms  p99 {result['p99_ms']:7.1f} ms  "
+              f"{result['errors']:4d} failed  {result['lost']:4d} of {result['accepted']} accepted jobs never published")
+
+
+if __name__ == "__main__":
+    main()
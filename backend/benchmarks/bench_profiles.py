@@ -0,0 +1,67 @@
+"""
+Latency and decoding throughput per generation profile.
+
+For each profile, summarizes the same documents one at a time and reports median and
+p95 latency plus generated tokens per second. The summary cache is bypassed.
+
+    cd backend
+    python -m benchmarks.bench_profiles --docs 20
+"""
+import argparse
+import os
+import statistics
+import time
+
+os.environ.setdefault("SUMMARY_MODEL_NAME", "sshleifer/distilbart-cnn-6-6")
+
+from benchmarks.bench_batching import make_documents
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run(docs: list[str]) -> list[dict]:
+    import torch
+    from models import GenerationProfile
+    from profiles import credit_cost, generation_kwargs
+    from utils import load_backend
+
+    backend = load_backend()
+    model, tokenizer = backend.model, backend.tokenizer
+    results = []
+    for profile in GenerationProfile:
+        kwargs = generation_kwargs(profile)
+        latencies = []
+        tokens_out = 0
+        with torch.inference_mode():
+            model.generate(**tokenizer(docs[:1], return_tensors="pt", truncation=True), **kwargs)
+            for doc in docs:
+                inputs = tokenizer(doc, return_tensors="pt", max_length=512, truncation=True)
+                start = time.perf_counter()
+                ids = model.generate(inputs["input_ids"], attention_mask=inputs["attention_mask"], **kwargs)
+                latencies.append(time.perf_counter() - start)
+                tokens_out += int((ids[0] != tokenizer.pad_token_id).sum())
+        results.append({
+            "profile": profile.value,
+            "credits": credit_cost(profile),
+            "p50_ms": statistics.median(latencies) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "tokens_per_second": tokens_out / sum(latencies),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'profile':>9} {'credits':>8} {'p50 ms':>9} {'p95 ms':>9} {'tok/s':>8}")
+    for r in run(make_documents(args.docs, seed=1)):
+        print(f"{r['profile']:>9} {r['credits']:>8} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['tokens_per_second']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
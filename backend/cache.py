@@ -0,0 +1,218 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+_whitespace = re.compile(r"\s+")
+
+def normalize_text(text: str) -> str:
+    """
+    Canonical form used for cache keys: Unicode NFKC with runs of whitespace collapsed,
+    so resubmissions that only differ in spacing or line breaks share an entry.
+    """
+    return _whitespace.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+def make_cache_key(text: str, model_name: str, params: dict) -> str:
+    payload = json.dumps(
+        {"text": normalize_text(text), "model": model_name, "params": params},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class SummaryCache:
+    """
+    Two-tier summary cache: an in-process LRU in front of a SQLite file shared by all
+    worker processes. The SQLite tier is evicted least-recently-used once it grows past max_bytes;
+    its size is kept as a running total in the counters table, so writes never scan the table.
+    Hit/miss counters and access times are written out every flush_every lookups, not per lookup.
+    """
+
+    def __init__(self, path: str, memory_entries: int = 1024, max_bytes: int = 256 * 1024 * 1024, flush_every: int = 100):
+        self.path = path
+        self.memory_entries = memory_entries
+        self.max_bytes = max_bytes
+        self.flush_every = flush_every
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._unflushed = {"hits": 0, "misses": 0}
+        self._touched = set()
+
+    def _connection(self) -> sqlite3.Connection:
+        # Reopen after fork: a SQLite connection must not be shared across processes.
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS summaries ("
+                "key TEXT PRIMARY KEY, summary TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_summaries_accessed_at ON summaries (accessed_at)")
+            conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.execute("INSERT OR IGNORE INTO counters (name, value) VALUES ('hits', 0), ('misses', 0)")
+            # Files written before the running total existed are measured once.
+            conn.execute("INSERT OR IGNORE INTO counters (name, value) SELECT 'bytes', COALESCE(SUM(size), 0) FROM summaries")
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    def _remember(self, key: str, summary: str):
+        self._memory[key] = summary
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str, count: bool = True):
+        """
+        Return the summary for key, or None. count=False leaves the hit/miss counters alone,
+        for callers re-checking a key whose lookup was already counted.
+        """
+        with self._lock:
+            summary = self._memory.get(key)
+            if summary is not None:
+                self._memory.move_to_end(key)
+                self._touched.add(key)
+                if count:
+                    self.memory_hits += 1
+                    self._unflushed["hits"] += 1
+                self._maybe_flush()
+                return summary
+
+            row = self._connection().execute("SELECT summary FROM summaries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                if count:
+                    self.misses += 1
+                    self._unflushed["misses"] += 1
+                self._maybe_flush()
+                return None
+            self._touched.add(key)
+            if count:
+                self.disk_hits += 1
+                self._unflushed["hits"] += 1
+            self._maybe_flush()
+            self._remember(key, row[0])
+            return row[0]
+
+    def set(self, key: str, summary: str):
+        size = len(summary.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            self._remember(key, summary)
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                replaced = conn.execute("SELECT size FROM summaries WHERE key = ?", (key,)).fetchone()
+                conn.execute(
+                    "INSERT OR REPLACE INTO summaries (key, summary, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                    (key, summary, size, now, now),
+                )
+                total = self._add_bytes(conn, size - (replaced[0] if replaced else 0))
+                if total > self.max_bytes:
+                    self._write_flush(conn)
+                    self._evict(conn, total)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    @staticmethod
+    def _add_bytes(conn: sqlite3.Connection, delta: int) -> int:
+        if delta:
+            conn.execute("UPDATE counters SET value = value + ? WHERE name = 'bytes'", (delta,))
+        return conn.execute("SELECT value FROM counters WHERE name = 'bytes'").fetchone()[0]
+
+    def _evict(self, conn: sqlite3.Connection, total: int):
+        # Runs inside set()'s transaction, only once the running total is over max_bytes.
+        evicted = freed = 0
+        while total - freed > self.max_bytes:
+            rows = conn.execute("SELECT key, size FROM summaries ORDER BY accessed_at LIMIT 100").fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                if total - freed <= self.max_bytes:
+                    break
+                conn.execute("DELETE FROM summaries WHERE key = ?", (key,))
+                self._memory.pop(key, None)
+                freed += size
+                evicted += 1
+        total = self._add_bytes(conn, -freed)
+        logger.info(f"Summary cache evicted {evicted} entries, {total} bytes remain")
+
+    def _maybe_flush(self):
+        if sum(self._unflushed.values()) + len(self._touched) >= self.flush_every:
+            self._flush(self._connection())
+
+    def _flush(self, conn: sqlite3.Connection):
+        # Counters and access times are kept locally and written out in batches, one transaction
+        # per batch, so lookups stay off the shared file's write lock.
+        if not self._touched and not any(self._unflushed.values()):
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._write_flush(conn)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _write_flush(self, conn: sqlite3.Connection):
+        if self._touched:
+            now = time.time()
+            conn.executemany("UPDATE summaries SET accessed_at = ? WHERE key = ?", [(now, key) for key in self._touched])
+            self._touched.clear()
+        for name, value in self._unflushed.items():
+            if value:
+                conn.execute("UPDATE counters SET value = value + ? WHERE name = ?", (value, name))
+                self._unflushed[name] = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            conn = self._connection()
+            self._flush(conn)
+            counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+            entries = conn.execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
+            lookups = counters["hits"] + counters["misses"]
+            return {
+                "hits": counters["hits"],
+                "misses": counters["misses"],
+                "hit_rate": counters["hits"] / lookups if lookups else 0.0,
+                "entries": entries,
+                "size_bytes": counters["bytes"],
+                "max_bytes": self.max_bytes,
+                "process": {
+                    "memory_entries": len(self._memory),
+                    "memory_hits": self.memory_hits,
+                    "disk_hits": self.disk_hits,
+                    "misses": self.misses,
+                },
+            }
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            conn = self._connection()
+            conn.execute("DELETE FROM summaries")
+            conn.execute("UPDATE counters SET value = 0")
+            self._unflushed = {"hits": 0, "misses": 0}
+            self._touched.clear()
+
+summary_cache = SummaryCache(
+    settings.summary_cache_path,
+    memory_entries=settings.summary_cache_memory_entries,
+    max_bytes=settings.summary_cache_max_bytes,
+)
@@ -1,113 +1,440 @@
-from celery import Celery
-from database import get_db
+from celery import Celery, group
+from celery.schedules import crontab
+from celery.signals import setup_logging as celery_setup_logging, worker_process_init, worker_process_shutdown, worker_ready, worker_shutdown
+from database import SessionLocal, engine, count_queries
+from worker_runtime import runtime
+from events import publish_events, job_event, job_token_event, notification_event
 from models import Job, JobStatus, User
-from crud import update_job_status, create_notification, deduct_credits
-from utils import summarize_text
+from crud import (
+    create_notification, settle_credits, refund_credits, claim_jobs, claim_pending_jobs, reset_credits,
+    release_job, renew_leases, requeue_expired_jobs, find_running_duplicate, attach_to_job, get_attached_jobs,
+)
+from utils import SummarizationError, summarize_batch, summarize_stream, cached_summary, load_backend, ordinal
+from config import settings
+from profiles import credit_cost, profile_queue
+from scheduler import dispatch_pending
+from outbox import publish_dispatches
+from retention import apply_retention as retain
+from logging_config import setup_logging
+from metrics import observe_coalesced, observe_queue_wait, span, worker_busy, worker_started, worker_stopped
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
 import asyncio
+import os
+from datetime import datetime
+import socket
+import uuid
+import time
 
 import logging
-logging.basicConfig(level=logging.INFO)
+setup_logging()
 logger = logging.getLogger(__name__)
 
 app = Celery('tasks', broker='redis://localhost:6379/0', backend='redis://localhost:6379/0')
+# Ack a task only once it has run, so a worker dying mid-job leaves the message to be redelivered.
+# Job leases make the redelivery safe; prefetching less keeps fewer tasks stuck behind a dead worker.
+app.conf.task_acks_late = True
+app.conf.task_reject_on_worker_lost = True
+app.conf.worker_prefetch_multiplier = settings.worker_prefetch_multiplier
+app.conf.beat_schedule = {
+    "dispatch-waiting-jobs": {
+        "task": "celery_config.dispatch_waiting_jobs",
+        "schedule": settings.scheduler_interval,
+        "options": {"expires": settings.scheduler_interval},
+    },
+    "reap-expired-jobs": {
+        "task": "celery_config.reap_expired_jobs",
+        "schedule": settings.job_reaper_interval,
+        "options": {"expires": settings.job_reaper_interval},
+    },
+    "reset-user-credits": {
+        "task": "celery_config.reset_user_credits",
+        "schedule": crontab(hour=settings.credit_reset_hour, minute=0),
+    },
+    "apply-retention": {
+        "task": "celery_config.apply_retention",
+        "schedule": crontab(hour=settings.retention_hour, minute=30),
+    },
+}
+
+@celery_setup_logging.connect
+def keep_logging_config(**kwargs):
+    # Connecting here stops Celery from replacing the queued logging set up at import.
+    setup_logging()
+
+@worker_process_init.connect
+def warm_model_in_child(**kwargs):
+    setup_logging(force=True)
+    # Connections pooled by the parent must not be reused across fork.
+    engine.sync_engine.dispose(close=False)
+    # Each prefork child loads its own copy of the model before taking tasks.
+    load_backend()
+    worker_started()
+
+@worker_shutdown.connect
+@worker_process_shutdown.connect
+def stop_runtime(**kwargs):
+    runtime.shutdown()
+    worker_stopped()
+
+@worker_ready.connect
+def warm_model(sender=None, **kwargs):
+    # Solo and thread pools run tasks in the worker process itself and never fire worker_process_init.
+    from celery.concurrency.prefork import TaskPool as PreforkPool
+    if not isinstance(getattr(sender, "pool", None), PreforkPool):
+        load_backend()
+        worker_started()
 
 @app.task
 def process_ai_job(job_id: int):
-    loop = asyncio.new_event_loop()
-    try:
-        asyncio.set_event_loop(loop)
-        return loop.run_until_complete(process_job(job_id))
-    finally:
-        loop.close()
+    with worker_busy():
+        return runtime.run(process_job(job_id))
+
+def enqueue_jobs(jobs):
+    """
+    Send many jobs (anything with id and profile) as one Celery group, published over one
+    connection from Celery's producer pool. Each goes to the queue of its generation profile.
+    Blocking, and fails fast instead of retrying: the outbox retries failed batches.
+    """
+    with app.producer_or_acquire() as producer:
+        return group(
+            process_ai_job.signature((job.id,), queue=profile_queue(job.profile)) for job in jobs
+        ).apply_async(producer=producer, retry=False)
+
+async def publish_dispatched_jobs(db: AsyncSession) -> int:
+    return await publish_dispatches(db, enqueue_jobs)
+
+async def dispatch_jobs(db: AsyncSession):
+    """
+    Hand the scheduler's next fair share of waiting jobs to Celery through the outbox. Called
+    after every finished batch and periodically by beat as a safety net; the API dispatches
+    as part of each submission and publishes from its OutboxDispatcher.
+    """
+    jobs = await dispatch_pending(db)
+    await publish_dispatched_jobs(db)
+    return jobs
+
+@app.task
+def dispatch_waiting_jobs():
+    async def dispatch():
+        async with SessionLocal() as db:
+            return len(await dispatch_jobs(db))
+    return runtime.run(dispatch())
 
 @app.task
-async def reset_user_credits():
-    db_gen = get_db()
-    try:
-        async for db in db_gen:
-            try:
-                logger.info("Resetting user credits to 100")
-                result = await db.execute(select(User))
-                users = result.scalars().all()
-                
-                for user in users:
-                    if user.credits != 100:
-                        user.credits = 100
-                        await create_notification(
-                            db,
-                            user,
-                            "Your credits have been reset to 100!",
-                            "info"
-                        )
-                        logger.info(f"Reset credits for user {user.username} to 100")
-                
-                await db.commit()
-                logger.info("User credits reset completed")
-                return {"status": "success", "message": "User credits reset to 100"}
-            except Exception as e:
-                logger.error(f"Error resetting user credits: {str(e)}")
-                return {"status": "error", "message": str(e)}
-            finally:
-                await db.close()
-    finally:
-        await db_gen.aclose()
-
-async def get_user_job_number(db: AsyncSession, user: User, current_job_id: int) -> int:
-    """
-    Calculate the user-specific job number by counting completed jobs up to the current job_id.
+def reap_expired_jobs():
+    return runtime.run(reap_jobs())
+
+async def reap_jobs():
+    """
+    Recover jobs whose worker died: requeue those with claims left, fail and refund the rest.
+    """
+    async with SessionLocal() as db:
+        requeued, exhausted = await requeue_expired_jobs(db, settings.job_max_attempts)
+        for job in exhausted:
+            user = await db.get(User, job.user_id)
+            if not await release_job(db, job, job.worker_id, JobStatus.FAILED, "Worker lost while processing the job"):
+                await db.rollback()
+                continue
+            balance = await refund_credits(db, user, job)
+            notification = await create_notification(
+                db, user, f"Job {job.id} failed after {job.attempts} attempts. {job.credits_reserved} credits refunded, {balance} remaining.", "error", commit=False
+            )
+            await db.commit()
+            await publish_events(user.id, job_event(job), notification_event(notification))
+        if requeued or exhausted:
+            logger.warning(f"Reaped expired leases: requeued {len(requeued)} jobs, failed {len(exhausted)}")
+        await dispatch_jobs(db)
+        return {"requeued": len(requeued), "failed": len(exhausted)}
+
+@app.task
+def apply_retention():
+    return runtime.run(run_retention())
+
+async def run_retention():
+    """
+    Archive old job texts, prune old read notifications and release free pages, in bounded batches.
+    """
+    start = time.perf_counter()
+    async with SessionLocal() as db:
+        result = await retain(db, engine)
+    logger.info(
+        f"Retention archived {result['jobs_archived']} jobs, pruned {result['notifications_pruned']} notifications, "
+        f"released {result['pages_released']} pages",
+        extra={"event": "retention.applied", **result, "duration_ms": round((time.perf_counter() - start) * 1000, 1)},
+    )
+    return result
+
+@app.task
+def reset_user_credits():
+    return runtime.run(reset_all_credits())
+
+async def reset_all_credits():
+    amount = settings.credit_reset_amount
+    async with SessionLocal() as db:
+        try:
+            logger.info(f"Resetting user credits to {amount}")
+            start = time.perf_counter()
+            reset = await reset_credits(
+                db,
+                amount,
+                f"Your credits have been reset to {amount}, less any held by unfinished jobs!",
+                chunk_size=settings.credit_reset_chunk_size,
+            )
+            logger.info(f"Reset credits for {reset} users in {time.perf_counter() - start:.2f}s")
+            return {"status": "success", "message": f"User credits reset to {amount}", "users": reset}
+        except Exception as e:
+            logger.error(f"Error resetting user credits: {str(e)}")
+            await db.rollback()
+            return {"status": "error", "message": str(e)}
+
+async def get_user_job_number(db: AsyncSession, job: Job) -> int:
+    """
+    The user-specific job number, stored on the job at submission.
+    Jobs created before numbering was stored fall back to an indexed COUNT(*).
     """
+    if job.user_job_number is not None:
+        return job.user_job_number
     result = await db.execute(
-        select(Job)
-        .where(Job.user_id == user.id)
-        .where(Job.id <= current_job_id)
-        .order_by(Job.id)
+        select(func.count(Job.id))
+        .where(Job.user_id == job.user_id)
+        .where(Job.id <= job.id)
     )
-    user_jobs = result.scalars().all()
-    return len(user_jobs)
+    return result.scalar_one()
+
+def worker_identity() -> str:
+    # One per task run: looked up per call so prefork children never inherit their parent's pid, and
+    # suffixed so tasks running side by side in one process (thread pools) never share leases.
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+async def keep_leases(job_ids: list[int], worker_id: str):
+    """
+    Renew worker_id's leases until cancelled, on a session of its own: job_ids and any jobs
+    that attached to them while they run.
+    """
+    while True:
+        await asyncio.sleep(settings.job_lease_seconds / 3)
+        async with SessionLocal() as db:
+            held = await renew_leases(db, worker_id)
+        lost = set(job_ids) - held
+        if lost:
+            logger.warning(f"Worker {worker_id} lost the lease on {len(lost)} of {len(job_ids)} jobs")
+
+async def collect_batch(db: AsyncSession, jobs: list[Job], worker_id: str) -> list[Job]:
+    """
+    Top up a batch with other pending jobs of the same profile until it is full or the max wait has elapsed.
+    """
+    deadline = time.monotonic() + settings.summary_batch_max_wait
+    while len(jobs) < settings.summary_batch_size:
+        jobs += await claim_pending_jobs(
+            db, jobs[0].profile, settings.summary_batch_size - len(jobs), worker_id, [job.id for job in jobs],
+            skip_running_duplicates=settings.job_coalescing_enabled,
+        )
+        remaining = deadline - time.monotonic()
+        if len(jobs) >= settings.summary_batch_size or remaining <= 0:
+            break
+        await asyncio.sleep(min(0.05, remaining))
+    return jobs
+
+def coalesce(jobs: list[Job]) -> list[int]:
+    """
+    For each job, the index of the first job in the list with the same fingerprint (itself if none).
+    """
+    first = {}
+    return [first.setdefault(job.fingerprint or f"job:{job.id}", i) for i, job in enumerate(jobs)]
+
+async def stream_job(job: Job):
+    """
+    Generate a streaming job's summary on a worker thread, publishing each decoded piece to
+    the job's owner as it arrives. Returns the summary and the milliseconds to the first piece.
+    """
+    loop = asyncio.get_running_loop()
+    pieces = asyncio.Queue()
+
+    def produce():
+        try:
+            for piece in summarize_stream(job.input_text, job.profile, looked_up=True):
+                loop.call_soon_threadsafe(pieces.put_nowait, piece)
+        finally:
+            loop.call_soon_threadsafe(pieces.put_nowait, None)
+
+    start = time.perf_counter()
+    producer = loop.run_in_executor(None, produce)
+    text, ttft_ms = "", None
+    while (piece := await pieces.get()) is not None:
+        if ttft_ms is None:
+            ttft_ms = (time.perf_counter() - start) * 1000
+        text += piece
+        await publish_events(job.user_id, job_token_event(job.id, piece, text))
+    await producer
+    if ttft_ms is None:
+        ttft_ms = (time.perf_counter() - start) * 1000
+    return text.strip(), ttft_ms
+
+async def finish_job(db: AsyncSession, job: Job, summary: str | SummarizationError, worker_id: str, timings: dict = None):
+    """
+    Record a job's outcome in a single transaction: status and output, timings, credit
+    settlement (or refund on failure) and notification are committed together. A
+    SummarizationError instead of a summary fails the job and refunds its reservation.
+    Nothing is recorded if worker_id no longer holds the job's lease.
+    """
+    # Read before any rollback, which expires the loaded job.
+    job_id = job.id
+    with count_queries() as stats, span("finish"):
+        user = await db.get(User, job.user_id)
+        if not user:
+            logger.error(f"User not found for job {job.id}")
+            job.status = JobStatus.FAILED
+            job.output_text = "User not found for job"
+            await db.commit()
+            return {"status": "error", "message": "User not found for job", "db": stats}
+
+        try:
+            if isinstance(summary, SummarizationError):
+                raise summary
+            user_job_number = await get_user_job_number(db, job)
+            job.timings = timings
+            if not await release_job(db, job, worker_id, JobStatus.COMPLETED, summary):
+                await db.rollback()
+                logger.warning(f"Job {job_id} lease lost by {worker_id}, not settling")
+                return {"status": "skipped", "message": f"Job {job_id} lease lost", "db": stats}
+            balance = await settle_credits(db, user, job, credit_cost(job.profile))
+            notification = await create_notification(
+                db,
+                user,
+                f"Your {ordinal(user_job_number)} job completed! Credits remaining: {balance}",
+                "success",
+                commit=False
+            )
+            await db.commit()
+            result = {"status": "success", "summary": summary}
+        except IntegrityError:
+            # The ledger allows one settlement per job; another delivery already recorded it.
+            await db.rollback()
+            logger.warning(f"Job {job_id} was already settled, skipping")
+            return {"status": "skipped", "message": f"Job {job_id} already settled", "db": stats}
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {str(e)}")
+            await db.rollback()
+            await db.refresh(user)
+            await db.refresh(job)
+            job.timings = timings
+            if not await release_job(db, job, worker_id, JobStatus.FAILED, str(e)):
+                await db.rollback()
+                return {"status": "skipped", "message": f"Job {job_id} lease lost", "db": stats}
+            balance = await refund_credits(db, user, job)
+            notification = await create_notification(db, user, f"Job {job.id} failed: {str(e)}. {job.credits_reserved} credits refunded, {balance} remaining.", "error", commit=False)
+            await db.commit()
+            result = {"status": "error", "message": str(e)}
+    await publish_events(user.id, job_event(job), notification_event(notification))
+    logger.info(f"Job {job.id} finished", extra={
+        "event": "job.finished",
+        "job_id": job.id,
+        "status": result["status"],
+        "output_chars": len(job.output_text or ""),
+        "queries": stats["queries"],
+        "commits": stats["commits"],
+        "db_ms": stats["db_ms"],
+    })
+    result["db"] = stats
+    return result
 
 async def process_job(job_id: int):
-    db_gen = get_db()
-    try:
-        async for db in db_gen:
-            try:
-                logger.info(f"Processing job {job_id}")
-                await update_job_status(db, job_id, JobStatus.PROCESSING)
-                result = await db.execute(select(Job).where(Job.id == job_id))
-                job = result.scalars().first()
-                if not job:
+    async with SessionLocal() as db:
+        worker_id = worker_identity()
+        batch_timings = {}
+        with count_queries() as claim_stats, span("claim", batch_timings):
+            jobs = await claim_jobs(db, [job_id], worker_id)
+            if not jobs:
+                if not await db.get(Job, job_id):
                     logger.error(f"Job {job_id} not found")
                     return {"status": "error", "message": f"Job {job_id} not found"}
+                logger.info(f"Job {job_id} is finished or leased to another worker", extra={"event": "job.skipped", "job_id": job_id})
+                return {"status": "skipped", "message": f"Job {job_id} already processed or in progress"}
+
+            cached = cached_summary(jobs[0].input_text, jobs[0].profile)
+            leader_id = None
+            if cached is None and settings.job_coalescing_enabled:
+                leader_id = await find_running_duplicate(db, jobs[0])
+            if cached is None and leader_id is None and not jobs[0].stream:
+                jobs = await collect_batch(db, jobs, worker_id)
+        logger.info(f"Claimed {len(jobs)} jobs for job {job_id}", extra={
+            "event": "job.claimed",
+            "job_id": job_id,
+            "job_ids": [job.id for job in jobs],
+            "profile": jobs[0].profile.value,
+            "input_chars": sum(len(job.input_text) for job in jobs),
+            "worker_id": worker_id,
+            "queries": claim_stats["queries"],
+            "commits": claim_stats["commits"],
+            "claim_ms": batch_timings["claim_ms"],
+        })
+        claimed_at = datetime.utcnow()
+        timings = []
+        for job in jobs:
+            queue_wait = (claimed_at - job.created_at).total_seconds()
+            observe_queue_wait(job.profile.value, queue_wait)
+            timings.append({"queue_ms": queue_wait * 1000, "claim_ms": batch_timings["claim_ms"], "batch_size": len(jobs)})
+            await publish_events(job.user_id, job_event(job))
 
-                user_result = await db.execute(select(User).where(User.id == job.user_id))
-                user = user_result.scalars().first()
-                if not user:
-                    logger.error("User not found for job")
-                    return {"status": "error", "message": "User not found for job"}
-
-                try:
-                    summary = summarize_text(job.input_text)
-                    logger.info(f"Generated summary for job {job_id}: {summary}")
-                    # Backup check for extractive summary
-                    input_sentences = set([s.strip() for s in job.input_text.split('. ') if s.strip()])
-                    summary_sentences = set([s.strip() for s in summary.split('. ') if s.strip()])
-                    await update_job_status(db, job_id, JobStatus.COMPLETED, summary)
-                    user_job_number = await get_user_job_number(db, user, job_id)
-                    user = await deduct_credits(db, user, 10)
-                    await create_notification(
-                        db,
-                        user,
-                        f"Your {user_job_number}{'st' if user_job_number == 1 else 'nd' if user_job_number == 2 else 'rd' if user_job_number == 3 else 'th'} job completed! Credits remaining: {user.credits}",
-                        "success"
+        if cached is not None:
+            logger.info(f"Job {job_id} served from the summary cache", extra={"event": "job.cache_hit", "job_id": job_id})
+            result = await finish_job(db, jobs[0], cached, worker_id, {**timings[0], "cache_hit": True})
+            await dispatch_jobs(db)
+            return result
+
+        if leader_id is not None:
+            if await attach_to_job(db, jobs[0], leader_id, worker_id, {**timings[0], "coalesced": "running", "coalesced_with": leader_id}):
+                observe_coalesced(jobs[0].profile.value, "running")
+                logger.info(f"Job {job_id} attached to running job {leader_id}", extra={
+                    "event": "job.coalesced", "job_id": job_id, "leader_id": leader_id,
+                })
+                return {"status": "coalesced", "message": f"Job {job_id} finishes with job {leader_id}"}
+            # The running job finished in the meantime; its summary is usually in the cache now.
+            cached = cached_summary(jobs[0].input_text, jobs[0].profile, count=False)
+            if cached is not None:
+                result = await finish_job(db, jobs[0], cached, worker_id, {**timings[0], "cache_hit": True})
+                await dispatch_jobs(db)
+                return result
+
+        heartbeat = asyncio.create_task(keep_leases([job.id for job in jobs], worker_id))
+        leaders = coalesce(jobs) if settings.job_coalescing_enabled else list(range(len(jobs)))
+        unique = sorted(set(leaders))
+        try:
+            with span("summarize", batch_timings):
+                if jobs[0].stream:
+                    summary, jobs[0].ttft_ms = await stream_job(jobs[0])
+                    summaries = [summary]
+                    timings[0]["ttft_ms"] = jobs[0].ttft_ms
+                    logger.info(f"Job {job_id} streamed", extra={"event": "job.streamed", "job_id": job_id, "ttft_ms": jobs[0].ttft_ms})
+                else:
+                    # Duplicates within the batch are generated once and share the summary. jobs[0] (always
+                    # unique[0]) already missed the cache above and is not looked up again.
+                    generated = await asyncio.to_thread(
+                        summarize_batch, [jobs[i].input_text for i in unique], jobs[0].profile, [timings[i] for i in unique], looked_up={0}
                     )
-                    return {"status": "success", "summary": summary}
-                except Exception as e:
-                    logger.error(f"Job {job_id} failed: {str(e)}")
-                    await update_job_status(db, job_id, JobStatus.FAILED, str(e))
-                    await create_notification(db, user, f"Job {job_id} failed: {str(e)}", "error")
-                    return {"status": "error", "message": str(e)}
-            finally:
-                await db.close()
-    finally:
-        await db_gen.aclose()
\ No newline at end of file
+                    summaries = [generated[unique.index(i)] for i in leaders]
+        except Exception as e:
+            logger.error(f"Batch for job {job_id} failed: {str(e)}")
+            summaries = [SummarizationError(str(e))] * len(jobs)
+        finally:
+            heartbeat.cancel()
+
+        if len(unique) < len(jobs):
+            observe_coalesced(jobs[0].profile.value, "batch", len(jobs) - len(unique))
+        results = {}
+        for i, (job, summary, job_timings) in enumerate(zip(jobs, summaries, timings)):
+            job_timings["summarize_ms"] = batch_timings.get("summarize_ms")
+            if leaders[i] != i:
+                job_timings.update(coalesced="batch", coalesced_with=jobs[leaders[i]].id)
+            results[job.id] = await finish_job(db, job, summary, worker_id, job_timings)
+        # Jobs that attached to this batch while it ran finish from the same summaries. Jobs can attach
+        # to any of them until it is finished, so sweep again until a sweep finds none.
+        summaries_by_fingerprint = {job.fingerprint: summary for job, summary in zip(jobs, summaries) if job.fingerprint}
+        while attached := await get_attached_jobs(db, list(summaries_by_fingerprint), worker_id, list(results)):
+            for job in attached:
+                results[job.id] = await finish_job(db, job, summaries_by_fingerprint[job.fingerprint], worker_id, job.timings)
+        await dispatch_jobs(db)
+        return results[job_id]
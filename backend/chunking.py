@@ -0,0 +1,55 @@
+import re
+from collections import deque
+from typing import Callable, Iterator
+
+_boundary = re.compile(r"[.!?]+[\"')\]]*\s+")
+
+def iter_sentences(text: str) -> Iterator[str]:
+    """
+    Lazily split text on sentence-ending punctuation, yielding stripped, non-empty sentences.
+    """
+    start = 0
+    for match in _boundary.finditer(text):
+        sentence = " ".join(text[start:match.end()].split())
+        start = match.end()
+        if sentence:
+            yield sentence
+    sentence = " ".join(text[start:].split())
+    if sentence:
+        yield sentence
+
+def iter_chunks(
+    text: str,
+    count_tokens: Callable[[str], int],
+    max_tokens: int,
+    overlap_sentences: int = 1,
+) -> Iterator[str]:
+    """
+    Yield overlapping windows of whole sentences, each at most max_tokens long.
+
+    Consecutive windows share their last/first overlap_sentences sentences so context is not
+    lost at the boundaries. A single sentence longer than max_tokens is yielded on its own and
+    left to the tokenizer to truncate. Only the current window is held in memory.
+    """
+    window = deque()
+    window_tokens = 0
+    fresh = 0  # sentences in the window that were not carried over from the previous chunk
+
+    for sentence in iter_sentences(text):
+        tokens = count_tokens(sentence)
+        if window and window_tokens + tokens > max_tokens:
+            if fresh:
+                yield " ".join(s for s, _ in window)
+            carried = list(window)[-overlap_sentences:] if overlap_sentences else []
+            window = deque(carried)
+            window_tokens = sum(t for _, t in window)
+            fresh = 0
+            while window and window_tokens + tokens > max_tokens:
+                _, dropped = window.popleft()
+                window_tokens -= dropped
+        window.append((sentence, tokens))
+        window_tokens += tokens
+        fresh += 1
+
+    if fresh:
+        yield " ".join(s for s, _ in window)
@@ -0,0 +1,115 @@
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class Settings(BaseSettings):
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+    # Database. Pool settings apply to file and server databases (not sqlite :memory:).
+    database_url: str = "sqlite+aiosqlite:///./app.db"
+    database_echo: bool = False
+    database_pool_size: int = 5
+    database_max_overflow: int = 10
+    database_pool_timeout: float = 30.0
+    # Applied on every new SQLite connection. WAL lets readers run alongside the single writer,
+    # and synchronous=normal is durable under WAL except for the last commits on power loss.
+    sqlite_journal_mode: str = "wal"
+    sqlite_synchronous: str = "normal"
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    # Lets retention hand free pages back in bounded steps; only takes effect on a new database.
+    sqlite_auto_vacuum: str = "incremental"
+
+    # Summarization model
+    summary_model_name: str = "facebook/bart-large-cnn"
+    summary_fallback_model_name: str = "sshleifer/distilbart-cnn-6-6"
+    # Inference backend: torch (fp32), torch-int8 (dynamic quantization) or onnx (ONNX Runtime)
+    inference_backend: str = "torch"
+    onnx_model_dir: str = "./onnx_models"
+    # Longer inputs are split into overlapping sentence windows and summarized map-reduce style.
+    summary_max_input_tokens: int = 512
+    summary_chunk_overlap_sentences: int = 1
+
+    # Batched inference: a worker waits up to summary_batch_max_wait seconds
+    # for up to summary_batch_size pending jobs before running one generate call.
+    summary_batch_size: int = 8
+    summary_batch_max_wait: float = 0.5
+    # Coalescing: jobs with the same text and profile as one already in the batch or running on a
+    # live worker finish from its summary instead of running the model again.
+    job_coalescing_enabled: bool = True
+
+    # Summary cache: in-process LRU in front of a SQLite file shared by the workers.
+    summary_cache_enabled: bool = True
+    summary_cache_path: str = "./summary_cache.db"
+    summary_cache_memory_entries: int = 1024
+    summary_cache_max_bytes: int = 256 * 1024 * 1024
+
+    # bcrypt runs in a thread pool of this many workers, off the API event loop
+    password_hash_workers: int = 4
+    # Login attempts allowed per username per login_attempt_window seconds; a success resets the count
+    login_attempts_per_window: int = 5
+    login_attempt_window: float = 60.0
+
+    # Fair-share scheduler: at most scheduler_max_in_flight jobs are handed to Celery at a time
+    # (queued or running), and at most scheduler_max_in_flight_per_user of them per user.
+    # With scheduler_lend_idle_slots, slots nobody under the cap is waiting for go to capped users
+    # instead of sitting idle, so the cap only binds while other users have work queued.
+    # The fast/balanced/quality lanes share slots 4:2:1; GET /queue/stats shows lane depths and waits.
+    scheduler_max_in_flight: int = 32
+    scheduler_max_in_flight_per_user: int = 4
+    scheduler_lend_idle_slots: bool = True
+    scheduler_interval: float = 5.0
+    # Dispatch outbox: the scheduler records dispatched jobs in job_dispatches in its own transaction,
+    # and they are published to Celery in batches of outbox_batch_size, off the request path. A failed
+    # publish is retried after outbox_retry_base seconds, doubling up to outbox_retry_max; a publisher
+    # that dies mid-batch leaves its rows to be claimed again after outbox_claim_seconds.
+    outbox_batch_size: int = 500
+    outbox_interval: float = 1.0
+    outbox_retry_base: float = 1.0
+    outbox_retry_max: float = 60.0
+    outbox_claim_seconds: float = 30.0
+
+    # Job leases: a worker holds a claimed job for job_lease_seconds, renewing it while it runs.
+    # The reaper requeues jobs whose lease expired (the worker died), up to job_max_attempts claims.
+    job_lease_seconds: int = 300
+    job_max_attempts: int = 3
+    job_reaper_interval: float = 60.0
+    # Celery acks tasks after they finish (redelivered if the worker dies); prefetch per worker process
+    worker_prefetch_multiplier: int = 4
+
+    # Most jobs accepted by one POST /jobs/batch (JSON or NDJSON) request
+    job_batch_max_size: int = 5000
+
+    # Nightly credit reset (Celery beat, hour in the worker's timezone), done in chunks of users
+    credit_reset_amount: int = 100
+    credit_reset_hour: int = 0
+    credit_reset_chunk_size: int = 10000
+
+    # Authenticated-user cache for get_current_user (seconds; 0 disables it), hit rates at GET /auth/cache/stats
+    auth_user_cache_ttl: float = 5.0
+    auth_user_cache_max_entries: int = 10000
+
+    # Retention (beat, daily at retention_hour): finished jobs older than job_retention_days have
+    # their texts compressed into job_archives, read notifications older than
+    # notification_retention_days are deleted, and up to retention_vacuum_pages free SQLite
+    # pages are released. 0 days disables that step. retention_codec: gzip, or zstd (pip install zstandard).
+    job_retention_days: int = 90
+    notification_retention_days: int = 30
+    retention_batch_size: int = 1000
+    retention_codec: str = "gzip"
+    retention_vacuum_pages: int = 10000
+    retention_hour: int = 3
+
+    # Job/notification events for the /events stream: redis (shared with workers) or memory (tests)
+    event_broker: str = "redis"
+    event_redis_url: str = "redis://localhost:6379/0"
+    # The API publishes submission events in the background and gives up on them after this many seconds
+    event_publish_timeout: float = 2.0
+
+    # Logging: json or text lines on stderr, written by a background thread.
+    # log_sample_rates keeps a fraction of INFO records per event name, e.g. {"job.claimed": 0.1}
+    log_level: str = "INFO"
+    log_format: str = "json"
+    log_sample_rates: dict[str, float] = {}
+
+
+settings = Settings()
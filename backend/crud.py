@@ -1,12 +1,22 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from models import User, Job, Notification, JobStatus
-from auth import hash_password, verify_password
+from sqlalchemy import update, insert, func, or_, and_, literal, case
+from sqlalchemy.orm import aliased
+from sqlalchemy.orm.attributes import set_committed_value
+from models import User, Job, Notification, JobStatus, GenerationProfile, CreditTransaction, CreditTransactionKind
+from auth import hash_password_async, verify_password_async
+from user_cache import user_cache
 from fastapi import HTTPException, status
+from datetime import datetime, timedelta
+from config import settings
+from profiles import job_fingerprint
+import base64
 import logging
 
 logger = logging.getLogger(__name__)
 
+PREVIEW_LENGTH = 100
+
 async def create_user(db: AsyncSession, username: str, email: str, password: str):
     result = await db.execute(select(User).where(User.username == username))
     if result.scalars().first():
@@ -16,9 +26,11 @@ async def create_user(db: AsyncSession, username: str, email: str, password: str
     if result.scalars().first():
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already exists")
 
-    hashed_password = hash_password(password)
+    hashed_password = await hash_password_async(password)
     user = User(username=username, email=email, hashed_password=hashed_password, credits=100)
     db.add(user)
+    await db.flush()
+    db.add(CreditTransaction(user_id=user.id, kind=CreditTransactionKind.GRANT, amount=100, balance_after=100))
     await db.commit()
     await db.refresh(user)
     return user
@@ -26,56 +38,495 @@ async def create_user(db: AsyncSession, username: str, email: str, password: str
 async def authenticate_user(db: AsyncSession, username: str, password: str):
     result = await db.execute(select(User).where(User.username == username))
     user = result.scalars().first()
-    if not user or not verify_password(password, user.hashed_password):
+    if not user or not await verify_password_async(password, user.hashed_password):
         return None
     return user
 
+async def change_credits(
+    db: AsyncSession,
+    user: User,
+    amount: int,
+    kind: CreditTransactionKind,
+    job: Job = None,
+    require_funds: bool = False,
+):
+    """
+    Add amount (negative to take credits) to the user's balance with a single atomic
+    UPDATE ... RETURNING and append the matching ledger row, in the caller's transaction.
+    With require_funds the update only applies while credits >= -amount, and None is
+    returned instead of a balance when the user cannot afford it.
+    """
+    query = (
+        update(User)
+        .where(User.id == user.id)
+        .values(credits=User.credits + amount)
+        .returning(User.credits)
+        .execution_options(synchronize_session=False)
+    )
+    if require_funds:
+        query = query.where(User.credits >= -amount)
+    balance = (await db.execute(query)).scalar_one_or_none()
+    if balance is None:
+        return None
+    db.add(CreditTransaction(
+        user_id=user.id,
+        job_id=job.id if job is not None else None,
+        kind=kind,
+        amount=amount,
+        balance_after=balance,
+    ))
+    # Mirror the new balance on the loaded object without marking it dirty, so a later
+    # flush can never write a stale read-modify-write value back.
+    set_committed_value(user, "credits", balance)
+    user_cache.invalidate(user)
+    return balance
+
 async def add_credits(db: AsyncSession, user: User, credits: int):
-    user.credits += credits
+    await change_credits(db, user, credits, CreditTransactionKind.GRANT)
     await db.commit()
-    await db.refresh(user)
     return user
 
-async def deduct_credits(db: AsyncSession, user: User, amount: int):
-    user.credits -= amount
-    await db.commit()
-    await db.refresh(user)
-    logger.info(f"Deducted {amount} credits from user {user.id}. New balance: {user.credits}")
+async def deduct_credits(db: AsyncSession, user: User, amount: int, commit: bool = True):
+    """
+    Take amount credits outside of a job reservation. Returns None if the balance is too low.
+    """
+    balance = await change_credits(db, user, -amount, CreditTransactionKind.DEBIT, require_funds=True)
+    if balance is None:
+        return None
+    if commit:
+        await db.commit()
+    logger.info(f"Deducted {amount} credits from user {user.id}. New balance: {balance}")
     return user
 
-async def create_job(db: AsyncSession, user: User, input_text: str):
-    job = Job(user_id=user.id, input_text=input_text, status=JobStatus.PENDING)
+async def reserve_credits(db: AsyncSession, user: User, job: Job, amount: int):
+    """
+    Hold a job's cost at submission. Returns the remaining balance, or None if the user
+    cannot afford it, in which case nothing is changed.
+    """
+    balance = await change_credits(db, user, -amount, CreditTransactionKind.RESERVE, job, require_funds=True)
+    if balance is not None:
+        job.credits_reserved = amount
+    return balance
+
+async def settle_credits(db: AsyncSession, user: User, job: Job, cost: int):
+    """
+    Finalize a completed job's charge at cost. The reservation already took the credits, so
+    only the difference is returned (or taken, for jobs submitted before reservations).
+    """
+    balance = await change_credits(db, user, job.credits_reserved - cost, CreditTransactionKind.SETTLE, job)
+    logger.info(f"Settled {cost} credits for job {job.id} of user {user.id}. New balance: {balance}")
+    return balance
+
+async def refund_credits(db: AsyncSession, user: User, job: Job):
+    """
+    Give back a failed job's reservation.
+    """
+    balance = await change_credits(db, user, job.credits_reserved, CreditTransactionKind.REFUND, job)
+    logger.info(f"Refunded {job.credits_reserved} credits for job {job.id} to user {user.id}. New balance: {balance}")
+    return balance
+
+async def next_user_job_number(db: AsyncSession, user: User) -> int:
+    """
+    Atomically increment and return the user's job counter, in the caller's transaction.
+    """
+    result = await db.execute(
+        update(User)
+        .where(User.id == user.id)
+        .values(job_count=User.job_count + 1)
+        .returning(User.job_count)
+    )
+    return result.scalar_one()
+
+async def create_job(db: AsyncSession, user: User, input_text: str, profile: GenerationProfile = GenerationProfile.QUALITY, commit: bool = True, stream: bool = False):
+    user_job_number = await next_user_job_number(db, user)
+    job = Job(user_id=user.id, user_job_number=user_job_number, input_text=input_text, status=JobStatus.PENDING, profile=profile, stream=stream, fingerprint=job_fingerprint(input_text, profile))
     db.add(job)
-    await db.commit()
-    await db.refresh(job)
+    if commit:
+        await db.commit()
+        await db.refresh(job)
+    else:
+        await db.flush()
     return job
 
-async def update_job_status(db: AsyncSession, job_id: int, status: JobStatus, output_text: str = None):
-    result = await db.execute(select(Job).where(Job.id == job_id))
-    job = result.scalars().first()
+async def create_jobs(db: AsyncSession, user: User, jobs: list[tuple[str, GenerationProfile]], costs: list[int]):
+    """
+    Insert many jobs for a user in the caller's transaction. The total cost is reserved once,
+    one UPDATE takes a block of job numbers and one multi-row INSERT ... RETURNING creates the
+    jobs, each holding its own cost in credits_reserved so it settles like a single submit.
+    Returns (rows of id, profile and user_job_number in input order, remaining balance), or None if the user
+    cannot afford the whole batch.
+    """
+    balance = await change_credits(db, user, -sum(costs), CreditTransactionKind.RESERVE, require_funds=True)
+    if balance is None:
+        return None
+    result = await db.execute(
+        update(User)
+        .where(User.id == user.id)
+        .values(job_count=User.job_count + len(jobs))
+        .returning(User.job_count)
+    )
+    first_number = result.scalar_one() - len(jobs) + 1
+    now = datetime.utcnow()
+    result = await db.execute(
+        insert(Job.__table__).returning(Job.id, Job.profile, Job.user_job_number),
+        [
+            {
+                "user_id": user.id,
+                "user_job_number": first_number + i,
+                "input_text": input_text,
+                "fingerprint": job_fingerprint(input_text, profile),
+                "status": JobStatus.PENDING,
+                "profile": profile,
+                "credits_reserved": cost,
+                "created_at": now,
+            }
+            for i, ((input_text, profile), cost) in enumerate(zip(jobs, costs))
+        ],
+    )
+    # RETURNING order is unspecified for multi-row inserts; job numbers follow the input order.
+    return sorted(result.all(), key=lambda row: row.user_job_number), balance
+
+async def update_job_status(db: AsyncSession, job_id: int, status: JobStatus, output_text: str = None, commit: bool = True):
+    job = await db.get(Job, job_id)
     if not job:
         return None
     job.status = status
     if output_text:
         job.output_text = output_text
-    await db.commit()
-    await db.refresh(job)
+    if commit:
+        await db.commit()
+        await db.refresh(job)
     return job
 
-async def get_jobs_for_user(db: AsyncSession, user: User):
-    result = await db.execute(select(Job).where(Job.user_id == user.id).order_by(Job.created_at.desc()))
+def _lease(worker_id: str) -> dict:
+    return {
+        "status": JobStatus.PROCESSING,
+        "worker_id": worker_id,
+        "lease_expires_at": datetime.utcnow() + timedelta(seconds=settings.job_lease_seconds),
+        "attempts": Job.attempts + 1,
+    }
+
+def _lease_expired(now: datetime):
+    return and_(
+        Job.status == JobStatus.PROCESSING,
+        or_(Job.lease_expires_at < now, Job.lease_expires_at.is_(None)),
+    )
+
+async def claim_jobs(db: AsyncSession, job_ids: list[int], worker_id: str):
+    """
+    Atomically lease the given jobs to worker_id, moving them to PROCESSING.
+    Pending jobs and jobs whose previous lease expired can be claimed; jobs held by a live worker
+    or already finished are skipped, so a redelivered task never runs a job twice.
+    Returns only the jobs this call claimed.
+    """
+    if not job_ids:
+        return []
+    result = await db.execute(
+        update(Job)
+        .where(Job.id.in_(job_ids), or_(Job.status == JobStatus.PENDING, _lease_expired(datetime.utcnow())))
+        .values(**_lease(worker_id))
+        .returning(Job)
+    )
+    jobs = result.scalars().all()
+    await db.commit()
+    return jobs
+
+async def claim_pending_jobs(db: AsyncSession, profile: GenerationProfile, limit: int, worker_id: str, exclude: list[int] = (), skip_running_duplicates: bool = False):
+    """
+    Lease up to limit of the oldest dispatched, pending jobs of a profile in a single UPDATE ... RETURNING.
+    Jobs the scheduler has not dispatched yet are left alone so batching cannot jump the fair-share queue,
+    and streaming jobs are left to their own task, which generates them alone. With skip_running_duplicates,
+    so are jobs identical to one another worker is running: their own task finishes them from its result.
+    """
+    oldest = (
+        select(Job.id)
+        .where(
+            Job.status == JobStatus.PENDING,
+            Job.dispatched_at.isnot(None),
+            Job.profile == profile,
+            Job.stream == False,
+            Job.id.notin_(exclude),
+        )
+        .order_by(Job.id)
+        .limit(limit)
+    )
+    if skip_running_duplicates:
+        running = aliased(Job)
+        oldest = oldest.where(~(
+            select(running.id)
+            .where(
+                running.fingerprint == Job.fingerprint,
+                running.status == JobStatus.PROCESSING,
+                running.worker_id != worker_id,
+            )
+            .exists()
+        ))
+    result = await db.execute(
+        update(Job)
+        .where(Job.id.in_(oldest), Job.status == JobStatus.PENDING)
+        .values(**_lease(worker_id))
+        .returning(Job)
+    )
+    jobs = result.scalars().all()
+    await db.commit()
+    return jobs
+
+async def find_running_duplicate(db: AsyncSession, job: Job):
+    """
+    Return the id of the oldest earlier job with the same fingerprint that a live worker is
+    running, or None. Only earlier jobs count, so two duplicates never attach to each other.
+    """
+    if job.fingerprint is None or job.stream:
+        return None
+    result = await db.execute(
+        select(Job.id)
+        .where(
+            Job.fingerprint == job.fingerprint,
+            Job.status == JobStatus.PROCESSING,
+            Job.lease_expires_at > datetime.utcnow(),
+            Job.stream == False,
+            Job.id < job.id,
+        )
+        .order_by(Job.id)
+        .limit(1)
+    )
+    return result.scalar()
+
+async def attach_to_job(db: AsyncSession, job: Job, leader_id: int, worker_id: str, timings: dict) -> bool:
+    """
+    Hand a job worker_id has claimed over to the worker running leader_id, an identical job,
+    which finishes it with its own summary (see get_attached_jobs). The job takes over the
+    leader's lease, which that worker renews along with its own jobs; if it dies, the reaper
+    requeues both. Fails, returning False, if
+    the leader is no longer running, in which case the caller runs the job itself.
+    """
+    leader = aliased(Job)
+    running = (
+        select(leader.id)
+        .where(leader.id == leader_id, leader.status == JobStatus.PROCESSING, leader.lease_expires_at > datetime.utcnow())
+        .exists()
+    )
+    result = await db.execute(
+        update(Job)
+        .where(Job.id == job.id, Job.status == JobStatus.PROCESSING, Job.worker_id == worker_id, running)
+        .values(
+            worker_id=select(leader.worker_id).where(leader.id == leader_id).scalar_subquery(),
+            lease_expires_at=select(leader.lease_expires_at).where(leader.id == leader_id).scalar_subquery(),
+            timings=timings,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount == 1
+
+async def get_attached_jobs(db: AsyncSession, fingerprints: list[str], worker_id: str, exclude: list[int] = ()):
+    """
+    Jobs with one of the fingerprints that other tasks attached to worker_id's running jobs.
+    """
+    if not fingerprints:
+        return []
+    result = await db.execute(
+        select(Job).where(
+            Job.fingerprint.in_(fingerprints),
+            Job.status == JobStatus.PROCESSING,
+            Job.worker_id == worker_id,
+            Job.id.notin_(exclude),
+        )
+    )
     return result.scalars().all()
 
-async def create_notification(db: AsyncSession, user: User, message: str, type: str):
+async def renew_leases(db: AsyncSession, worker_id: str) -> set[int]:
+    """
+    Push back the lease expiry of every job worker_id holds, including jobs other tasks attached
+    to it. Returns the ids of the jobs it still holds.
+    """
+    result = await db.execute(
+        update(Job)
+        .where(Job.status == JobStatus.PROCESSING, Job.worker_id == worker_id)
+        .values(lease_expires_at=datetime.utcnow() + timedelta(seconds=settings.job_lease_seconds))
+        .returning(Job.id)
+        .execution_options(synchronize_session=False)
+    )
+    held = set(result.scalars().all())
+    await db.commit()
+    return held
+
+async def release_job(db: AsyncSession, job: Job, worker_id: str, status: JobStatus, output_text: str = None) -> bool:
+    """
+    Record a leased job's final status in the caller's transaction, only if worker_id still
+    holds the lease. False means another worker took the job over or it is already finished,
+    and the caller must not settle or notify for it.
+    """
+    result = await db.execute(
+        update(Job)
+        .where(Job.id == job.id, Job.status == JobStatus.PROCESSING, Job.worker_id == worker_id)
+        .values(status=status, output_text=output_text, worker_id=None, lease_expires_at=None)
+        .returning(Job.id)
+        .execution_options(synchronize_session=False)
+    )
+    if result.scalar_one_or_none() is None:
+        return False
+    set_committed_value(job, "status", status)
+    set_committed_value(job, "output_text", output_text)
+    set_committed_value(job, "worker_id", None)
+    set_committed_value(job, "lease_expires_at", None)
+    return True
+
+async def requeue_expired_jobs(db: AsyncSession, max_attempts: int):
+    """
+    Put jobs whose lease expired back in the scheduler's waiting queue. Returns the requeued
+    job ids and the expired jobs that already used max_attempts claims, which the caller fails.
+    """
+    now = datetime.utcnow()
+    result = await db.execute(
+        update(Job)
+        .where(_lease_expired(now), Job.attempts < max_attempts)
+        .values(status=JobStatus.PENDING, worker_id=None, lease_expires_at=None, dispatched_at=None)
+        .returning(Job.id)
+        .execution_options(synchronize_session=False)
+    )
+    requeued = result.scalars().all()
+    await db.commit()
+    result = await db.execute(select(Job).where(_lease_expired(now), Job.attempts >= max_attempts))
+    return requeued, result.scalars().all()
+
+async def reset_credits(db: AsyncSession, amount: int, message: str, type: str = "info", chunk_size: int = 10000) -> int:
+    """
+    Reset every user's credits to amount, less the credits reserved by their pending and
+    processing jobs (at least 0), and notify those whose balance changed. A reservation is
+    refunded when its job fails, so counting it here keeps the reset from handing it out twice.
+    Works in chunks of chunk_size users, each one bulk INSERT of ledger rows, one
+    UPDATE ... RETURNING, one bulk INSERT of notifications and one commit, so memory
+    and lock time stay bounded.
+    Returns the number of users reset.
+    """
+    held = (
+        select(func.coalesce(func.sum(Job.credits_reserved), 0))
+        .where(Job.user_id == User.id, Job.status.in_([JobStatus.PENDING, JobStatus.PROCESSING]))
+        .scalar_subquery()
+    )
+    target = case((held < amount, amount - held), else_=0)
+    total = 0
+    last_id = 0
+    while True:
+        chunk = (
+            select(User.id)
+            .where(User.id > last_id, User.credits != target)
+            .order_by(User.id)
+            .limit(chunk_size)
+        )
+        now = datetime.utcnow()
+        # Ledger rows first, while the chunk still holds the old balances.
+        await db.execute(
+            insert(CreditTransaction.__table__).from_select(
+                ["user_id", "kind", "amount", "balance_after", "created_at"],
+                select(
+                    User.id,
+                    literal(CreditTransactionKind.RESET, CreditTransaction.kind.type),
+                    target - User.credits,
+                    target,
+                    literal(now),
+                ).where(User.id.in_(chunk)),
+            )
+        )
+        result = await db.execute(
+            update(User)
+            .where(User.id.in_(chunk))
+            .values(credits=target)
+            .returning(User.id)
+            .execution_options(synchronize_session=False)
+        )
+        user_ids = result.scalars().all()
+        if not user_ids:
+            break
+        await db.execute(
+            insert(Notification.__table__),
+            [{"user_id": user_id, "message": message, "type": type, "is_read": False, "created_at": now} for user_id in user_ids],
+        )
+        await db.commit()
+        total += len(user_ids)
+        last_id = max(user_ids)
+    return total
+
+def encode_cursor(created_at: datetime, id: int) -> str:
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{id}".encode()).decode()
+
+def decode_cursor(cursor: str):
+    try:
+        created_at, id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(id)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+def _keyset_page(query, model, limit: int, cursor: str = None):
+    """
+    Apply newest-first keyset pagination on (created_at, id) to query.
+    Fetches one extra row to know whether there is a next page.
+    """
+    if cursor:
+        created_at, id = decode_cursor(cursor)
+        query = query.where(or_(
+            model.created_at < created_at,
+            and_(model.created_at == created_at, model.id < id),
+        ))
+    return query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1)
+
+def _split_page(rows, limit: int):
+    if len(rows) > limit:
+        return rows[:limit], encode_cursor(rows[limit - 1].created_at, rows[limit - 1].id)
+    return rows, None
+
+async def get_jobs_for_user(db: AsyncSession, user: User, limit: int = 20, cursor: str = None, statuses: list[JobStatus] = None):
+    """
+    One page of the user's jobs, newest first, without the full input and output text.
+    Returns (rows, next_cursor).
+    """
+    query = select(
+        Job.id,
+        Job.user_job_number,
+        Job.status,
+        Job.profile,
+        Job.created_at,
+        func.substr(Job.input_text, 1, PREVIEW_LENGTH).label("input_preview"),
+        func.substr(Job.output_text, 1, PREVIEW_LENGTH).label("output_preview"),
+    ).where(Job.user_id == user.id)
+    if statuses:
+        query = query.where(Job.status.in_(statuses))
+    result = await db.execute(_keyset_page(query, Job, limit, cursor))
+    return _split_page(result.all(), limit)
+
+async def get_job_for_user(db: AsyncSession, job_id: int, user: User):
+    result = await db.execute(select(Job).where(Job.id == job_id, Job.user_id == user.id))
+    job = result.scalars().first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+async def create_notification(db: AsyncSession, user: User, message: str, type: str, commit: bool = True):
     notification = Notification(user_id=user.id, message=message, type=type)
     db.add(notification)
-    await db.commit()
-    await db.refresh(notification)
+    if commit:
+        await db.commit()
+        await db.refresh(notification)
     return notification
 
-async def get_notifications_for_user(db: AsyncSession, user: User):
-    result = await db.execute(select(Notification).where(Notification.user_id == user.id).order_by(Notification.created_at.desc()))
-    return result.scalars().all()
+async def get_notifications_for_user(db: AsyncSession, user: User, limit: int = 20, cursor: str = None, unread_only: bool = False):
+    """
+    One page of the user's notifications, newest first. Returns (notifications, next_cursor).
+    """
+    query = select(Notification).where(Notification.user_id == user.id)
+    if unread_only:
+        query = query.where(Notification.is_read == False)
+    result = await db.execute(_keyset_page(query, Notification, limit, cursor))
+    return _split_page(result.scalars().all(), limit)
+
+async def get_credit_transactions(db: AsyncSession, user: User, limit: int = 20, cursor: str = None):
+    """
+    One page of the user's credit ledger, newest first. Returns (transactions, next_cursor).
+    """
+    query = select(CreditTransaction).where(CreditTransaction.user_id == user.id)
+    result = await db.execute(_keyset_page(query, CreditTransaction, limit, cursor))
+    return _split_page(result.scalars().all(), limit)
 
 async def mark_notification_read(db: AsyncSession, notification_id: int, user: User):
     result = await db.execute(select(Notification).where(Notification.id == notification_id, Notification.user_id == user.id))
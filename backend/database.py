@@ -1,13 +1,87 @@
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base 
+from sqlalchemy.engine import make_url
+from contextlib import contextmanager
+from config import settings
+import contextvars
 import os
+import time
 
-DATABASE_URL = "sqlite+aiosqlite:///./app.db"
-engine = create_async_engine(DATABASE_URL, echo=True)
+DATABASE_URL = settings.database_url
+
+def _engine_options(url: str) -> dict:
+    options = {"echo": settings.database_echo}
+    parsed = make_url(url)
+    # In-memory SQLite uses a single shared connection (StaticPool), which takes no pool sizing.
+    if not (parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:")):
+        options.update(
+            pool_size=settings.database_pool_size,
+            max_overflow=settings.database_max_overflow,
+            pool_timeout=settings.database_pool_timeout,
+            pool_pre_ping=parsed.get_backend_name() != "sqlite",
+        )
+    return options
+
+engine = create_async_engine(DATABASE_URL, **_engine_options(DATABASE_URL))
 SessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 Base = declarative_base()
 
 async def get_db():
     async with SessionLocal() as session:
-        yield session
\ No newline at end of file
+        yield session
+
+@event.listens_for(engine.sync_engine, "connect")
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    if engine.dialect.name != "sqlite":
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA auto_vacuum={settings.sqlite_auto_vacuum}")
+    cursor.execute(f"PRAGMA journal_mode={settings.sqlite_journal_mode}")
+    cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+    cursor.close()
+
+_query_stats = contextvars.ContextVar("query_stats", default=())
+
+@contextmanager
+def count_queries():
+    """
+    Count SQL statements and commits issued in the current context, and the time spent executing them:
+
+        with count_queries() as stats:
+            ...
+        stats["queries"], stats["commits"], stats["db_ms"]
+
+    Nested counters each see every statement issued inside them.
+    """
+    stats = {"queries": 0, "commits": 0, "db_ms": 0.0}
+    token = _query_stats.set(_query_stats.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        _query_stats.reset(token)
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    active = _query_stats.get()
+    for stats in active:
+        stats["queries"] += 1
+    if active:
+        # A connection runs one statement at a time, so one start time per connection is enough.
+        conn.info["query_started"] = time.perf_counter()
+
+@event.listens_for(engine.sync_engine, "after_cursor_execute")
+def _time_query(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop("query_started", None)
+    if started is not None:
+        elapsed = (time.perf_counter() - started) * 1000
+        for stats in _query_stats.get():
+            stats["db_ms"] += elapsed
+
+@event.listens_for(engine.sync_engine, "commit")
+def _count_commit(conn):
+    for stats in _query_stats.get():
+        stats["commits"] += 1
@@ -0,0 +1,151 @@
+import asyncio
+import json
+import logging
+import os
+from collections import defaultdict
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+class EventBroker:
+    """
+    Per-user pub/sub for job and notification updates.
+    Workers publish after committing; the API's /events stream subscribes.
+    """
+
+    async def publish(self, user_id: int, event: dict):
+        raise NotImplementedError
+
+    def subscribe(self, user_id: int):
+        """Async iterator of events for one user, until the consumer stops iterating."""
+        raise NotImplementedError
+
+class InMemoryBroker(EventBroker):
+    """Single-process broker for tests and for running the API and an eager worker together."""
+
+    def __init__(self):
+        self._queues = defaultdict(set)
+
+    async def publish(self, user_id: int, event: dict):
+        for queue in list(self._queues.get(user_id, ())):
+            queue.put_nowait(event)
+
+    async def subscribe(self, user_id: int):
+        queue = asyncio.Queue()
+        self._queues[user_id].add(queue)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self._queues[user_id].discard(queue)
+            if not self._queues[user_id]:
+                del self._queues[user_id]
+
+class RedisBroker(EventBroker):
+    def __init__(self, url: str):
+        self.url = url
+        self._client = None
+        self._pid = None
+
+    def _redis(self):
+        # Clients are bound to the process (and event loop) that created them.
+        if self._client is None or self._pid != os.getpid():
+            import redis.asyncio as redis
+            self._client = redis.from_url(self.url)
+            self._pid = os.getpid()
+        return self._client
+
+    @staticmethod
+    def channel(user_id: int) -> str:
+        return f"events:user:{user_id}"
+
+    async def publish(self, user_id: int, event: dict):
+        await self._redis().publish(self.channel(user_id), json.dumps(event, default=str))
+
+    async def subscribe(self, user_id: int):
+        pubsub = self._redis().pubsub()
+        await pubsub.subscribe(self.channel(user_id))
+        try:
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    yield json.loads(message["data"])
+        finally:
+            await pubsub.unsubscribe(self.channel(user_id))
+            await pubsub.aclose()
+
+def create_broker(kind: str) -> EventBroker:
+    if kind == "memory":
+        return InMemoryBroker()
+    if kind == "redis":
+        return RedisBroker(settings.event_redis_url)
+    raise ValueError(f"Unknown event broker {kind!r}, expected 'redis' or 'memory'")
+
+broker = create_broker(settings.event_broker)
+
+def job_event(job) -> dict:
+    return {
+        "type": "job",
+        "job": {
+            "id": job.id,
+            "user_job_number": job.user_job_number,
+            "status": job.status.value,
+            "profile": job.profile.value,
+        },
+    }
+
+def job_token_event(job_id: int, delta: str, text: str) -> dict:
+    # text is everything generated so far, so a stream that subscribes late still shows the whole summary.
+    return {"type": "token", "job": {"id": job_id, "delta": delta, "text": text}}
+
+def job_batch_event(job_ids: list[int]) -> dict:
+    return {"type": "jobs", "jobs": {"ids": job_ids, "status": "pending"}}
+
+def notification_event(notification) -> dict:
+    return {
+        "type": "notification",
+        "notification": {
+            "id": notification.id,
+            "type": notification.type,
+            "message": notification.message,
+            "is_read": notification.is_read,
+            "created_at": notification.created_at.isoformat() if notification.created_at else None,
+        },
+    }
+
+async def publish_events(user_id: int, *events: dict):
+    """
+    Publish events for a user. Delivery is best effort: failures are logged, never raised,
+    so a broker outage cannot fail a request or a job that has already been committed.
+    """
+    for event in events:
+        try:
+            await broker.publish(user_id, event)
+        except Exception as e:
+            logger.warning(f"Failed to publish {event['type']} event for user {user_id}: {str(e)}")
+
+# Publishes started by publish_events_soon, referenced until they finish so they are not collected.
+_pending = set()
+
+async def _publish_within_timeout(user_id: int, events: tuple[dict, ...]):
+    try:
+        await asyncio.wait_for(publish_events(user_id, *events), settings.event_publish_timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f"Gave up publishing {len(events)} events for user {user_id} after {settings.event_publish_timeout:g}s", extra={
+            "event": "events.publish_timeout",
+            "user_id": user_id,
+        })
+
+def publish_events_soon(user_id: int, *events: dict) -> asyncio.Task:
+    """
+    Publish events in the background, for request handlers that have already committed:
+    the response never waits on the broker, and a publish still unfinished after
+    EVENT_PUBLISH_TIMEOUT seconds is abandoned. Events of one call keep their order.
+    """
+    task = asyncio.create_task(_publish_within_timeout(user_id, events))
+    _pending.add(task)
+    task.add_done_callback(_pending.discard)
+    return task
+
+async def drain_events():
+    """Wait for background publishes still in flight, e.g. at shutdown."""
+    await asyncio.gather(*_pending, return_exceptions=True)
@@ -0,0 +1,91 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+from datetime import datetime, timezone
+from config import settings
+
+# Attributes every LogRecord has; anything else came in through extra= and becomes a JSON field.
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and any extra= fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        event = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                event[key] = value
+        if record.exc_info:
+            event["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(event, default=str)
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a fraction of the records of high-volume events, chosen by their event= field.
+    Warnings and errors are always kept.
+    """
+
+    def __init__(self, rates: dict):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self.rates.get(getattr(record, "event", None))
+        if rate is None or record.levelno >= logging.WARNING:
+            return True
+        return random.random() < rate
+
+_listener = None
+_queue_handler = None
+_listener_pid = None
+
+def setup_logging(force: bool = False):
+    """
+    Send all logging through a queue drained by a background thread, so the API's event loop
+    and the workers never wait on formatting or output. Formats JSON (LOG_FORMAT=json) or
+    plain text. Call once per process; forked children call it again with force=True
+    because the parent's listener thread does not survive the fork.
+    """
+    global _listener, _queue_handler, _listener_pid
+    if _listener is not None and not force:
+        return
+
+    handler = logging.StreamHandler()
+    if settings.log_format == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+    records = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(records)
+    queue_handler.addFilter(SamplingFilter(settings.log_sample_rates))
+
+    root = logging.getLogger()
+    if _queue_handler is not None:
+        root.removeHandler(_queue_handler)
+    if _listener is not None and _listener_pid == os.getpid():
+        _listener.stop()
+    root.addHandler(queue_handler)
+    root.setLevel(settings.log_level.upper())
+
+    _listener = logging.handlers.QueueListener(records, handler)
+    _listener.start()
+    _queue_handler = queue_handler
+    _listener_pid = os.getpid()
+
+def stop_logging():
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None and _listener_pid == os.getpid():
+        _listener.stop()
+    _listener = None
+
+atexit.register(stop_logging)
@@ -1,19 +1,35 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, status
+from fastapi.responses import Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.routing import APIRouter
-from auth import create_access_token, create_refresh_token, get_current_user, oauth2_scheme
-from database import engine, Base, get_db
+from auth import create_access_token, create_refresh_token, get_current_user, get_user_from_token, login_limiter, oauth2_scheme
+from database import engine, Base, SessionLocal, count_queries, get_db
+from migrations import upgrade_schema
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
-from schemas import UserCreate, UserRead, UserLogin, JobCreate, JobRead, NotificationRead, Token, CreditsAdd
-from crud import create_user, authenticate_user, add_credits, create_job, update_job_status, get_jobs_for_user, create_notification, get_notifications_for_user, mark_notification_read
-from utils import summarize_text, send_notification
-from celery_config import process_ai_job as process_ai_job_task
+from schemas import UserCreate, UserRead, UserLogin, JobCreate, JobRead, JobPage, NotificationRead, NotificationPage, CreditTransactionPage, JobBatchCreate, JobBatchRead, Token, TokenRefresh, CreditsAdd
+from crud import create_user, authenticate_user, add_credits, reserve_credits, get_credit_transactions, create_job, create_jobs, update_job_status, get_jobs_for_user, get_job_for_user, create_notification, get_notifications_for_user, mark_notification_read
+from utils import send_notification, ordinal
+from cache import summary_cache
+from user_cache import user_cache
+from events import broker, publish_events_soon, drain_events, job_event, job_batch_event, notification_event
+from celery_config import publish_dispatched_jobs
+from outbox import OutboxDispatcher
+from retention import restore_archived_text
+from scheduler import dispatch_pending, queue_stats
+from config import settings
+from pydantic import ValidationError
+from profiles import credit_cost, supports_streaming
+from logging_config import setup_logging
+from metrics import observe_request, render as render_metrics
 import models
+import asyncio
+import json
 import logging
+import time
 from jose import jwt, JWTError
+from typing import Optional
 
-logging.basicConfig(level=logging.INFO)
+setup_logging()
 logger = logging.getLogger(__name__)
 
 app = FastAPI(
@@ -33,11 +49,37 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    with count_queries() as stats:
+        response = await call_next(request)
+    # Label by route template, not raw path, so /jobs/{job_id} stays a single series.
+    route = request.scope.get("route")
+    observe_request(
+        request.method,
+        route.path if route else "unmatched",
+        response.status_code,
+        time.perf_counter() - start,
+        stats["db_ms"] / 1000,
+    )
+    return response
+
+# Publishes dispatched jobs to Celery in the background, so submissions never wait on the broker.
+outbox_dispatcher = OutboxDispatcher(publish_dispatched_jobs)
+
 @app.on_event("startup")
 async def on_startup():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(upgrade_schema)
     logger.info("Database tables created successfully")
+    outbox_dispatcher.start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await outbox_dispatcher.stop()
+    await drain_events()
 
 @app.post("/auth/signup", response_model=UserRead, description="Register a new user with username, email, and password.")
 async def signup(user: UserCreate, db: AsyncSession = Depends(get_db)):
@@ -47,18 +89,21 @@ async def signup(user: UserCreate, db: AsyncSession = Depends(get_db)):
 
 @app.post("/auth/token", response_model=Token, description="Login to get access and refresh tokens.")
 async def login(user: UserLogin, db: AsyncSession = Depends(get_db)):
+    login_limiter.check(user.username)
     u = await authenticate_user(db, user.username, user.password)
     if not u:
         logger.warning(f"Failed login attempt for username: {user.username}")
         raise HTTPException(status_code=401, detail="Incorrect username or password")
+    login_limiter.reset(user.username)
     access_token = create_access_token({"sub": u.username})
     refresh_token = create_refresh_token({"sub": u.username})
     logger.info(f"User {u.username} logged in successfully")
     return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
 
 @app.post("/auth/refresh", response_model=Token, description="Refresh an access token using a refresh token.")
-async def refresh_token(refresh_token: str, db: AsyncSession = Depends(get_db)):
+async def refresh_token(body: TokenRefresh, db: AsyncSession = Depends(get_db)):
     from auth import SECRET_KEY, ALGORITHM
+    refresh_token = body.refresh_token
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate refresh token",
@@ -95,34 +140,187 @@ async def add_user_credits(credits: CreditsAdd, db: AsyncSession = Depends(get_d
 async def get_credits(current_user: models.User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     return {"credits": current_user.credits}
 
-@app.post("/jobs/submit", response_model=JobRead, description="Submit a text summarization job.")
+@app.get("/credits/transactions", response_model=CreditTransactionPage, description="Get the current user's credit ledger, newest first. Pass next_cursor back as cursor for the next page.")
+async def credit_transactions(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    transactions, next_cursor = await get_credit_transactions(db, current_user, limit, cursor)
+    return {"items": transactions, "next_cursor": next_cursor}
+
+@app.post("/jobs/submit", response_model=JobRead, description="Submit a text summarization job. With stream set (fast profile only), follow the output as it is generated at /jobs/{job_id}/stream.")
 async def submit_job(job: JobCreate, db: AsyncSession = Depends(get_db), current_user=Depends(get_current_user)):
-    if current_user.credits < 10:
+    if job.stream and not supports_streaming(job.profile):
+        raise HTTPException(status_code=400, detail=f"The {job.profile.value} profile uses beam search and cannot stream; use the fast profile")
+    cost = credit_cost(job.profile)
+    # Job, reservation, notification and the scheduler's dispatch (outbox rows) commit together;
+    # a failed reservation rolls back the job. Neither broker is waited on: the outbox dispatcher
+    # publishes the job to Celery and the events go out in the background.
+    submitted_job = await create_job(db, current_user, job.input_text, job.profile, commit=False, stream=job.stream)
+    balance = await reserve_credits(db, current_user, submitted_job, cost)
+    if balance is None:
+        await db.rollback()
         raise HTTPException(status_code=400, detail="Credits are low. You will receive 100 credits next day.")
-    
-    result = await db.execute(select(models.Job).where(models.Job.user_id == current_user.id))
-    user_jobs = result.scalars().all()
-    user_job_count = len(user_jobs) + 1 
-
-    submitted_job = await create_job(db, current_user, job.input_text)
-    process_ai_job_task.delay(submitted_job.id)
-    await create_notification(
+    notification = await create_notification(
         db,
         current_user,
-        f"Your {user_job_count}{'st' if user_job_count == 1 else 'nd' if user_job_count == 2 else 'rd' if user_job_count == 3 else 'th'} job was submitted! Credits will be deducted upon completion.",
-        "info"
+        f"Your {ordinal(submitted_job.user_job_number)} job was submitted! {cost} credits reserved, {balance} remaining.",
+        "info",
+        commit=False
     )
-    logger.info(f"Job {submitted_job.id} submitted by user {current_user.username}")
+    await dispatch_pending(db, commit=False)
+    await db.commit()
+    outbox_dispatcher.wake()
+    publish_events_soon(current_user.id, job_event(submitted_job), notification_event(notification))
+    logger.info(f"Job {submitted_job.id} submitted by user {current_user.username}", extra={
+        "event": "job.submitted",
+        "job_id": submitted_job.id,
+        "user_id": current_user.id,
+        "profile": submitted_job.profile.value,
+        "input_chars": len(submitted_job.input_text),
+    })
     return submitted_job
 
-@app.get("/jobs/my", response_model=list[JobRead], description="Get all jobs for the current user.")
-async def my_jobs(db: AsyncSession = Depends(get_db), current_user=Depends(get_current_user)):
-    jobs = await get_jobs_for_user(db, current_user)
-    return jobs
+async def submit_job_batch(db: AsyncSession, user: models.User, jobs: list[JobCreate]):
+    if not jobs:
+        raise HTTPException(status_code=400, detail="The batch contains no jobs")
+    if len(jobs) > settings.job_batch_max_size:
+        raise HTTPException(status_code=413, detail=f"A batch can hold at most {settings.job_batch_max_size} jobs")
+    if any(job.stream for job in jobs):
+        raise HTTPException(status_code=400, detail="Streaming is only available for jobs submitted on their own")
+    costs = [credit_cost(job.profile) for job in jobs]
+    created = await create_jobs(db, user, [(job.input_text, job.profile) for job in jobs], costs)
+    if created is None:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=f"Credits are low. This batch needs {sum(costs)} credits.")
+    rows, balance = created
+    notification = await create_notification(
+        db,
+        user,
+        f"Your batch of {len(rows)} jobs was submitted! {sum(costs)} credits reserved, {balance} remaining.",
+        "info",
+        commit=False
+    )
+    await dispatch_pending(db, commit=False)
+    await db.commit()
+    outbox_dispatcher.wake()
+    job_ids = [row.id for row in rows]
+    publish_events_soon(user.id, job_batch_event(job_ids), notification_event(notification))
+    logger.info(f"Batch of {len(job_ids)} jobs submitted by user {user.username}", extra={
+        "event": "jobs.submitted",
+        "user_id": user.id,
+        "jobs": len(job_ids),
+        "input_chars": sum(len(job.input_text) for job in jobs),
+    })
+    return {"job_ids": job_ids, "credits_reserved": sum(costs), "credits_remaining": balance}
+
+@app.post("/jobs/batch", response_model=JobBatchRead, description="Submit many summarization jobs in one transaction. Credits for the whole batch are reserved up front; returns the job IDs in input order.")
+async def submit_jobs(batch: JobBatchCreate, db: AsyncSession = Depends(get_db), current_user=Depends(get_current_user)):
+    return await submit_job_batch(db, current_user, batch.jobs)
+
+@app.post("/jobs/batch/ndjson", response_model=JobBatchRead, description="Like /jobs/batch, but the body is newline-delimited JSON with one {\"input_text\", \"profile\"} object per line, parsed as it streams in.")
+async def submit_jobs_ndjson(request: Request, db: AsyncSession = Depends(get_db), current_user=Depends(get_current_user)):
+    jobs = []
+    line_number = 0
+    buffer = b""
+
+    def parse(line: bytes):
+        nonlocal line_number
+        line_number += 1
+        if not line.strip():
+            return
+        if len(jobs) >= settings.job_batch_max_size:
+            raise HTTPException(status_code=413, detail=f"A batch can hold at most {settings.job_batch_max_size} jobs")
+        try:
+            jobs.append(JobCreate.model_validate_json(line))
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=f"Line {line_number}: {e.errors()[0]['msg']}")
+
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            parse(line)
+    parse(buffer)
+    return await submit_job_batch(db, current_user, jobs)
+
+@app.get("/jobs/my", response_model=JobPage, description="Get the current user's jobs, newest first, with text previews. Pass next_cursor back as cursor for the next page.")
+async def my_jobs(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    status: Optional[list[models.JobStatus]] = Query(None),
+    db: AsyncSession = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    jobs, next_cursor = await get_jobs_for_user(db, current_user, limit, cursor, status)
+    return {"items": jobs, "next_cursor": next_cursor}
+
+@app.get("/jobs/{job_id}", response_model=JobRead, description="Get a single job with its full input and output text. Texts of archived jobs are read back from the archive.")
+async def get_job(job_id: int, db: AsyncSession = Depends(get_db), current_user=Depends(get_current_user)):
+    job = await get_job_for_user(db, job_id, current_user)
+    return await restore_archived_text(db, job)
 
-@app.get("/notifications", response_model=list[NotificationRead], description="Get all notifications for the current user.")
-async def get_my_notifications(db: AsyncSession = Depends(get_db), current_user=Depends(get_current_user)):
-    return await get_notifications_for_user(db, current_user)
+def sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@app.get("/jobs/{job_id}/stream", description="Server-sent events stream of a streaming job's summary as it is generated: token events carry the new piece (delta) and the text so far, then one done event carries the final job. Pass the access token as ?token=.")
+async def job_stream(job_id: int, request: Request, token: str, db: AsyncSession = Depends(get_db)):
+    current_user = await get_user_from_token(db, token)
+    job = await restore_archived_text(db, await get_job_for_user(db, job_id, current_user))
+    user_id = current_user.id
+    await db.close()
+
+    def done(job: models.Job) -> str:
+        return sse("done", JobRead.model_validate(job).model_dump(mode="json"))
+
+    async def finished_job():
+        async with SessionLocal() as session:
+            job = await session.get(models.Job, job_id)
+            return job if job.status in (models.JobStatus.COMPLETED, models.JobStatus.FAILED) else None
+
+    async def stream():
+        if job.status in (models.JobStatus.COMPLETED, models.JobStatus.FAILED):
+            yield done(job)
+            return
+        events = broker.subscribe(user_id)
+        next_event = asyncio.ensure_future(events.__anext__())
+        try:
+            while not await request.is_disconnected():
+                done_events, _ = await asyncio.wait({next_event}, timeout=5)
+                if not done_events:
+                    # Covers a job that finished before the subscription started.
+                    finished = await finished_job()
+                    if finished:
+                        yield done(finished)
+                        return
+                    yield ": keepalive\n\n"
+                    continue
+                event = next_event.result()
+                next_event = asyncio.ensure_future(events.__anext__())
+                if event["type"] == "token" and event["job"]["id"] == job_id:
+                    yield sse("token", event["job"])
+                elif event["type"] == "job" and event["job"]["id"] == job_id and event["job"]["status"] in ("completed", "failed"):
+                    user_cache.invalidate(user_id=user_id)
+                    yield done(await finished_job())
+                    return
+        finally:
+            next_event.cancel()
+            await events.aclose()
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/notifications", response_model=NotificationPage, description="Get the current user's notifications, newest first. Pass next_cursor back as cursor for the next page.")
+async def get_my_notifications(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    unread_only: bool = False,
+    db: AsyncSession = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    notifications, next_cursor = await get_notifications_for_user(db, current_user, limit, cursor, unread_only)
+    return {"items": notifications, "next_cursor": next_cursor}
 
 @app.post("/notifications/{notification_id}/read", response_model=NotificationRead, description="Mark a notification as read.")
 async def mark_as_read(notification_id: int, db: AsyncSession = Depends(get_db), current_user=Depends(get_current_user)):
@@ -130,6 +328,55 @@ async def mark_as_read(notification_id: int, db: AsyncSession = Depends(get_db),
     logger.info(f"Notification {notification_id} marked as read by user {current_user.username}")
     return notif
 
+@app.get("/cache/stats", description="Summary cache hit/miss counters and size.")
+async def cache_stats(current_user=Depends(get_current_user)):
+    return summary_cache.stats()
+
+@app.get("/queue/stats", description="Jobs waiting for the scheduler, queued in Celery and processing, per generation profile, with recent dispatch wait times overall and for the current user.")
+async def get_queue_stats(db: AsyncSession = Depends(get_db), current_user=Depends(get_current_user)):
+    return await queue_stats(db, current_user.id)
+
+@app.get("/auth/cache/stats", description="Hit rates of this API process's token and user caches.")
+async def auth_cache_stats(current_user=Depends(get_current_user)):
+    return user_cache.stats()
+
+@app.get("/events", description="Server-sent events stream of the current user's job status changes and new notifications. Pass the access token as ?token= since EventSource cannot set headers.")
+async def event_stream(request: Request, token: str, db: AsyncSession = Depends(get_db)):
+    current_user = await get_user_from_token(db, token)
+    user_id = current_user.id
+    # Release the session's connection; the stream can stay open for hours.
+    await db.close()
+
+    async def stream():
+        events = broker.subscribe(user_id)
+        next_event = asyncio.ensure_future(events.__anext__())
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                done, _ = await asyncio.wait({next_event}, timeout=15)
+                if not done:
+                    yield ": keepalive\n\n"
+                    continue
+                event = next_event.result()
+                next_event = asyncio.ensure_future(events.__anext__())
+                if event["type"] == "token":
+                    # Partial output is only sent to /jobs/{job_id}/stream.
+                    continue
+                if event["type"] == "job" and event["job"]["status"] in ("completed", "failed"):
+                    # A worker settled credits in another process; don't serve the cached balance.
+                    user_cache.invalidate(user_id=user_id)
+                yield sse(event["type"], event)
+        finally:
+            next_event.cancel()
+            await events.aclose()
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/metrics", description="Prometheus metrics: request latency and DB time per route, job queue wait, per-stage processing time, tokens in and out, and worker utilization.")
+def metrics():
+    body, content_type = render_metrics()
+    return Response(body, media_type=content_type)
+
 @app.get("/ping", description="Health check endpoint.")
 def ping():
     return {"message": "pong"}
@@ -0,0 +1,97 @@
+import os
+import time
+from contextlib import contextmanager
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+
+# Prometheus metrics for the API and the workers. Each process keeps its own; with
+# PROMETHEUS_MULTIPROC_DIR set for all of them (one host), the API's /metrics aggregates every process.
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "API request latency until the response starts", ["method", "route", "status"], buckets=SECONDS_BUCKETS
+)
+REQUEST_DB_SECONDS = Histogram(
+    "http_request_db_seconds", "Time spent executing SQL per API request", ["method", "route"], buckets=SECONDS_BUCKETS
+)
+JOB_QUEUE_WAIT_SECONDS = Histogram(
+    "job_queue_wait_seconds", "Time from submission until a worker claimed the job", ["profile"], buckets=SECONDS_BUCKETS
+)
+JOB_STAGE_SECONDS = Histogram(
+    "job_stage_seconds", "Time spent in each stage of processing jobs", ["stage"], buckets=SECONDS_BUCKETS
+)
+JOB_TOKENS_IN = Histogram(
+    "job_tokens_in", "Input tokens per generated text", buckets=(16, 32, 64, 128, 256, 384, 512, 1024)
+)
+JOB_TOKENS_OUT = Histogram(
+    "job_tokens_out", "Output tokens per generated text", buckets=(8, 16, 24, 32, 48, 64, 128, 256)
+)
+JOBS_COALESCED = Counter(
+    "jobs_coalesced", "Jobs finished from the summary of an identical job instead of running the model", ["profile", "source"]
+)
+WORKER_BUSY_SECONDS = Counter("worker_busy_seconds", "Time worker processes spent running jobs")
+WORKER_JOBS_IN_PROGRESS = Gauge("worker_jobs_in_progress", "Jobs being run by workers", multiprocess_mode="livesum")
+WORKER_PROCESSES = Gauge("worker_processes", "Live worker processes", multiprocess_mode="livesum")
+
+@contextmanager
+def span(stage: str, timings: dict = None):
+    """
+    Time a stage into job_stage_seconds and, when given, add it to timings[f"{stage}_ms"].
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        JOB_STAGE_SECONDS.labels(stage).observe(elapsed)
+        if timings is not None:
+            timings[f"{stage}_ms"] = timings.get(f"{stage}_ms", 0.0) + elapsed * 1000
+
+@contextmanager
+def worker_busy():
+    """
+    Count a running task towards worker utilization: rate(worker_busy_seconds_total) / worker_processes.
+    """
+    start = time.perf_counter()
+    WORKER_JOBS_IN_PROGRESS.inc()
+    try:
+        yield
+    finally:
+        WORKER_JOBS_IN_PROGRESS.dec()
+        WORKER_BUSY_SECONDS.inc(time.perf_counter() - start)
+
+def observe_request(method: str, route: str, status: int, seconds: float, db_seconds: float):
+    REQUEST_SECONDS.labels(method, route, str(status)).observe(seconds)
+    REQUEST_DB_SECONDS.labels(method, route).observe(db_seconds)
+
+def observe_queue_wait(profile: str, seconds: float):
+    JOB_QUEUE_WAIT_SECONDS.labels(profile).observe(seconds)
+
+def observe_tokens(tokens_in: list[int], tokens_out: list[int]):
+    for count in tokens_in:
+        JOB_TOKENS_IN.observe(count)
+    for count in tokens_out:
+        JOB_TOKENS_OUT.observe(count)
+
+def observe_coalesced(profile: str, source: str, count: int = 1):
+    # source is "batch" (a duplicate in the same generate call) or "running" (waited on another worker).
+    if count:
+        JOBS_COALESCED.labels(profile, source).inc(count)
+
+def worker_started():
+    WORKER_PROCESSES.set(1)
+
+def worker_stopped():
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(os.getpid())
+
+def render() -> tuple[bytes, str]:
+    """
+    The metrics in the Prometheus text format, and its content type.
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,54 @@
+import logging
+from sqlalchemy import inspect, literal, text
+from sqlalchemy.engine import Connection
+from database import Base
+
+logger = logging.getLogger(__name__)
+
+def _default_sql(column, dialect) -> str | None:
+    default = column.default
+    if default is None or not default.is_scalar:
+        return None
+    return str(literal(default.arg, column.type).compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+
+def add_missing_columns(conn: Connection) -> list[str]:
+    """
+    Bring tables created by an older version up to the models: create_all only creates missing
+    tables, so add the columns and indexes introduced since. NOT NULL columns get their scalar
+    default as the value for existing rows. Returns the columns added, as table.column.
+    """
+    inspector = inspect(conn)
+    added = []
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(conn.dialect)}"
+            default = _default_sql(column, conn.dialect)
+            if default is not None:
+                ddl += f" DEFAULT {default}"
+            if not column.nullable:
+                if default is None:
+                    raise RuntimeError(f"Cannot add NOT NULL column {table.name}.{column.name} without a default")
+                ddl += " NOT NULL"
+            conn.execute(text(ddl))
+            added.append(f"{table.name}.{column.name}")
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+    return added
+
+def upgrade_schema(conn: Connection) -> list[str]:
+    """
+    Run after create_all at start-up. Adds missing columns, then backfills what their default
+    alone would get wrong: users' job counters start from the jobs they already have, so new
+    jobs are numbered after them (older jobs keep no stored number and are counted on demand).
+    """
+    added = add_missing_columns(conn)
+    if "users.job_count" in added:
+        conn.execute(text("UPDATE users SET job_count = (SELECT COUNT(*) FROM jobs WHERE jobs.user_id = users.id)"))
+    if added:
+        logger.info(f"Added columns {', '.join(added)}", extra={"event": "schema.upgraded", "columns": added})
+    return added
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Enum, DateTime, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Enum, DateTime, Boolean, Float, JSON, LargeBinary, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from database import Base
 from datetime import datetime
@@ -10,6 +10,19 @@ class JobStatus(str, enum.Enum):
     COMPLETED = "completed"
     FAILED = "failed"
 
+class GenerationProfile(str, enum.Enum):
+    FAST = "fast"
+    BALANCED = "balanced"
+    QUALITY = "quality"
+
+class CreditTransactionKind(str, enum.Enum):
+    GRANT = "grant"
+    RESERVE = "reserve"
+    SETTLE = "settle"
+    REFUND = "refund"
+    DEBIT = "debit"
+    RESET = "reset"
+
 class User(Base):
     __tablename__ = "users"
 
@@ -17,23 +30,53 @@ class User(Base):
     username = Column(String, unique=True, index=True, nullable=False)
     email = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
+    # Running balance, kept equal to the sum of the user's credit_transactions.
     credits = Column(Integer, default=100) 
+    job_count = Column(Integer, default=0, nullable=False)
 
     jobs = relationship("Job", back_populates="user")
     notifications = relationship("Notification", back_populates="user")
 
 class Job(Base):
     __tablename__ = "jobs"
+    __table_args__ = (
+        Index("ix_jobs_user_id_created_at", "user_id", "created_at"),
+        Index("ix_jobs_status_dispatched_at", "status", "dispatched_at"),
+        Index("ix_jobs_fingerprint_status", "fingerprint", "status"),
+    )
+
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"))
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), index=True)
+    user_job_number = Column(Integer, nullable=True)
     input_text = Column(String)
     output_text = Column(String, nullable=True)
     status = Column(Enum(JobStatus), default=JobStatus.PENDING)
+    profile = Column(Enum(GenerationProfile), default=GenerationProfile.QUALITY, nullable=False)
+    credits_reserved = Column(Integer, default=0, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Set when the scheduler hands the job to Celery; pending jobs without it are still waiting their turn.
+    dispatched_at = Column(DateTime, nullable=True)
+    # Streaming jobs publish partial output while generating; ttft_ms is the time from the start of generation to the first piece.
+    stream = Column(Boolean, default=False, nullable=False)
+    ttft_ms = Column(Float, nullable=True)
+    # Where the job's time went (queue wait, claim, tokenize/generate/decode, token counts), written when it finishes.
+    timings = Column(JSON, nullable=True)
+    # Lease held by the worker processing the job; an expired lease means the worker died.
+    worker_id = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+    attempts = Column(Integer, default=0, nullable=False)
+    # Same for jobs that would produce the same summary (profiles.job_fingerprint); workers run the model once for them.
+    fingerprint = Column(String, nullable=True)
+    # Set once retention moved the full texts to job_archives; the row keeps only their previews.
+    archived_at = Column(DateTime, nullable=True)
     user = relationship("User", back_populates="jobs")
 
 class Notification(Base):
     __tablename__ = "notifications"
+    __table_args__ = (
+        Index("ix_notifications_user_id_created_at", "user_id", "created_at"),
+        Index("ix_notifications_user_id_is_read", "user_id", "is_read", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -42,4 +85,44 @@ class Notification(Base):
     is_read = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
-    user = relationship("User", back_populates="notifications")
\ No newline at end of file
+    user = relationship("User", back_populates="notifications")
+# Append-only credit ledger: amount is the signed change to the balance and
+# balance_after the balance it produced. Rows are never updated or deleted.
+class CreditTransaction(Base):
+    __tablename__ = "credit_transactions"
+    __table_args__ = (
+        Index("ix_credit_transactions_user_id_created_at", "user_id", "created_at"),
+        # A job is reserved, settled or refunded at most once, however often its task is delivered.
+        UniqueConstraint("job_id", "kind", name="uq_credit_transactions_job_id_kind"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    job_id = Column(Integer, ForeignKey("jobs.id", ondelete="SET NULL"), nullable=True, index=True)
+    kind = Column(Enum(CreditTransactionKind), nullable=False)
+    amount = Column(Integer, nullable=False)
+    balance_after = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+# Outbox of jobs the scheduler dispatched that are still to be published to Celery.
+class JobDispatch(Base):
+    __tablename__ = "job_dispatches"
+
+    id = Column(Integer, primary_key=True)
+    job_id = Column(Integer, ForeignKey("jobs.id", ondelete="CASCADE"), nullable=False)
+    profile = Column(Enum(GenerationProfile), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    # Due for (re)publishing from then on; claiming a batch pushes it out, a failed publish backs it off.
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    attempts = Column(Integer, default=0, nullable=False)
+    last_error = Column(String, nullable=True)
+
+# Full input and output text of old finished jobs, compressed, written by the retention task.
+class JobArchive(Base):
+    __tablename__ = "job_archives"
+
+    job_id = Column(Integer, ForeignKey("jobs.id", ondelete="CASCADE"), primary_key=True)
+    codec = Column(String, nullable=False)
+    payload = Column(LargeBinary, nullable=False)
+    original_bytes = Column(Integer, nullable=False)
+    archived_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,117 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import delete, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from config import settings
+from database import SessionLocal
+from models import JobDispatch
+
+logger = logging.getLogger(__name__)
+
+async def claim_dispatches(db: AsyncSession, limit: int):
+    """
+    Take up to limit due outbox rows, oldest first, by pushing their next_attempt_at past the
+    claim timeout, so concurrent publishers never send the same batch. Returns rows of
+    dispatch_id, id (the job's), profile and attempts.
+    """
+    now = datetime.utcnow()
+    due = (
+        select(JobDispatch.id)
+        .where(JobDispatch.next_attempt_at <= now)
+        .order_by(JobDispatch.id)
+        .limit(limit)
+    )
+    result = await db.execute(
+        update(JobDispatch)
+        .where(JobDispatch.id.in_(due), JobDispatch.next_attempt_at <= now)
+        .values(next_attempt_at=now + timedelta(seconds=settings.outbox_claim_seconds))
+        .returning(JobDispatch.id.label("dispatch_id"), JobDispatch.job_id.label("id"), JobDispatch.profile, JobDispatch.attempts)
+        .execution_options(synchronize_session=False)
+    )
+    rows = result.all()
+    await db.commit()
+    return rows
+
+def retry_delay(attempts: int) -> float:
+    return min(settings.outbox_retry_max, settings.outbox_retry_base * 2 ** (attempts - 1))
+
+async def publish_dispatches(db: AsyncSession, publish) -> int:
+    """
+    Send due outbox rows to the broker in batches until none are left. publish(rows) is
+    blocking (Celery), so it runs on a thread and never stalls the event loop. Published rows
+    are deleted; if a publish fails, its batch is backed off and retried later, and publishing
+    stops until then. Delivery is at least once: a job sent twice is skipped by its lease.
+    Returns the number of jobs published.
+    """
+    published = 0
+    while rows := await claim_dispatches(db, settings.outbox_batch_size):
+        try:
+            await asyncio.to_thread(publish, rows)
+        except Exception as e:
+            attempts = max(row.attempts for row in rows) + 1
+            await db.execute(
+                update(JobDispatch)
+                .where(JobDispatch.id.in_([row.dispatch_id for row in rows]))
+                .values(
+                    attempts=JobDispatch.attempts + 1,
+                    next_attempt_at=datetime.utcnow() + timedelta(seconds=retry_delay(attempts)),
+                    last_error=str(e)[:500],
+                )
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+            logger.warning(f"Publishing {len(rows)} jobs failed, retrying in {retry_delay(attempts):.0f}s: {str(e)}", extra={
+                "event": "jobs.publish_failed", "jobs": len(rows), "attempts": attempts,
+            })
+            break
+        await db.execute(
+            delete(JobDispatch)
+            .where(JobDispatch.id.in_([row.dispatch_id for row in rows]))
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        published += len(rows)
+    if published:
+        logger.info(f"Published {published} jobs", extra={"event": "jobs.published", "jobs": published})
+    return published
+
+class OutboxDispatcher:
+    """
+    Background task of the API process that publishes the outbox: woken after each submission,
+    and every outbox_interval seconds to pick up retries and rows other processes left behind.
+    """
+
+    def __init__(self, publish):
+        # publish(db) publishes the due outbox rows; see celery_config.publish_dispatched_jobs.
+        self.publish = publish
+        self._wake = asyncio.Event()
+        self._task = None
+
+    def start(self):
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    def wake(self):
+        self._wake.set()
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.wait({self._task})
+        self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=settings.outbox_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                async with SessionLocal() as db:
+                    await self.publish(db)
+            except Exception as e:
+                logger.error(f"Outbox dispatcher failed: {str(e)}")
@@ -0,0 +1,71 @@
+from cache import make_cache_key
+from config import settings
+from models import GenerationProfile
+
+# Per-profile decoding settings, credit cost, the Celery queue its jobs are routed to and the
+# scheduler weight of that lane (its share of dispatch slots when several lanes have work).
+# "quality" is the original 10-beam setting and stays the default.
+GENERATION_PROFILES = {
+    GenerationProfile.FAST: {
+        "credits": 4,
+        "queue": "summaries.fast",
+        "weight": 4,
+        "generate": {
+            "max_length": 60,
+            "min_length": 20,
+            "num_beams": 1,
+            "do_sample": False,
+            "no_repeat_ngram_size": 3,
+        },
+    },
+    GenerationProfile.BALANCED: {
+        "credits": 7,
+        "queue": "summaries.balanced",
+        "weight": 2,
+        "generate": {
+            "max_length": 60,
+            "min_length": 20,
+            "num_beams": 4,
+            "length_penalty": 0.5,
+            "early_stopping": True,
+            "no_repeat_ngram_size": 3,
+        },
+    },
+    GenerationProfile.QUALITY: {
+        "credits": 10,
+        "queue": "summaries.quality",
+        "weight": 1,
+        "generate": {
+            "max_length": 60,
+            "min_length": 20,
+            "num_beams": 10,
+            "length_penalty": 0.5,
+            "early_stopping": True,
+            "no_repeat_ngram_size": 3,
+        },
+    },
+}
+
+DEFAULT_PROFILE = GenerationProfile.QUALITY
+
+def generation_kwargs(profile: GenerationProfile) -> dict:
+    return GENERATION_PROFILES[profile]["generate"]
+
+def credit_cost(profile: GenerationProfile) -> int:
+    return GENERATION_PROFILES[profile]["credits"]
+
+def profile_queue(profile: GenerationProfile) -> str:
+    return GENERATION_PROFILES[profile]["queue"]
+
+def lane_weight(profile: GenerationProfile) -> int:
+    return GENERATION_PROFILES[profile]["weight"]
+
+def job_fingerprint(text: str, profile: GenerationProfile) -> str:
+    """
+    Identifies jobs that would produce the same summary: the normalized text and the decoding settings.
+    """
+    return make_cache_key(text, settings.summary_model_name, generation_kwargs(profile))
+
+def supports_streaming(profile: GenerationProfile) -> bool:
+    # Beam search only settles on its output at the end, so there is nothing to stream early.
+    return GENERATION_PROFILES[profile]["generate"].get("num_beams", 1) == 1
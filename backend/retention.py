@@ -0,0 +1,152 @@
+import gzip
+import json
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, insert, text, update
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm.attributes import set_committed_value
+from config import settings
+from crud import PREVIEW_LENGTH
+from models import Job, JobArchive, JobStatus, Notification
+
+logger = logging.getLogger(__name__)
+
+def compress(data: bytes, codec: str) -> bytes:
+    if codec == "gzip":
+        return gzip.compress(data)
+    if codec == "zstd":
+        return _zstd().ZstdCompressor().compress(data)
+    raise ValueError(f"Unknown retention codec {codec!r}, expected 'gzip' or 'zstd'")
+
+def decompress(data: bytes, codec: str) -> bytes:
+    if codec == "gzip":
+        return gzip.decompress(data)
+    if codec == "zstd":
+        return _zstd().ZstdDecompressor().decompress(data)
+    raise ValueError(f"Unknown retention codec {codec!r}, expected 'gzip' or 'zstd'")
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("The zstd retention codec requires zstandard (pip install zstandard)")
+    return zstandard
+
+async def archive_jobs(db: AsyncSession, older_than: datetime, codec: str, batch_size: int = 1000) -> int:
+    """
+    Move the full texts of finished jobs created before older_than into job_archives,
+    compressed, leaving their previews on the job row. Works batch_size jobs per
+    transaction. Returns the number of jobs archived.
+    """
+    total = 0
+    while True:
+        rows = (await db.execute(
+            select(Job.id, Job.input_text, Job.output_text)
+            .where(
+                Job.status.in_([JobStatus.COMPLETED, JobStatus.FAILED]),
+                Job.created_at < older_than,
+                Job.archived_at.is_(None),
+            )
+            .order_by(Job.id)
+            .limit(batch_size)
+        )).all()
+        if not rows:
+            return total
+        now = datetime.utcnow()
+        archives = []
+        for row in rows:
+            data = json.dumps({"input_text": row.input_text, "output_text": row.output_text}).encode()
+            archives.append({
+                "job_id": row.id,
+                "codec": codec,
+                "payload": compress(data, codec),
+                "original_bytes": len(data),
+                "archived_at": now,
+            })
+        await db.execute(insert(JobArchive.__table__), archives)
+        await db.execute(
+            update(Job)
+            .where(Job.id.in_([row.id for row in rows]))
+            .values(
+                input_text=func.substr(Job.input_text, 1, PREVIEW_LENGTH),
+                output_text=func.substr(Job.output_text, 1, PREVIEW_LENGTH),
+                archived_at=now,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        total += len(rows)
+
+async def restore_archived_text(db: AsyncSession, job: Job) -> Job:
+    """
+    Put an archived job's full texts back on the loaded object for display, without writing them back.
+    """
+    if job.archived_at is None:
+        return job
+    archive = await db.get(JobArchive, job.id)
+    if archive is None:
+        logger.error(f"Archive missing for job {job.id}")
+        return job
+    texts = json.loads(decompress(archive.payload, archive.codec))
+    set_committed_value(job, "input_text", texts["input_text"])
+    set_committed_value(job, "output_text", texts["output_text"])
+    return job
+
+async def prune_notifications(db: AsyncSession, older_than: datetime, batch_size: int = 1000) -> int:
+    """
+    Delete read notifications created before older_than, batch_size per transaction.
+    Returns the number deleted.
+    """
+    total = 0
+    while True:
+        oldest = (
+            select(Notification.id)
+            .where(Notification.is_read == True, Notification.created_at < older_than)
+            .order_by(Notification.id)
+            .limit(batch_size)
+        )
+        result = await db.execute(
+            delete(Notification).where(Notification.id.in_(oldest)).execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        if not result.rowcount:
+            return total
+        total += result.rowcount
+
+async def vacuum(engine: AsyncEngine, max_pages: int) -> int:
+    """
+    Release up to max_pages free pages of a SQLite database back to the file system.
+    Needs auto_vacuum=incremental, which SQLite only applies to a new database; an existing
+    one needs a single full VACUUM after changing it. Returns the pages released.
+    """
+    if engine.dialect.name != "sqlite" or max_pages <= 0:
+        return 0
+    async with engine.connect() as conn:
+        if (await conn.execute(text("PRAGMA auto_vacuum"))).scalar() != 2:
+            logger.warning("SQLite auto_vacuum is not incremental; run VACUUM once to let retention release space")
+            return 0
+        before = (await conn.execute(text("PRAGMA freelist_count"))).scalar()
+        await conn.commit()
+        raw = await conn.get_raw_connection()
+        # executescript steps the pragma to completion; execute would free a single page.
+        await raw.driver_connection.executescript(f"PRAGMA incremental_vacuum({int(max_pages)});")
+        after = (await conn.execute(text("PRAGMA freelist_count"))).scalar()
+    return before - after
+
+async def apply_retention(db: AsyncSession, engine: AsyncEngine) -> dict:
+    """
+    One retention pass with the configured ages, codec, batch size and vacuum budget.
+    """
+    now = datetime.utcnow()
+    result = {"jobs_archived": 0, "notifications_pruned": 0, "pages_released": 0}
+    if settings.job_retention_days > 0:
+        result["jobs_archived"] = await archive_jobs(
+            db, now - timedelta(days=settings.job_retention_days), settings.retention_codec, settings.retention_batch_size
+        )
+    if settings.notification_retention_days > 0:
+        result["notifications_pruned"] = await prune_notifications(
+            db, now - timedelta(days=settings.notification_retention_days), settings.retention_batch_size
+        )
+    result["pages_released"] = await vacuum(engine, settings.retention_vacuum_pages)
+    return result
@@ -0,0 +1,181 @@
+import logging
+from collections import Counter, OrderedDict, deque, namedtuple
+from datetime import datetime
+from sqlalchemy import func, insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from config import settings
+from models import Job, JobDispatch, JobStatus, GenerationProfile
+from profiles import lane_weight
+
+logger = logging.getLogger(__name__)
+
+Candidate = namedtuple("Candidate", ["job_id", "user_id", "lane"])
+
+def plan_dispatch(
+    candidates: list[Candidate],
+    in_flight: dict,
+    free_slots: int,
+    per_user_cap: int,
+    weights: dict,
+    lend_idle_slots: bool = False,
+) -> list[int]:
+    """
+    Choose which waiting jobs to hand to the workers, in dispatch order.
+
+    candidates are waiting jobs oldest first. Lanes (generation profiles) share the free slots
+    by weighted deficit round-robin. Inside a lane, each slot goes to the user with the fewest
+    jobs in flight, ties broken by who has waited longest, so a user with a deep backlog gets
+    one turn per round like everyone else. No user goes past per_user_cap jobs in flight,
+    unless lend_idle_slots is set and nobody under the cap is waiting for the remaining slots.
+    """
+    lanes = {}
+    for candidate in candidates:
+        users = lanes.setdefault(candidate.lane, OrderedDict())
+        users.setdefault(candidate.user_id, deque()).append(candidate.job_id)
+
+    running = Counter(in_flight)
+    order = sorted(lanes, key=lambda lane: -weights.get(lane, 1))
+    planned = []
+
+    def pick(users, cap):
+        best = None
+        for user_id, jobs in users.items():
+            if jobs and running[user_id] < cap:
+                key = (running[user_id], jobs[0])
+                if best is None or key < best[0]:
+                    best = (key, user_id)
+        return best[1] if best else None
+
+    caps = [per_user_cap, float("inf")] if lend_idle_slots else [per_user_cap]
+    for cap in caps:
+        deficits = dict.fromkeys(lanes, 0)
+        while free_slots > 0:
+            progressed = False
+            for lane in order:
+                deficits[lane] += weights.get(lane, 1)
+                while deficits[lane] >= 1 and free_slots > 0:
+                    user_id = pick(lanes[lane], cap)
+                    if user_id is None:
+                        deficits[lane] = 0
+                        break
+                    planned.append(lanes[lane][user_id].popleft())
+                    running[user_id] += 1
+                    deficits[lane] -= 1
+                    free_slots -= 1
+                    progressed = True
+            if not progressed:
+                break
+    return planned
+
+def _in_flight_query():
+    return select(Job.user_id, func.count(Job.id)).where(
+        Job.dispatched_at.isnot(None),
+        Job.status.in_([JobStatus.PENDING, JobStatus.PROCESSING]),
+    ).group_by(Job.user_id)
+
+async def dispatch_pending(db: AsyncSession, commit: bool = True) -> list:
+    """
+    Mark the next fair share of waiting jobs as dispatched and record them in the outbox, in one
+    transaction, and return their (id, profile) rows; outbox.publish_dispatches sends them to
+    Celery. Safe to call from several processes: a job is only dispatched by the call whose
+    UPDATE flips its dispatched_at, though concurrent calls can briefly overshoot the in-flight limits.
+    With commit=False the caller commits, so a submission and its dispatch land together.
+    """
+    in_flight = dict((await db.execute(_in_flight_query())).all())
+    free_slots = settings.scheduler_max_in_flight - sum(in_flight.values())
+    if free_slots <= 0:
+        return []
+
+    cap = settings.scheduler_max_in_flight_per_user
+    # Lending idle slots can give one user every free slot, so look that far into each backlog.
+    window = max(cap, free_slots) if settings.scheduler_lend_idle_slots else cap
+    position = func.row_number().over(partition_by=(Job.user_id, Job.profile), order_by=Job.id).label("position")
+    waiting = (
+        select(Job.id, Job.user_id, Job.profile, position)
+        .where(Job.status == JobStatus.PENDING, Job.dispatched_at.is_(None))
+        .subquery()
+    )
+    rows = (await db.execute(
+        select(waiting.c.id, waiting.c.user_id, waiting.c.profile)
+        .where(waiting.c.position <= window)
+        .order_by(waiting.c.id)
+    )).all()
+    if not rows:
+        return []
+
+    candidates = [Candidate(row.id, row.user_id, row.profile) for row in rows]
+    weights = {profile: lane_weight(profile) for profile in GenerationProfile}
+    job_ids = plan_dispatch(candidates, in_flight, free_slots, cap, weights, settings.scheduler_lend_idle_slots)
+    if not job_ids:
+        return []
+
+    result = await db.execute(
+        update(Job)
+        .where(Job.id.in_(job_ids), Job.dispatched_at.is_(None))
+        .values(dispatched_at=datetime.utcnow())
+        .returning(Job.id, Job.profile)
+        .execution_options(synchronize_session=False)
+    )
+    dispatched = result.all()
+    if dispatched:
+        await db.execute(insert(JobDispatch.__table__), [{"job_id": row.id, "profile": row.profile} for row in dispatched])
+    if commit:
+        await db.commit()
+    logger.info(f"Dispatched {len(dispatched)} jobs", extra={
+        "event": "jobs.dispatched",
+        "jobs": len(dispatched),
+        "free_slots": free_slots - len(dispatched),
+    })
+    return dispatched
+
+def _percentiles(seconds: list[float]) -> dict:
+    if not seconds:
+        return {"count": 0, "p50": None, "p99": None}
+    ordered = sorted(seconds)
+    return {
+        "count": len(ordered),
+        "p50": ordered[len(ordered) // 2],
+        "p99": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))],
+    }
+
+async def queue_stats(db: AsyncSession, user_id: int, sample: int = 1000) -> dict:
+    """
+    Depth of each lane, and dispatch wait times (created_at to dispatched_at) over the
+    last sample dispatched jobs, overall and for one user.
+    """
+    now = datetime.utcnow()
+    depth = {profile.value: {"waiting": 0, "queued": 0, "processing": 0, "oldest_wait": None} for profile in GenerationProfile}
+    result = await db.execute(
+        select(
+            Job.profile,
+            Job.status,
+            Job.dispatched_at.isnot(None).label("dispatched"),
+            func.count(Job.id),
+            func.min(Job.created_at),
+        )
+        .where(Job.status.in_([JobStatus.PENDING, JobStatus.PROCESSING]))
+        .group_by(Job.profile, Job.status, Job.dispatched_at.isnot(None))
+    )
+    for profile, status, dispatched, count, oldest in result.all():
+        lane = depth[profile.value]
+        if status == JobStatus.PROCESSING:
+            lane["processing"] += count
+        elif dispatched:
+            lane["queued"] += count
+        else:
+            lane["waiting"] += count
+            lane["oldest_wait"] = (now - oldest).total_seconds()
+
+    recent = (await db.execute(
+        select(Job.user_id, Job.created_at, Job.dispatched_at)
+        .where(Job.dispatched_at.isnot(None))
+        .order_by(Job.dispatched_at.desc())
+        .limit(sample)
+    )).all()
+    waits = [((row.dispatched_at - row.created_at).total_seconds(), row.user_id) for row in recent]
+    return {
+        "lanes": depth,
+        "wait_seconds": _percentiles([wait for wait, _ in waits]),
+        "your_wait_seconds": _percentiles([wait for wait, owner in waits if owner == user_id]),
+    }
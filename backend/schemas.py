@@ -1,7 +1,7 @@
 from pydantic import BaseModel, EmailStr, constr
 from typing import Optional
 from datetime import datetime
-from models import JobStatus
+from models import JobStatus, GenerationProfile, CreditTransactionKind
 
 class UserBase(BaseModel):
     username: constr(min_length=3, max_length=50)
@@ -26,22 +26,57 @@ class Token(BaseModel):
     refresh_token: str
     token_type: str
 
+class TokenRefresh(BaseModel):
+    refresh_token: str
+
 class CreditsAdd(BaseModel):
     credits: int
 
 class JobCreate(BaseModel):
     input_text: str
+    profile: GenerationProfile = GenerationProfile.QUALITY
+    stream: bool = False
+
+class JobBatchCreate(BaseModel):
+    jobs: list[JobCreate]
+
+class JobBatchRead(BaseModel):
+    job_ids: list[int]
+    credits_reserved: int
+    credits_remaining: int
 
 class JobRead(BaseModel):
     id: int
+    user_job_number: Optional[int] = None
     input_text: str
     output_text: Optional[str]
     status: JobStatus
+    profile: GenerationProfile
+    stream: bool = False
+    ttft_ms: Optional[float] = None
+    timings: Optional[dict] = None
+    archived_at: Optional[datetime] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class JobListItem(BaseModel):
+    id: int
+    user_job_number: Optional[int] = None
+    status: JobStatus
+    profile: GenerationProfile
     created_at: datetime
+    input_preview: Optional[str]
+    output_preview: Optional[str]
 
     class Config:
         from_attributes = True
 
+class JobPage(BaseModel):
+    items: list[JobListItem]
+    next_cursor: Optional[str]
+
 class NotificationRead(BaseModel):
     id: int
     type: str
@@ -50,4 +85,23 @@ class NotificationRead(BaseModel):
     created_at: datetime
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class NotificationPage(BaseModel):
+    items: list[NotificationRead]
+    next_cursor: Optional[str]
+
+class CreditTransactionRead(BaseModel):
+    id: int
+    job_id: Optional[int]
+    kind: CreditTransactionKind
+    amount: int
+    balance_after: int
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class CreditTransactionPage(BaseModel):
+    items: list[CreditTransactionRead]
+    next_cursor: Optional[str]
@@ -0,0 +1,50 @@
+import os
+import tempfile
+import pytest
+import pytest_asyncio
+
+# Settings are read when the app modules are first imported, so point them at a throwaway
+# database, summary cache and in-process event broker before any test module imports them.
+_scratch = tempfile.mkdtemp()
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{os.path.join(_scratch, 'test.db')}")
+os.environ.setdefault("SUMMARY_CACHE_PATH", os.path.join(_scratch, "summary_cache.db"))
+os.environ.setdefault("EVENT_BROKER", "memory")
+
+from database import Base, SessionLocal, engine as app_engine
+from models import User
+from user_cache import user_cache
+
+@pytest_asyncio.fixture
+async def engine():
+    """The app's engine, on the throwaway database, with fresh tables for each test."""
+    async with app_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    user_cache.clear()
+    yield app_engine
+    async with app_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+    await app_engine.dispose()
+    user_cache.clear()
+
+@pytest.fixture
+def seed_user():
+    """
+    The user the session fixture creates as id 1. Override it in a test module to change
+    the name or credits, or return None to start without users.
+    """
+    return {"username": "alice", "credits": 100}
+
+@pytest_asyncio.fixture
+async def session(engine, seed_user):
+    """The session factory, once the seed user exists."""
+    if seed_user is not None:
+        async with SessionLocal() as db:
+            db.add(User(email=f"{seed_user['username']}@example.com", hashed_password="x", **seed_user))
+            await db.commit()
+    return SessionLocal
+
+@pytest_asyncio.fixture
+async def db(session):
+    """An open session on the seeded database."""
+    async with session() as db:
+        yield db
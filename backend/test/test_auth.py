@@ -0,0 +1,29 @@
+import time
+import pytest
+from fastapi import HTTPException
+from auth import LoginRateLimiter, hash_password_async, verify_password_async
+
+def test_limiter_rejects_attempts_over_the_limit():
+    limiter = LoginRateLimiter(max_attempts=2, window=60)
+    limiter.check("alice")
+    limiter.check("alice")
+    with pytest.raises(HTTPException) as error:
+        limiter.check("alice")
+    assert error.value.status_code == 429
+    assert int(error.value.headers["Retry-After"]) <= 60
+    limiter.check("bob")
+
+def test_limiter_window_slides_and_resets(monkeypatch):
+    limiter = LoginRateLimiter(max_attempts=1, window=60)
+    limiter.check("alice")
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 61)
+    limiter.check("alice")
+    limiter.reset("alice")
+    limiter.check("alice")
+
+@pytest.mark.asyncio
+async def test_password_round_trip_off_the_event_loop():
+    hashed = await hash_password_async("correct horse")
+    assert await verify_password_async("correct horse", hashed)
+    assert not await verify_password_async("wrong", hashed)
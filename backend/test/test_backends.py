@@ -0,0 +1,49 @@
+import os
+import pytest
+from backends import BACKENDS, create_backend
+from profiles import generation_kwargs
+from models import GenerationProfile
+
+PARITY_MODEL = os.getenv("PARITY_MODEL", "sshleifer/distilbart-cnn-6-6")
+
+ARTICLES = [
+    "The city council approved a new budget for public transport on Tuesday after months of debate. "
+    "The plan adds three bus lines and extends tram service to the airport. Officials said the upgrade "
+    "would cut average commute times by ten minutes, while critics warned that the cost estimates rely "
+    "on optimistic ridership forecasts and on federal grants that have not yet been confirmed.",
+    "Researchers at the university have developed a battery that charges in under five minutes. "
+    "The team replaced the graphite anode with a silicon composite and tested the cells for a thousand "
+    "cycles with little loss of capacity. The group hopes to partner with carmakers within two years, "
+    "although mass production would require new manufacturing equipment.",
+]
+
+def unigram_f1(a: str, b: str) -> float:
+    a_words, b_words = a.lower().split(), b.lower().split()
+    common = sum(min(a_words.count(w), b_words.count(w)) for w in set(a_words))
+    if not common:
+        return 0.0
+    precision, recall = common / len(a_words), common / len(b_words)
+    return 2 * precision * recall / (precision + recall)
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        create_backend("tpu", PARITY_MODEL)
+
+def test_backends_are_registered_by_name():
+    assert {"torch", "torch-int8", "onnx"} <= set(BACKENDS)
+
+@pytest.mark.parametrize("kind", ["torch-int8", "onnx"])
+def test_summary_parity_with_torch(kind):
+    pytest.importorskip("torch")
+    pytest.importorskip("transformers")
+    if kind == "onnx":
+        pytest.importorskip("optimum.onnxruntime")
+    kwargs = generation_kwargs(GenerationProfile.BALANCED)
+
+    reference = create_backend("torch", PARITY_MODEL).generate(ARTICLES, kwargs)
+    candidate = create_backend(kind, PARITY_MODEL).generate(ARTICLES, kwargs)
+
+    assert len(candidate) == len(reference)
+    for expected, actual in zip(reference, candidate):
+        assert actual.strip()
+        assert unigram_f1(expected, actual) >= 0.6, (expected, actual)
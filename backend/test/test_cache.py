@@ -0,0 +1,80 @@
+import sqlite3
+from cache import SummaryCache, make_cache_key
+
+PARAMS = {"num_beams": 10}
+
+def test_key_ignores_whitespace_differences():
+    a = make_cache_key("The council met.\n\nIt approved  the budget.", "bart", PARAMS)
+    b = make_cache_key("  The council met. It approved the budget. ", "bart", PARAMS)
+    assert a == b
+
+def test_key_depends_on_model_and_params():
+    key = make_cache_key("text", "bart", PARAMS)
+    assert key != make_cache_key("text", "distilbart", PARAMS)
+    assert key != make_cache_key("text", "bart", {"num_beams": 4})
+
+def test_hit_and_miss_counters(tmp_path):
+    cache = SummaryCache(str(tmp_path / "cache.db"))
+    assert cache.get("k") is None
+    cache.set("k", "summary")
+    assert cache.get("k") == "summary"
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["entries"] == 1
+
+def test_persistent_tier_survives_new_process_cache(tmp_path):
+    path = str(tmp_path / "cache.db")
+    SummaryCache(path).set("k", "summary")
+    fresh = SummaryCache(path)
+    assert fresh.get("k") == "summary"
+    assert fresh.stats()["process"]["disk_hits"] == 1
+
+def test_memory_tier_is_bounded(tmp_path):
+    cache = SummaryCache(str(tmp_path / "cache.db"), memory_entries=2)
+    for key in ("a", "b", "c"):
+        cache.set(key, key)
+    assert list(cache._memory) == ["b", "c"]
+    assert cache.get("a") == "a"
+
+def test_size_based_eviction_drops_least_recently_used(tmp_path):
+    cache = SummaryCache(str(tmp_path / "cache.db"), max_bytes=20)
+    cache.set("old", "x" * 10)
+    cache.set("new", "y" * 10)
+    cache.get("old")
+    cache.set("newest", "z" * 10)
+    stats = cache.stats()
+    assert stats["size_bytes"] <= 20
+    assert SummaryCache(cache.path).get("new") is None
+    assert cache.get("old") == "x" * 10
+
+def table_bytes(path: str) -> int:
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT COALESCE(SUM(size), 0) FROM summaries").fetchone()[0]
+
+def test_running_size_follows_writes_from_every_process(tmp_path):
+    path = str(tmp_path / "cache.db")
+    first, second = SummaryCache(path, max_bytes=50), SummaryCache(path, max_bytes=50)
+    first.set("a", "x" * 10)
+    second.set("b", "y" * 20)
+    first.set("a", "x" * 15)
+    assert first.stats()["size_bytes"] == table_bytes(path) == 35
+    second.set("c", "z" * 30)
+    assert second.stats()["size_bytes"] == table_bytes(path) <= 50
+
+    # A file from before the running total is measured once when opened.
+    with sqlite3.connect(path) as conn:
+        conn.execute("DELETE FROM counters WHERE name = 'bytes'")
+    assert SummaryCache(path).stats()["size_bytes"] == table_bytes(path)
+
+def test_lookups_are_written_out_in_batches(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache, other = SummaryCache(path, flush_every=3), SummaryCache(path)
+    cache.get("a")
+    cache.get("b")
+    assert other.stats()["misses"] == 0
+    cache.get("c")
+    assert other.stats()["misses"] == 3
+    cache.get("d")
+    assert cache.stats()["misses"] == 4
+
@@ -0,0 +1,60 @@
+import utils
+from backends import InferenceBackend
+from chunking import iter_chunks, iter_sentences
+
+def count_words(sentence):
+    return len(sentence.split())
+
+def test_sentences_split_on_terminal_punctuation_only():
+    text = 'Prices rose 3.5 percent.  He said "no." Was it   true? Yes'
+    assert list(iter_sentences(text)) == ["Prices rose 3.5 percent.", 'He said "no."', "Was it true?", "Yes"]
+
+def test_chunks_respect_budget_and_overlap():
+    text = "One two three. Four five six. Seven eight. Nine ten eleven twelve. Thirteen."
+    chunks = list(iter_chunks(text, count_words, max_tokens=6, overlap_sentences=1))
+    assert chunks == [
+        "One two three. Four five six.",
+        "Four five six. Seven eight.",
+        "Seven eight. Nine ten eleven twelve.",
+        "Nine ten eleven twelve. Thirteen.",
+    ]
+    assert all(count_words(chunk) <= 6 for chunk in chunks)
+
+def test_overlong_sentence_is_emitted_alone():
+    text = "Short one. " + " ".join(["word"] * 20) + ". Tail."
+    chunks = list(iter_chunks(text, count_words, max_tokens=5, overlap_sentences=1))
+    assert len(chunks) == 3
+    assert chunks[1].startswith("word")
+
+class WordTokenizer:
+    def __call__(self, text):
+        return {"input_ids": text.split()}
+
+    def encode(self, text, add_special_tokens=True):
+        return text.split()
+
+def test_summarize_long_maps_then_reduces(monkeypatch):
+    calls = []
+
+    def fake_generate(backend, texts, profile):
+        calls.append(list(texts))
+        return [f"summary {len(calls)}-{i}." for i in range(len(texts))]
+
+    backend = InferenceBackend("stub")
+    backend.tokenizer = WordTokenizer()
+    monkeypatch.setattr(utils, "load_backend", lambda: backend)
+    monkeypatch.setattr(utils, "_generate", fake_generate)
+    monkeypatch.setattr(utils.settings, "summary_cache_enabled", False)
+    monkeypatch.setattr(utils.settings, "summary_max_input_tokens", 12)
+    monkeypatch.setattr(utils.settings, "summary_batch_size", 2)
+
+    text = " ".join(f"Sentence number {i} is here." for i in range(6))
+    summary, timings = utils.summarize_long(text)
+
+    # Five overlapping windows of two sentences, mapped two at a time, then one reduce call
+    # over the joined partial summaries.
+    assert timings["chunks"] == 5
+    assert [len(batch) for batch in calls] == [2, 2, 1, 1]
+    assert calls[-1] == [" ".join(["summary 1-0.", "summary 1-1.", "summary 2-0.", "summary 2-1.", "summary 3-0."])]
+    assert summary == "summary 4-0."
+    assert timings["levels"] == 1
@@ -0,0 +1,122 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import func, select
+import celery_config
+import utils
+from cache import summary_cache
+from config import settings
+from crud import attach_to_job, create_job, find_running_duplicate, get_attached_jobs, renew_leases
+from database import SessionLocal
+from models import CreditTransaction, CreditTransactionKind, GenerationProfile, Job, JobStatus, Notification, User
+
+TEXT = "The council approved the transport budget on Tuesday."
+
+class EchoBackend:
+    tokenizer = None
+
+    def generate(self, texts, generate_kwargs, timings=None):
+        timings.update(tokenize_ms=0.0, generate_ms=0.0, decode_ms=0.0, tokens_in=[1] * len(texts), tokens_out=[1] * len(texts))
+        return [f"summary of {text}" for text in texts]
+
+@pytest.fixture(autouse=True)
+def generated(monkeypatch):
+    generated = []
+
+    def summarize_batch(texts, profile=None, timings=None, looked_up=()):
+        generated.append(list(texts))
+        return [f"summary of {text}" for text in texts]
+
+    async def dispatch_jobs(db):
+        return []
+
+    monkeypatch.setattr(celery_config, "summarize_batch", summarize_batch)
+    monkeypatch.setattr(celery_config, "dispatch_jobs", dispatch_jobs)
+    monkeypatch.setattr(settings, "summary_cache_enabled", False)
+    monkeypatch.setattr(settings, "summary_batch_max_wait", 0.0)
+    return generated
+
+async def submit(db, text, profile=GenerationProfile.FAST) -> int:
+    job = await create_job(db, await db.get(User, 1), text, profile)
+    job.dispatched_at = datetime.utcnow()
+    job.credits_reserved = 4
+    await db.commit()
+    return job.id
+
+@pytest.mark.asyncio
+async def test_only_earlier_running_jobs_with_the_same_text_and_profile_lead(db):
+    leader = await db.get(Job, await submit(db, TEXT))
+    follower = await db.get(Job, await submit(db, f"  {TEXT}\n"))
+    other_profile = await db.get(Job, await submit(db, TEXT, GenerationProfile.QUALITY))
+    assert leader.fingerprint == follower.fingerprint != other_profile.fingerprint
+    assert await find_running_duplicate(db, follower) is None
+
+    leader.status, leader.lease_expires_at = JobStatus.PROCESSING, datetime.utcnow() + timedelta(minutes=5)
+    await db.commit()
+    assert await find_running_duplicate(db, follower) == leader.id
+    assert await find_running_duplicate(db, other_profile) is None
+
+    follower.status, follower.lease_expires_at = JobStatus.PROCESSING, datetime.utcnow() + timedelta(minutes=5)
+    leader.status = JobStatus.PENDING
+    await db.commit()
+    assert await find_running_duplicate(db, leader) is None
+
+@pytest.mark.asyncio
+async def test_duplicates_in_a_batch_are_generated_once(db, generated):
+    first, duplicate, other = [await submit(db, text) for text in (TEXT, TEXT, "Something else entirely.")]
+
+    await celery_config.process_job(first)
+
+    assert generated == [[TEXT, "Something else entirely."]]
+    async with SessionLocal() as session:
+        jobs = [await session.get(Job, job_id) for job_id in (first, duplicate, other)]
+        assert [job.status for job in jobs] == [JobStatus.COMPLETED] * 3
+        assert jobs[0].output_text == jobs[1].output_text == f"summary of {TEXT}"
+        assert (jobs[1].timings["coalesced"], jobs[1].timings["coalesced_with"]) == ("batch", first)
+        # Each job still settles its own credits and notifies its owner.
+        settled = await session.execute(select(CreditTransaction.job_id).where(CreditTransaction.kind == CreditTransactionKind.SETTLE))
+        assert sorted(settled.scalars()) == [first, duplicate, other]
+        assert (await session.execute(select(func.count(Notification.id)))).scalar() == 3
+
+@pytest.mark.asyncio
+async def test_a_duplicate_of_a_running_job_is_finished_by_its_worker(db, generated):
+    leader_id = await submit(db, TEXT)
+    (leader,) = await celery_config.claim_jobs(db, [leader_id], "other-worker")
+    follower_id = await submit(db, TEXT)
+
+    result = await celery_config.process_job(follower_id)
+    assert result["status"] == "coalesced"
+    assert generated == []
+
+    # The leader's worker finishes its own job, then every job attached to it.
+    (follower,) = await get_attached_jobs(db, [leader.fingerprint], "other-worker", [leader_id])
+    assert follower.id == follower_id
+    assert follower.timings["coalesced_with"] == leader_id
+    # It shares the leader's lease, which the leader's heartbeat renews along with its own.
+    assert await renew_leases(db, "other-worker") == {leader_id, follower_id}
+    async with SessionLocal() as session:
+        leases = [(await session.get(Job, job_id)).lease_expires_at for job_id in (leader_id, follower_id)]
+        assert leases[0] == leases[1] > datetime.utcnow()
+    await celery_config.finish_job(db, leader, "the leader's summary", "other-worker")
+    # Once the leader has finished, nothing more can attach to it.
+    (late,) = await celery_config.claim_jobs(db, [await submit(db, TEXT)], "worker")
+    assert not await attach_to_job(db, late, leader_id, "worker", {})
+    await celery_config.finish_job(db, follower, "the leader's summary", "other-worker", follower.timings)
+    async with SessionLocal() as session:
+        follower = await session.get(Job, follower_id)
+        assert (follower.status, follower.output_text) == (JobStatus.COMPLETED, "the leader's summary")
+
+@pytest.mark.asyncio
+async def test_each_job_counts_one_cache_lookup(db, monkeypatch):
+    monkeypatch.setattr(celery_config, "summarize_batch", utils.summarize_batch)
+    monkeypatch.setattr(utils, "load_backend", lambda: EchoBackend())
+    monkeypatch.setattr(settings, "summary_cache_enabled", True)
+    summary_cache.clear()
+
+    await celery_config.process_job(await submit(db, TEXT))
+    stats = summary_cache.stats()
+    assert (stats["hits"], stats["misses"]) == (0, 1)
+
+    result = await celery_config.process_job(await submit(db, TEXT))
+    assert result["summary"] == f"summary of {TEXT}"
+    stats = summary_cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
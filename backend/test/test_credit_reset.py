@@ -0,0 +1,51 @@
+import pytest
+from sqlalchemy.future import select
+from crud import refund_credits, reset_credits
+from models import CreditTransaction, CreditTransactionKind, Job, JobStatus, Notification, User
+
+@pytest.fixture
+def seed_user():
+    return None
+
+@pytest.mark.asyncio
+async def test_reset_only_touches_changed_users_across_chunks(db):
+    db.add_all(
+        User(username=f"user{i}", email=f"user{i}@example.com", hashed_password="x", credits=100 if i % 3 == 0 else i)
+        for i in range(10)
+    )
+    await db.commit()
+
+    assert await reset_credits(db, 100, "Your credits have been reset to 100!", chunk_size=2) == 6
+    credits = (await db.execute(select(User.credits))).scalars().all()
+    notified = (await db.execute(select(Notification.user_id).order_by(Notification.user_id))).scalars().all()
+    assert credits == [100] * 10
+    assert notified == [2, 3, 5, 6, 8, 9]
+    ledger = (await db.execute(select(CreditTransaction).order_by(CreditTransaction.user_id))).scalars().all()
+    assert [(t.user_id, t.kind, t.amount, t.balance_after) for t in ledger][:2] == [
+        (2, CreditTransactionKind.RESET, 99, 100),
+        (3, CreditTransactionKind.RESET, 98, 100),
+    ]
+
+    assert await reset_credits(db, 100, "again") == 0
+
+@pytest.mark.asyncio
+async def test_reset_leaves_reservations_of_unfinished_jobs_held(db):
+    db.add_all([
+        User(username="busy", email="busy@example.com", hashed_password="x", credits=90),
+        User(username="overdrawn", email="overdrawn@example.com", hashed_password="x", credits=5),
+        Job(user_id=1, input_text="running", status=JobStatus.PROCESSING, credits_reserved=10),
+        Job(user_id=1, input_text="done", status=JobStatus.COMPLETED, credits_reserved=7),
+        Job(user_id=2, input_text="big", status=JobStatus.PENDING, credits_reserved=150),
+    ])
+    await db.commit()
+
+    # Holding more than the reset amount leaves nothing to spend until those jobs finish.
+    assert await reset_credits(db, 100, "reset") == 1
+    assert (await db.execute(select(User.credits).order_by(User.id))).scalars().all() == [90, 0]
+
+    # The running job fails: its refund brings the user to the reset amount, not above it.
+    user, job = await db.get(User, 1), await db.get(Job, 1)
+    job.status = JobStatus.FAILED
+    assert await refund_credits(db, user, job) == 100
+    await db.commit()
+    assert await reset_credits(db, 100, "reset") == 0
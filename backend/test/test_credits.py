@@ -0,0 +1,79 @@
+import asyncio
+import pytest
+from sqlalchemy import func
+from sqlalchemy.future import select
+from crud import create_job, refund_credits, reserve_credits, settle_credits
+from models import CreditTransaction, CreditTransactionKind, Job, User
+
+@pytest.fixture
+def seed_user():
+    return {"username": "alice", "credits": 1000}
+
+async def submit(Session, cost: int):
+    async with Session() as db:
+        user = await db.get(User, 1)
+        job = await create_job(db, user, "text", commit=False)
+        if await reserve_credits(db, user, job, cost) is None:
+            await db.rollback()
+            return None
+        await db.commit()
+        return job.id
+
+async def finish(Session, job_id: int, cost: int, failed: bool):
+    async with Session() as db:
+        job = await db.get(Job, job_id)
+        user = await db.get(User, job.user_id)
+        if failed:
+            await refund_credits(db, user, job)
+        else:
+            await settle_credits(db, user, job, cost)
+        await db.commit()
+
+@pytest.mark.asyncio
+async def test_concurrent_submissions_never_overspend(session):
+    job_ids = await asyncio.gather(*(submit(session, 7) for _ in range(200)))
+    accepted = [job_id for job_id in job_ids if job_id is not None]
+    assert len(accepted) == 1000 // 7
+
+    async with session() as db:
+        assert (await db.get(User, 1)).credits == 1000 % 7
+        assert await db.scalar(select(func.count(Job.id))) == len(accepted)
+
+@pytest.mark.asyncio
+async def test_concurrent_settlement_matches_the_ledger(session):
+    job_ids = await asyncio.gather(*(submit(session, 7) for _ in range(100)))
+    # Completed jobs cost less than reserved (4 of 7), every third job fails and is refunded.
+    await asyncio.gather(*(finish(session, job_id, 4, failed=i % 3 == 0) for i, job_id in enumerate(job_ids)))
+
+    refunded = len(job_ids[::3])
+    settled = len(job_ids) - refunded
+    async with session() as db:
+        balance = (await db.get(User, 1)).credits
+        assert balance == 1000 - settled * 4
+        ledger = (await db.execute(select(CreditTransaction).order_by(CreditTransaction.id))).scalars().all()
+        # The seeded user has no GRANT row, so the ledger sums to the change from 1000.
+        assert sum(t.amount for t in ledger) == balance - 1000
+        assert all(t.balance_after >= 0 for t in ledger)
+        kinds = [t.kind for t in ledger]
+        assert kinds.count(CreditTransactionKind.RESERVE) == 100
+        assert kinds.count(CreditTransactionKind.REFUND) == refunded
+        assert kinds.count(CreditTransactionKind.SETTLE) == settled
+
+@pytest.mark.asyncio
+async def test_batch_reserves_once_and_numbers_jobs_in_order(session):
+    from crud import create_jobs
+    from models import GenerationProfile
+    async with session() as db:
+        user = await db.get(User, 1)
+        await create_job(db, user, "first")
+        rows, balance = await create_jobs(
+            db, user, [("a", GenerationProfile.FAST), ("b", GenerationProfile.QUALITY)], [4, 10]
+        )
+        await db.commit()
+        assert balance == 986
+        jobs = [await db.get(Job, row.id) for row in rows]
+        assert [(job.input_text, job.user_job_number, job.credits_reserved) for job in jobs] == [("a", 2, 4), ("b", 3, 10)]
+
+        assert await create_jobs(db, user, [("c", GenerationProfile.QUALITY)] * 99, [10] * 99) is None
+        await db.rollback()
+        assert (await db.get(User, 1)).credits == 986
@@ -0,0 +1,25 @@
+import asyncio
+import pytest
+from events import InMemoryBroker, create_broker
+
+@pytest.mark.asyncio
+async def test_subscriber_receives_only_its_users_events():
+    broker = InMemoryBroker()
+    events = broker.subscribe(1)
+    next_event = asyncio.ensure_future(events.__anext__())
+    await asyncio.sleep(0)
+
+    await broker.publish(2, {"type": "job", "job": {"id": 99}})
+    await broker.publish(1, {"type": "job", "job": {"id": 7}})
+
+    assert (await asyncio.wait_for(next_event, 1))["job"]["id"] == 7
+    await events.aclose()
+    assert 1 not in broker._queues
+
+@pytest.mark.asyncio
+async def test_publish_without_subscribers_is_a_no_op():
+    await InMemoryBroker().publish(1, {"type": "notification"})
+
+def test_unknown_broker_is_rejected():
+    with pytest.raises(ValueError):
+        create_broker("kafka")
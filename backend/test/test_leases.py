@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta
+import pytest
+import pytest_asyncio
+from sqlalchemy.future import select
+from crud import claim_jobs, release_job, requeue_expired_jobs, settle_credits
+from models import CreditTransaction, CreditTransactionKind, Job, JobStatus, User
+
+@pytest_asyncio.fixture
+async def session(session):
+    async with session() as db:
+        db.add(Job(user_id=1, input_text="x", status=JobStatus.PENDING, credits_reserved=10, dispatched_at=datetime.utcnow()))
+        await db.commit()
+    return session
+
+async def expire(db, job_id):
+    job = await db.get(Job, job_id)
+    job.lease_expires_at = datetime.utcnow() - timedelta(seconds=1)
+    await db.commit()
+
+@pytest.mark.asyncio
+async def test_live_lease_blocks_redelivery_and_expired_lease_is_reclaimed(session):
+    async with session() as db:
+        assert [job.id for job in await claim_jobs(db, [1], "worker-a")] == [1]
+        assert await claim_jobs(db, [1], "worker-b") == []
+
+        await expire(db, 1)
+        (job,) = await claim_jobs(db, [1], "worker-b")
+        assert (job.worker_id, job.attempts) == ("worker-b", 2)
+
+        # The first worker comes back from a stall: its result must not be recorded.
+        assert not await release_job(db, job, "worker-a", JobStatus.COMPLETED, "late")
+        assert await release_job(db, job, "worker-b", JobStatus.COMPLETED, "done")
+        await db.commit()
+        assert (job.status, job.output_text, job.worker_id) == (JobStatus.COMPLETED, "done", None)
+
+@pytest.mark.asyncio
+async def test_reaper_requeues_then_gives_up(session):
+    async with session() as db:
+        for attempt in range(1, 4):
+            await claim_jobs(db, [1], f"worker-{attempt}")
+            await expire(db, 1)
+            requeued, exhausted = await requeue_expired_jobs(db, max_attempts=3)
+            if attempt < 3:
+                assert (requeued, exhausted) == ([1], [])
+                job = await db.get(Job, 1)
+                await db.refresh(job)
+                assert (job.status, job.dispatched_at, job.worker_id) == (JobStatus.PENDING, None, None)
+                job.dispatched_at = datetime.utcnow()
+                await db.commit()
+        assert requeued == [] and [job.id for job in exhausted] == [1]
+
+@pytest.mark.asyncio
+async def test_job_is_settled_at_most_once(session):
+    from sqlalchemy.exc import IntegrityError
+    async with session() as db:
+        user, job = await db.get(User, 1), await db.get(Job, 1)
+        await settle_credits(db, user, job, 4)
+        await db.commit()
+        await settle_credits(db, user, job, 4)
+        with pytest.raises(IntegrityError):
+            await db.commit()
+        await db.rollback()
+        await db.refresh(user)
+        assert user.credits == 106
+        settlements = (await db.execute(select(CreditTransaction).where(CreditTransaction.kind == CreditTransactionKind.SETTLE))).scalars().all()
+        assert len(settlements) == 1
@@ -0,0 +1,23 @@
+import json
+import logging
+from logging_config import JsonFormatter, SamplingFilter
+
+def record(level=logging.INFO, **extra) -> logging.LogRecord:
+    record = logging.LogRecord("celery_config", level, __file__, 1, "Job %s finished", (7,), None)
+    record.__dict__.update(extra)
+    return record
+
+def test_json_lines_carry_extra_fields():
+    line = json.loads(JsonFormatter().format(record(event="job.finished", job_id=7, output_chars=120)))
+    assert line["message"] == "Job 7 finished"
+    assert (line["level"], line["logger"]) == ("INFO", "celery_config")
+    assert (line["event"], line["job_id"], line["output_chars"]) == ("job.finished", 7, 120)
+    assert "args" not in line and "lineno" not in line
+
+def test_sampling_applies_per_event_and_keeps_warnings():
+    sampling = SamplingFilter({"job.claimed": 0.0, "job.finished": 1.0})
+    assert not sampling.filter(record(event="job.claimed"))
+    assert sampling.filter(record(event="job.finished"))
+    assert sampling.filter(record(event="job.other"))
+    assert sampling.filter(record())
+    assert sampling.filter(record(logging.WARNING, event="job.claimed"))
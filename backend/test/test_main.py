@@ -1,23 +1,28 @@
+import httpx
 import pytest
-from fastapi.testclient import TestClient
+import pytest_asyncio
+import celery_config
 from main import app
-from database import SessionLocal, engine, Base
+from database import engine, Base
+from user_cache import user_cache
 
-@pytest.fixture
-def client():
-    Base.metadata.create_all(bind=engine)
-    yield TestClient(app)
-    Base.metadata.drop_all(bind=engine)
-
-@pytest.fixture
-def db():
-    session = SessionLocal()
-    yield session
-    session.close()
+@pytest_asyncio.fixture
+async def client(monkeypatch):
+    # Jobs stay in the database instead of being published to Redis.
+    monkeypatch.setattr(celery_config, "enqueue_jobs", lambda jobs: None)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+    # Each test runs on its own event loop; pooled connections and cached users must not outlive it.
+    await engine.dispose()
+    user_cache.clear()
 
 @pytest.mark.asyncio
 async def test_signup(client):
-    response = client.post("/auth/signup", json={
+    response = await client.post("/auth/signup", json={
         "username": "testuser",
         "email": "test@example.com",
         "password": "password123"
@@ -27,12 +32,12 @@ async def test_signup(client):
 
 @pytest.mark.asyncio
 async def test_login(client):
-    client.post("/auth/signup", json={
+    await client.post("/auth/signup", json={
         "username": "testuser",
         "email": "test@example.com",
         "password": "password123"
     })
-    response = client.post("/auth/token", json={
+    response = await client.post("/auth/token", json={
         "username": "testuser",
         "password": "password123"
     })
@@ -42,32 +47,32 @@ async def test_login(client):
 
 @pytest.mark.asyncio
 async def test_refresh_token(client):
-    signup_response = client.post("/auth/signup", json={
+    signup_response = await client.post("/auth/signup", json={
         "username": "testuser",
         "email": "test@example.com",
         "password": "password123"
     })
-    login_response = client.post("/auth/token", json={
+    login_response = await client.post("/auth/token", json={
         "username": "testuser",
         "password": "password123"
     })
     refresh_token = login_response.json()["refresh_token"]
-    refresh_response = client.post("/auth/refresh", json={"refresh_token": refresh_token})
+    refresh_response = await client.post("/auth/refresh", json={"refresh_token": refresh_token})
     assert refresh_response.status_code == 200
     assert "access_token" in refresh_response.json()
 
 @pytest.mark.asyncio
 async def test_submit_job(client):
-    client.post("/auth/signup", json={
+    await client.post("/auth/signup", json={
         "username": "testuser",
         "email": "test@example.com",
         "password": "password123"
     })
-    login_response = client.post("/auth/token", json={
+    login_response = await client.post("/auth/token", json={
         "username": "testuser",
         "password": "password123"
     })
     access_token = login_response.json()["access_token"]
-    response = client.post("/jobs/submit", json={"input_text": "This is a test text to summarize."}, headers={"Authorization": f"Bearer {access_token}"})
+    response = await client.post("/jobs/submit", json={"input_text": "This is a test text to summarize."}, headers={"Authorization": f"Bearer {access_token}"})
     assert response.status_code == 200
     assert response.json()["input_text"] == "This is a test text to summarize."
\ No newline at end of file
@@ -0,0 +1,28 @@
+from prometheus_client import REGISTRY
+from metrics import render, span
+
+def stage_count(stage: str) -> float:
+    return REGISTRY.get_sample_value("job_stage_seconds_count", {"stage": stage}) or 0.0
+
+def test_span_records_the_histogram_and_accumulates_timings():
+    before = stage_count("test-stage")
+    timings = {}
+    for _ in range(2):
+        with span("test-stage", timings):
+            pass
+    assert stage_count("test-stage") == before + 2
+    assert timings["test-stage_ms"] >= 0
+
+def test_span_records_failing_stages():
+    before = stage_count("test-failing")
+    try:
+        with span("test-failing"):
+            raise RuntimeError
+    except RuntimeError:
+        pass
+    assert stage_count("test-failing") == before + 1
+
+def test_render_uses_the_prometheus_text_format():
+    body, content_type = render()
+    assert content_type.startswith("text/plain")
+    assert b"# TYPE job_queue_wait_seconds histogram" in body
@@ -0,0 +1,45 @@
+import os
+import tempfile
+import pytest
+from sqlalchemy import inspect, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from celery_config import get_user_job_number
+from crud import create_job
+from database import Base
+from migrations import upgrade_schema
+from models import GenerationProfile, Job, User
+
+# The tables as the first release created them.
+ORIGINAL_SCHEMA = [
+    "CREATE TABLE users (id INTEGER PRIMARY KEY, username VARCHAR NOT NULL, email VARCHAR NOT NULL, hashed_password VARCHAR NOT NULL, credits INTEGER)",
+    "CREATE TABLE jobs (id INTEGER PRIMARY KEY, user_id INTEGER REFERENCES users (id) ON DELETE CASCADE, input_text VARCHAR, output_text VARCHAR, status VARCHAR(10), created_at DATETIME)",
+    "CREATE TABLE notifications (id INTEGER PRIMARY KEY, user_id INTEGER REFERENCES users (id), type VARCHAR NOT NULL, message VARCHAR NOT NULL, is_read BOOLEAN, created_at DATETIME)",
+    "INSERT INTO users (id, username, email, hashed_password, credits) VALUES (1, 'alice', 'alice@example.com', 'x', 100)",
+    "INSERT INTO jobs (user_id, input_text, output_text, status, created_at) VALUES (1, 'a', 'A', 'COMPLETED', '2024-01-01 00:00:00'), (1, 'b', 'B', 'COMPLETED', '2024-01-02 00:00:00')",
+]
+
+@pytest.mark.asyncio
+async def test_upgrade_adds_columns_to_an_old_database():
+    engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'old.db')}")
+    async with engine.begin() as conn:
+        for statement in ORIGINAL_SCHEMA:
+            await conn.execute(text(statement))
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        added = await conn.run_sync(upgrade_schema)
+        assert {"users.job_count", "jobs.user_job_number", "jobs.profile"} <= set(added)
+        indexes = await conn.run_sync(lambda sync: {index["name"] for index in inspect(sync).get_indexes("jobs")})
+        assert "ix_jobs_user_id" in indexes
+    async with engine.begin() as conn:
+        assert await conn.run_sync(upgrade_schema) == []
+
+    Session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with Session() as db:
+        old = await db.get(Job, 2)
+        assert (old.profile, old.user_job_number) == (GenerationProfile.QUALITY, None)
+        assert await get_user_job_number(db, old) == 2
+        # New jobs are numbered after the ones the user already had.
+        job = await create_job(db, await db.get(User, 1), "c", GenerationProfile.FAST)
+        assert job.user_job_number == 3
+    await engine.dispose()
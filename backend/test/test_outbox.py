@@ -0,0 +1,93 @@
+import asyncio
+import time
+from datetime import datetime
+import httpx
+import pytest
+from sqlalchemy import select
+import celery_config
+import events
+from config import settings
+from main import app
+from models import GenerationProfile, Job, JobDispatch
+from outbox import claim_dispatches, publish_dispatches
+
+async def add_dispatches(db, count: int) -> list[int]:
+    jobs = [Job(user_id=1, input_text=f"text {n}", profile=GenerationProfile.FAST, dispatched_at=datetime.utcnow()) for n in range(count)]
+    db.add_all(jobs)
+    await db.flush()
+    db.add_all(JobDispatch(job_id=job.id, profile=job.profile) for job in jobs)
+    await db.commit()
+    return [job.id for job in jobs]
+
+@pytest.mark.asyncio
+async def test_submit_records_the_dispatch_without_publishing(db, monkeypatch):
+    def enqueue_jobs(jobs):
+        raise AssertionError("published during the request")
+
+    monkeypatch.setattr(celery_config, "enqueue_jobs", enqueue_jobs)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        credentials = {"username": "bob", "password": "password123"}
+        await client.post("/auth/signup", json={**credentials, "email": "bob@example.com"})
+        token = (await client.post("/auth/token", json=credentials)).json()["access_token"]
+        response = await client.post("/jobs/submit", json={"input_text": "Summarize me.", "profile": "fast"}, headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+
+    dispatch = (await db.execute(select(JobDispatch))).scalar_one()
+    assert dispatch.job_id == response.json()["id"]
+    assert dispatch.profile == GenerationProfile.FAST
+    assert (await db.get(Job, dispatch.job_id)).dispatched_at is not None
+
+@pytest.mark.asyncio
+async def test_submit_does_not_wait_for_a_silent_event_broker(db, monkeypatch):
+    pytest.importorskip("redis")
+    # A Redis that accepts connections and never answers.
+    connections = []
+    server = await asyncio.start_server(lambda reader, writer: connections.append(writer), "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    monkeypatch.setattr(events, "broker", events.RedisBroker(f"redis://127.0.0.1:{port}/0"))
+    monkeypatch.setattr(settings, "event_publish_timeout", 0.5)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        credentials = {"username": "bob", "password": "password123"}
+        await client.post("/auth/signup", json={**credentials, "email": "bob@example.com"})
+        headers = {"Authorization": f"Bearer {(await client.post('/auth/token', json=credentials)).json()['access_token']}"}
+        start = time.perf_counter()
+        single = await client.post("/jobs/submit", json={"input_text": "Summarize me.", "profile": "fast"}, headers=headers)
+        batch = await client.post("/jobs/batch", json={"jobs": [{"input_text": "And me.", "profile": "fast"}]}, headers=headers)
+        elapsed = time.perf_counter() - start
+    assert (single.status_code, batch.status_code) == (200, 200)
+    assert elapsed < 0.5
+    # The stalled publishes are given up on, not left waiting on the socket.
+    await asyncio.wait_for(events.drain_events(), 2)
+    assert connections
+    server.close()
+
+@pytest.mark.asyncio
+async def test_claimed_dispatches_are_not_claimed_again(db):
+    job_ids = await add_dispatches(db, 3)
+    first = await claim_dispatches(db, 2)
+    second = await claim_dispatches(db, 2)
+    assert [row.id for row in first] == job_ids[:2]
+    assert [row.id for row in second] == job_ids[2:]
+    assert await claim_dispatches(db, 2) == []
+
+@pytest.mark.asyncio
+async def test_failed_publish_is_backed_off_and_retried(db, monkeypatch):
+    job_ids = await add_dispatches(db, 3)
+    published = []
+
+    def broker_down(rows):
+        raise ConnectionError("broker unavailable")
+
+    assert await publish_dispatches(db, broker_down) == 0
+    dispatches = (await db.execute(select(JobDispatch))).scalars().all()
+    assert len(dispatches) == 3
+    assert all(d.attempts == 1 and d.next_attempt_at > datetime.utcnow() and d.last_error == "broker unavailable" for d in dispatches)
+    # Not due yet, so nothing is sent until the backoff has passed.
+    assert await publish_dispatches(db, published.extend) == 0
+
+    await db.execute(JobDispatch.__table__.update().values(next_attempt_at=datetime.utcnow()))
+    await db.commit()
+    monkeypatch.setattr(settings, "outbox_batch_size", 2)
+    assert await publish_dispatches(db, published.extend) == 3
+    assert [(row.id, row.profile) for row in published] == [(job_id, GenerationProfile.FAST) for job_id in job_ids]
+    assert (await db.execute(select(JobDispatch))).scalars().all() == []
@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta
+import pytest
+from fastapi import HTTPException
+from crud import decode_cursor, encode_cursor, get_jobs_for_user, get_notifications_for_user
+from models import Job, JobStatus, Notification, User
+
+# Batch submissions share one created_at, so pages must break ties on id.
+BATCH_TIME = datetime(2026, 1, 2, 3, 4, 5, 678900)
+
+async def all_pages(fetch, limit: int):
+    pages, cursor = [], None
+    while True:
+        rows, cursor = await fetch(limit, cursor)
+        pages.append([row.id for row in rows])
+        if cursor is None:
+            return pages
+
+def test_cursor_round_trips_and_rejects_garbage():
+    assert decode_cursor(encode_cursor(BATCH_TIME, 42)) == (BATCH_TIME, 42)
+    for cursor in ("not a cursor", encode_cursor(BATCH_TIME, 42)[:-4], "MjAyNnwx"):
+        with pytest.raises(HTTPException) as error:
+            decode_cursor(cursor)
+        assert error.value.status_code == 400
+
+@pytest.mark.asyncio
+async def test_job_pages_cover_timestamp_ties_once_and_filter_by_status(db):
+    user = await db.get(User, 1)
+    statuses = [JobStatus.COMPLETED, JobStatus.FAILED, JobStatus.PENDING]
+    db.add(Job(user_id=1, input_text="older", status=JobStatus.COMPLETED, created_at=BATCH_TIME - timedelta(seconds=1)))
+    db.add_all(Job(user_id=1, input_text=f"batch {n}", status=statuses[n % 3], created_at=BATCH_TIME) for n in range(7))
+    db.add(Job(user_id=1, input_text="newer", status=JobStatus.PENDING, created_at=BATCH_TIME + timedelta(seconds=1)))
+    await db.commit()
+
+    pages = await all_pages(lambda limit, cursor: get_jobs_for_user(db, user, limit, cursor), 3)
+    assert pages == [[9, 8, 7], [6, 5, 4], [3, 2, 1]]
+
+    pages = await all_pages(lambda limit, cursor: get_jobs_for_user(db, user, limit, cursor, [JobStatus.COMPLETED, JobStatus.FAILED]), 2)
+    assert pages == [[8, 6], [5, 3], [2, 1]]
+
+@pytest.mark.asyncio
+async def test_unread_notification_pages(db):
+    user = await db.get(User, 1)
+    db.add_all(
+        Notification(user_id=1, type="info", message=f"n{n}", is_read=n % 2 == 0, created_at=BATCH_TIME) for n in range(6)
+    )
+    await db.commit()
+
+    pages = await all_pages(lambda limit, cursor: get_notifications_for_user(db, user, limit, cursor, unread_only=True), 2)
+    assert pages == [[6, 4], [2]]
+    pages = await all_pages(lambda limit, cursor: get_notifications_for_user(db, user, limit, cursor), 6)
+    assert pages == [[6, 5, 4, 3, 2, 1]]
@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import text
+from sqlalchemy.future import select
+from models import Job, JobArchive, JobStatus, Notification
+from retention import archive_jobs, prune_notifications, restore_archived_text, vacuum
+
+OLD = datetime.utcnow() - timedelta(days=100)
+CUTOFF = datetime.utcnow() - timedelta(days=90)
+
+@pytest.mark.asyncio
+async def test_old_finished_jobs_keep_previews_and_restore_full_text(session):
+    long_input, long_output = "word " * 500, "summary " * 100
+    async with session() as db:
+        db.add_all([
+            Job(user_id=1, input_text=long_input, output_text=long_output, status=JobStatus.COMPLETED, created_at=OLD),
+            Job(user_id=1, input_text="recent", output_text="done", status=JobStatus.COMPLETED),
+            Job(user_id=1, input_text="stuck", status=JobStatus.PENDING, created_at=OLD),
+        ])
+        await db.commit()
+
+        assert await archive_jobs(db, CUTOFF, "gzip", batch_size=1) == 1
+        assert await archive_jobs(db, CUTOFF, "gzip") == 0
+
+    async with session() as db:
+        old, recent, pending = (await db.execute(select(Job).order_by(Job.id))).scalars().all()
+        assert old.archived_at is not None and len(old.input_text) == 100
+        assert old.input_text == long_input[:100] and old.output_text == long_output[:100]
+        assert recent.archived_at is None and pending.archived_at is None
+        archive = await db.get(JobArchive, old.id)
+        assert archive.original_bytes > len(archive.payload)
+
+        await restore_archived_text(db, old)
+        assert (old.input_text, old.output_text) == (long_input, long_output)
+        # The restored text is for display only; the row keeps its previews.
+        await db.commit()
+        assert (await db.execute(select(Job.input_text).where(Job.id == old.id))).scalar() == long_input[:100]
+
+@pytest.mark.asyncio
+async def test_only_old_read_notifications_are_pruned(session):
+    async with session() as db:
+        db.add_all([
+            Notification(user_id=1, type="info", message="old read", is_read=True, created_at=OLD),
+            Notification(user_id=1, type="info", message="old unread", is_read=False, created_at=OLD),
+            Notification(user_id=1, type="info", message="new read", is_read=True),
+        ] + [Notification(user_id=1, type="info", message="old read", is_read=True, created_at=OLD) for _ in range(4)])
+        await db.commit()
+
+        assert await prune_notifications(db, CUTOFF, batch_size=2) == 5
+        left = (await db.execute(select(Notification.message).order_by(Notification.id))).scalars().all()
+        assert left == ["old unread", "new read"]
+
+@pytest.mark.asyncio
+async def test_vacuum_releases_free_pages_within_budget(engine, session):
+    async with session() as db:
+        db.add_all([Job(user_id=1, input_text="x" * 4000, status=JobStatus.COMPLETED) for _ in range(50)])
+        await db.commit()
+    async with engine.begin() as conn:
+        await conn.execute(text("DELETE FROM jobs"))
+
+    assert await vacuum(engine, 10) == 10
+    assert await vacuum(engine, 10 ** 6) > 0
+    async with engine.connect() as conn:
+        assert (await conn.execute(text("PRAGMA freelist_count"))).scalar() == 0
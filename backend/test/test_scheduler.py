@@ -0,0 +1,44 @@
+import pytest
+from models import GenerationProfile, Job, JobStatus, User
+from scheduler import Candidate, dispatch_pending, plan_dispatch
+
+FAST, QUALITY = GenerationProfile.FAST, GenerationProfile.QUALITY
+
+def test_backlogged_user_does_not_starve_others():
+    # User 1 bulk-submitted 100 jobs before users 2 and 3 submitted one each.
+    candidates = [Candidate(i, 1, QUALITY) for i in range(100)]
+    candidates += [Candidate(100, 2, QUALITY), Candidate(101, 3, QUALITY)]
+    planned = plan_dispatch(candidates, {}, free_slots=3, per_user_cap=10, weights={QUALITY: 1})
+    assert planned == [0, 100, 101]
+
+def test_per_user_cap_counts_jobs_already_in_flight():
+    candidates = [Candidate(i, 1, QUALITY) for i in range(10)]
+    assert plan_dispatch(candidates, {1: 3}, free_slots=10, per_user_cap=4, weights={}) == [0]
+
+def test_lanes_share_slots_by_weight():
+    candidates = [Candidate(i, i, FAST) for i in range(10)] + [Candidate(i, i, QUALITY) for i in range(10, 20)]
+    planned = plan_dispatch(candidates, {}, free_slots=5, per_user_cap=1, weights={FAST: 4, QUALITY: 1})
+    assert sum(job_id < 10 for job_id in planned) == 4
+    assert len(planned) == 5
+
+@pytest.fixture
+def seed_user():
+    return None
+
+@pytest.mark.asyncio
+async def test_dispatch_marks_jobs_and_respects_capacity(monkeypatch, db):
+    from config import settings
+    monkeypatch.setattr(settings, "scheduler_max_in_flight", 3)
+    monkeypatch.setattr(settings, "scheduler_max_in_flight_per_user", 2)
+    db.add_all([User(username=name, email=f"{name}@example.com", hashed_password="x") for name in ("bulk", "other")])
+    db.add_all([Job(user_id=1, input_text="x", status=JobStatus.PENDING, profile=QUALITY) for _ in range(5)])
+    db.add(Job(user_id=2, input_text="x", status=JobStatus.PENDING, profile=QUALITY))
+    await db.commit()
+
+    assert sorted(row.id for row in await dispatch_pending(db)) == [1, 2, 6]
+    assert await dispatch_pending(db) == []
+
+def test_idle_slots_are_lent_past_the_cap():
+    candidates = [Candidate(i, 1, QUALITY) for i in range(10)] + [Candidate(10, 2, QUALITY)]
+    planned = plan_dispatch(candidates, {}, free_slots=5, per_user_cap=2, weights={}, lend_idle_slots=True)
+    assert planned == [0, 10, 1, 2, 3]
@@ -0,0 +1,41 @@
+import pytest
+import celery_config
+from models import GenerationProfile, Job
+from profiles import supports_streaming
+
+def test_only_greedy_profiles_stream():
+    assert supports_streaming(GenerationProfile.FAST)
+    assert not supports_streaming(GenerationProfile.BALANCED)
+    assert not supports_streaming(GenerationProfile.QUALITY)
+
+@pytest.mark.asyncio
+async def test_stream_job_publishes_pieces_with_the_text_so_far(monkeypatch):
+    published = []
+
+    async def publish(user_id, *events):
+        published.extend((user_id, event) for event in events)
+
+    monkeypatch.setattr(celery_config, "summarize_stream", lambda text, profile, looked_up=False: iter([" The", " council", " agreed."]))
+    monkeypatch.setattr(celery_config, "publish_events", publish)
+    job = Job(id=5, user_id=3, input_text="text", profile=GenerationProfile.FAST, stream=True)
+
+    summary, ttft_ms = await celery_config.stream_job(job)
+
+    assert summary == "The council agreed."
+    assert ttft_ms >= 0
+    assert [event["job"]["text"] for _, event in published] == [" The", " The council", " The council agreed."]
+    assert {(user_id, event["type"], event["job"]["id"]) for user_id, event in published} == {(3, "token", 5)}
+
+@pytest.mark.asyncio
+async def test_stream_job_raises_generation_errors(monkeypatch):
+    def failing(text, profile, looked_up=False):
+        yield " partial"
+        raise RuntimeError("model crashed")
+
+    async def publish(user_id, *events):
+        pass
+
+    monkeypatch.setattr(celery_config, "summarize_stream", failing)
+    monkeypatch.setattr(celery_config, "publish_events", publish)
+    with pytest.raises(RuntimeError):
+        await celery_config.stream_job(Job(id=1, user_id=1, input_text="text", profile=GenerationProfile.FAST))
@@ -0,0 +1,56 @@
+import time
+import pytest
+from auth import create_access_token, get_user_from_token
+from models import User
+from user_cache import UserCache, user_cache
+
+def test_users_expire_after_ttl(monkeypatch):
+    cache = UserCache(ttl=5)
+    user = User(id=1, username="alice", email="a@example.com", hashed_password="x", credits=10, job_count=0)
+    cache.set_user(user)
+    assert cache.get_user("alice")["credits"] == 10
+
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 6)
+    assert cache.get_user("alice") is None
+    assert cache.stats()["users"]["hits"] == 1
+
+def test_tokens_are_not_kept_past_their_expiry():
+    cache = UserCache(ttl=5)
+    cache.set_token("expired", {"sub": "alice", "exp": time.time() - 1})
+    cache.set_token("valid", {"sub": "alice", "exp": time.time() + 60})
+    assert cache.get_token("expired") is None
+    assert cache.get_token("valid")["sub"] == "alice"
+
+def test_zero_ttl_disables_caching():
+    cache = UserCache(ttl=0)
+    cache.set_user(User(id=1, username="alice", email="a@example.com", hashed_password="x", credits=10))
+    assert cache.get_user("alice") is None
+
+@pytest.mark.asyncio
+async def test_cached_user_is_usable_for_writes(session):
+    token = create_access_token({"sub": "alice"})
+    async with session() as db:
+        await get_user_from_token(db, token)
+
+    async with session() as db:
+        user = await get_user_from_token(db, token)
+        assert user_cache.stats()["users"]["hits"] == 1
+        assert user_cache.stats()["tokens"]["hits"] == 1
+        user.credits += 5
+        await db.commit()
+
+    async with session() as db:
+        assert (await db.get(User, user.id)).credits == 105
+
+@pytest.mark.asyncio
+async def test_credit_changes_invalidate_the_cached_user(session):
+    from crud import add_credits
+    token = create_access_token({"sub": "alice"})
+    async with session() as db:
+        user = await get_user_from_token(db, token)
+        await add_credits(db, user, 50)
+
+    async with session() as db:
+        assert (await get_user_from_token(db, token)).credits == 150
+    assert user_cache.stats()["users"]["hits"] == 0
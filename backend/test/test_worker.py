@@ -0,0 +1,46 @@
+from datetime import datetime
+import pytest
+from sqlalchemy import select
+import celery_config
+import utils
+from config import settings
+from crud import create_job, reserve_credits
+from models import CreditTransaction, CreditTransactionKind, GenerationProfile, Job, JobStatus, Notification, User
+
+class FailingBackend:
+    tokenizer = None
+
+    def generate(self, texts, generate_kwargs, timings=None):
+        raise RuntimeError("out of memory")
+
+@pytest.fixture(autouse=True)
+def worker_settings(monkeypatch):
+    async def dispatch_jobs(db):
+        return []
+
+    monkeypatch.setattr(celery_config, "dispatch_jobs", dispatch_jobs)
+    monkeypatch.setattr(settings, "summary_cache_enabled", False)
+    monkeypatch.setattr(settings, "summary_batch_max_wait", 0.0)
+
+@pytest.mark.asyncio
+async def test_failed_summary_fails_the_job_and_refunds_it(db, monkeypatch):
+    monkeypatch.setattr(utils, "load_backend", lambda: FailingBackend())
+    user = await db.get(User, 1)
+    job = await create_job(db, user, "The council approved the budget.", GenerationProfile.QUALITY, commit=False)
+    await reserve_credits(db, user, job, 10)
+    job.dispatched_at = datetime.utcnow()
+    await db.commit()
+    job_id = job.id
+
+    result = await celery_config.process_job(job_id)
+    assert result["status"] == "error"
+
+    db.expire_all()
+    job, user = await db.get(Job, job_id), await db.get(User, 1)
+    assert job.status == JobStatus.FAILED
+    assert job.output_text == "out of memory"
+    assert user.credits == 100
+    kinds = (await db.execute(select(CreditTransaction.kind).order_by(CreditTransaction.id))).scalars().all()
+    assert kinds == [CreditTransactionKind.RESERVE, CreditTransactionKind.REFUND]
+    notification = (await db.execute(select(Notification))).scalar_one()
+    assert notification.type == "error"
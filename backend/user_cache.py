@@ -0,0 +1,140 @@
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import inspect
+from config import settings
+
+
+class _TTLCache:
+    """Bounded LRU whose entries expire at a per-entry deadline."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def get(self, key, now: float):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= now:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key, value, expires_at: float):
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def pop(self, key):
+        return self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class UserCache:
+    """
+    Per-process cache for get_current_user.
+
+    Decoded access tokens are memoized until they expire, so a repeated bearer token skips
+    signature verification. Users are cached as plain column snapshots keyed by username for
+    ttl seconds; callers rebuild a User from the snapshot and merge it into their own session.
+    Anything that changes a user must call invalidate(). Other processes (the Celery workers)
+    cannot reach this cache, so the TTL bounds how stale their changes can look here.
+    """
+
+    def __init__(self, ttl: float = 5.0, max_entries: int = 10000):
+        self.ttl = ttl
+        self._tokens = _TTLCache(max_entries)
+        self._users = _TTLCache(max_entries)
+        self._usernames = {}
+        self._lock = threading.Lock()
+        self.token_hits = 0
+        self.token_misses = 0
+        self.user_hits = 0
+        self.user_misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def get_token(self, token: str):
+        with self._lock:
+            payload = self._tokens.get(token, time.time())
+            if payload is None:
+                self.token_misses += 1
+            else:
+                self.token_hits += 1
+            return payload
+
+    def set_token(self, token: str, payload: dict):
+        # Never keep a token past its own expiry, whatever the TTL.
+        expires_at = payload.get("exp")
+        if expires_at is None or not self.enabled:
+            return
+        with self._lock:
+            self._tokens.set(token, payload, float(expires_at))
+
+    def get_user(self, username: str):
+        with self._lock:
+            snapshot = self._users.get(username, time.monotonic())
+            if snapshot is None:
+                self.user_misses += 1
+            else:
+                self.user_hits += 1
+            return snapshot
+
+    def set_user(self, user):
+        if not self.enabled:
+            return
+        snapshot = {attr.key: getattr(user, attr.key) for attr in inspect(user).mapper.column_attrs}
+        with self._lock:
+            self._users.set(user.username, snapshot, time.monotonic() + self.ttl)
+            self._usernames[user.id] = user.username
+
+    def invalidate(self, user=None, user_id: int = None):
+        """Drop a cached user, given the User or just its id."""
+        with self._lock:
+            if user is not None:
+                user_id = user.id
+            username = self._usernames.pop(user_id, None)
+            if username is not None:
+                self._users.pop(username)
+
+    def clear(self):
+        with self._lock:
+            self._tokens.clear()
+            self._users.clear()
+            self._usernames.clear()
+            self.token_hits = self.token_misses = 0
+            self.user_hits = self.user_misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            token_lookups = self.token_hits + self.token_misses
+            user_lookups = self.user_hits + self.user_misses
+            return {
+                "ttl": self.ttl,
+                "tokens": {
+                    "entries": len(self._tokens),
+                    "hits": self.token_hits,
+                    "misses": self.token_misses,
+                    "hit_rate": self.token_hits / token_lookups if token_lookups else 0.0,
+                },
+                "users": {
+                    "entries": len(self._users),
+                    "hits": self.user_hits,
+                    "misses": self.user_misses,
+                    "hit_rate": self.user_hits / user_lookups if user_lookups else 0.0,
+                },
+            }
+
+
+user_cache = UserCache(ttl=settings.auth_user_cache_ttl, max_entries=settings.auth_user_cache_max_entries)
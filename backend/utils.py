@@ -1,56 +1,253 @@
+import itertools
 import logging
-from transformers import BartForConditionalGeneration, BartTokenizer
+import threading
+import time
+from collections.abc import Collection
 from dotenv import load_dotenv
+from config import settings
+from cache import summary_cache, make_cache_key
+from chunking import iter_chunks
+from backends import InferenceBackend, create_backend
+from models import GenerationProfile
+from profiles import DEFAULT_PROFILE, generation_kwargs
 
 load_dotenv()
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-try:
-    model_name = "facebook/bart-large-cnn"
-    model = BartForConditionalGeneration.from_pretrained(model_name)
-    tokenizer = BartTokenizer.from_pretrained(model_name)
-    logger.info(f"BART model ({model_name}) loaded successfully")
-except Exception as e:
-    logger.error(f"Failed to load BART model ({model_name}): {str(e)}")
-    model_name = "sshleifer/distilbart-cnn-6-6"
-    try:
-        model = BartForConditionalGeneration.from_pretrained(model_name)
-        tokenizer = BartTokenizer.from_pretrained(model_name)
-        logger.info(f"Fallback BART model ({model_name}) loaded successfully")
-    except Exception as fallback_e:
-        logger.error(f"Failed to load fallback BART model ({model_name}): {str(fallback_e)}")
-        raise RuntimeError(f"Failed to load BART models: {str(e)}, {str(fallback_e)}")
-
-def summarize_text(text: str) -> str:
-    logger.info(f"Input text: {text}")
-    try:
+class SummarizationError(Exception):
+    """
+    A text could not be summarized. summarize_batch returns one in place of its summary.
+    """
+
+_backend = None
+_backend_lock = threading.Lock()
+
+def load_backend() -> InferenceBackend:
+    """
+    Return the configured inference backend, loading its model on first use.
+    The model is loaded at most once per process, even when called from several threads.
+    """
+    global _backend
+    if _backend is not None:
+        return _backend
+
+    with _backend_lock:
+        if _backend is not None:
+            return _backend
+        kind = settings.inference_backend
+        name = settings.summary_model_name
+        try:
+            backend = create_backend(kind, name, max_input_tokens=settings.summary_max_input_tokens)
+            logger.info(f"BART model ({name}) loaded successfully with the {kind} backend")
+        except Exception as e:
+            logger.error(f"Failed to load BART model ({name}): {str(e)}")
+            name = settings.summary_fallback_model_name
+            try:
+                backend = create_backend(kind, name, max_input_tokens=settings.summary_max_input_tokens)
+                logger.info(f"Fallback BART model ({name}) loaded successfully with the {kind} backend")
+            except Exception as fallback_e:
+                logger.error(f"Failed to load fallback BART model ({name}): {str(fallback_e)}")
+                raise RuntimeError(f"Failed to load BART models: {str(e)}, {str(fallback_e)}")
+        _backend = backend
+    return _backend
+
+def summary_cache_key(text: str, profile: GenerationProfile = DEFAULT_PROFILE) -> str:
+    # Before the model is loaded, assume the primary model; the worker warms it at start-up.
+    if _backend is not None:
+        model_id = f"{_backend.model_name}:{_backend.name}"
+    else:
+        model_id = f"{settings.summary_model_name}:{settings.inference_backend}"
+    return make_cache_key(text, model_id, generation_kwargs(profile))
+
+def cached_summary(text: str, profile: GenerationProfile = DEFAULT_PROFILE, count: bool = True):
+    """
+    Return the cached summary for text, or None on a miss or when the cache is disabled.
+    count=False re-checks without counting another hit or miss.
+    """
+    if not settings.summary_cache_enabled or not text.strip():
+        return None
+    return summary_cache.get(summary_cache_key(text, profile), count)
+
+def is_long_document(text: str, tokenizer) -> bool:
+    """
+    Whether text exceeds the model's input window. Only a bounded prefix is ever tokenized.
+    """
+    limit = settings.summary_max_input_tokens
+    if len(text) + 2 <= limit:
+        # Every token covers at least one character, plus <s> and </s>.
+        return False
+    if len(text) > limit * 10:
+        return True
+    return len(tokenizer(text)["input_ids"]) > limit
+
+def _generate(backend: InferenceBackend, texts: list[str], profile: GenerationProfile, timings: dict = None) -> list[str]:
+    return backend.generate(texts, generation_kwargs(profile), timings)
+
+def _summarize_cached(backend: InferenceBackend, texts: list[str], profile: GenerationProfile) -> list[str]:
+    summaries = [cached_summary(text, profile) for text in texts]
+    misses = [i for i, summary in enumerate(summaries) if summary is None]
+    if misses:
+        for i, summary_text in zip(misses, _generate(backend, [texts[i] for i in misses], profile)):
+            summaries[i] = summary_text
+            if settings.summary_cache_enabled:
+                summary_cache.set(summary_cache_key(texts[i], profile), summary_text)
+    return summaries
+
+def summarize_long(text: str, profile: GenerationProfile = DEFAULT_PROFILE):
+    """
+    Map-reduce summary for documents longer than the model's input window.
+
+    The text is streamed through the sentence chunker into overlapping windows, which are
+    summarized summary_batch_size at a time (map). The joined partial summaries are then
+    summarized again (reduce), recursing while they still do not fit in one window.
+    Chunk summaries go through the summary cache, so jobs sharing chunks reuse them.
+    Returns (summary, timings).
+    """
+    backend = load_backend()
+    max_tokens = settings.summary_max_input_tokens - 2
+    count_tokens = lambda sentence: len(backend.tokenizer.encode(sentence, add_special_tokens=False))
+    chunks = iter_chunks(text, count_tokens, max_tokens, settings.summary_chunk_overlap_sentences)
+    timings = {"chunks": 0, "levels": 1, "chunk_ms": 0.0, "map_ms": 0.0, "reduce_ms": 0.0}
+
+    partials = []
+    while True:
+        start = time.perf_counter()
+        group = list(itertools.islice(chunks, settings.summary_batch_size))
+        timings["chunk_ms"] += (time.perf_counter() - start) * 1000
+        if not group:
+            break
+        start = time.perf_counter()
+        partials += _summarize_cached(backend, group, profile)
+        timings["map_ms"] += (time.perf_counter() - start) * 1000
+        timings["chunks"] += len(group)
+
+    start = time.perf_counter()
+    combined = " ".join(partials)
+    if is_long_document(combined, backend.tokenizer) and len(combined) < len(text):
+        summary, inner = summarize_long(combined, profile)
+        timings["levels"] += inner["levels"]
+        for stage in ("chunk_ms", "map_ms", "reduce_ms"):
+            timings[stage] += inner[stage]
+    else:
+        summary = _summarize_cached(backend, [combined], profile)[0]
+    timings["reduce_ms"] += (time.perf_counter() - start) * 1000
+    return summary, timings
+
+def summarize_stream(text: str, profile: GenerationProfile = DEFAULT_PROFILE, looked_up: bool = False):
+    """
+    Yield the summary of one text piece by piece as the model decodes it.
+    Cached summaries and documents that need the map-reduce pipeline come out as a single piece.
+    The finished summary is cached like summarize_batch's. looked_up means the caller already
+    missed the text in the summary cache, so it is not looked up (and counted) again.
+    """
+    if not text.strip():
+        raise ValueError("Input text is empty")
+    cached = None if looked_up else cached_summary(text, profile)
+    if cached is not None:
+        yield cached
+        return
+
+    backend = load_backend()
+    if is_long_document(text, backend.tokenizer):
+        summary, timings = summarize_long(text, profile)
+        logger.info("Long document summarized", extra={"event": "summary.long", "input_chars": len(text), **timings})
+        yield summary
+    else:
+        pieces = []
+        for piece in backend.generate_stream(text, generation_kwargs(profile)):
+            pieces.append(piece)
+            yield piece
+        summary = "".join(pieces)
+    if settings.summary_cache_enabled:
+        summary_cache.set(summary_cache_key(text, profile), summary)
+
+def summarize_text(text: str, profile: GenerationProfile = DEFAULT_PROFILE) -> str:
+    summary = summarize_batch([text], profile)[0]
+    if isinstance(summary, SummarizationError):
+        raise summary
+    return summary
+
+def summarize_batch(
+    texts: list[str], profile: GenerationProfile = DEFAULT_PROFILE, timings: list[dict] = None, looked_up: Collection[int] = ()
+) -> list[str | SummarizationError]:
+    """
+    Summarize several texts with a single padded generate call, decoding with the given profile.
+    Texts longer than the model's input window go through the map-reduce pipeline instead.
+    Returns one summary per input, in input order, or a SummarizationError for each input that
+    could not be summarized; nothing is cached for those. When given, timings holds
+    one dict per input and receives the stage timings and token counts behind its summary.
+    looked_up holds the indices of texts the caller already missed in the summary cache; they
+    are not looked up again, so every lookup counts once in the cache's hit rate.
+    """
+    timings = [{} for _ in texts] if timings is None else timings
+    start = time.perf_counter()
+    summaries = [None] * len(texts)
+    pending = []
+    for i, text in enumerate(texts):
         if not text.strip():
             logger.error("Input text is empty")
-            return "[Error summarizing text: Input text is empty]"
+            summaries[i] = SummarizationError("Input text is empty")
+        else:
+            cached = None if i in looked_up else cached_summary(text, profile)
+            if cached is not None:
+                summaries[i] = cached
+                timings[i]["cache_hit"] = True
+            else:
+                pending.append(i)
 
-        inputs = tokenizer(text, return_tensors="pt", max_length=512, truncation=True)
+    if not pending:
+        return summaries
 
-        summary_ids = model.generate(
-            inputs["input_ids"],
-            max_length=60,   
-            min_length=20,
-            num_beams=10,     
-            length_penalty=0.5,
-            early_stopping=True,
-            no_repeat_ngram_size=3  
-        )
+    try:
+        backend = load_backend()
+        short = [i for i in pending if not is_long_document(texts[i], backend.tokenizer)]
+        if short:
+            batch = {}
+            for i, summary_text in zip(short, _generate(backend, [texts[i] for i in short], profile, batch)):
+                summaries[i] = summary_text
+            for n, i in enumerate(short):
+                timings[i].update(
+                    {stage: batch[stage] for stage in ("tokenize_ms", "generate_ms", "decode_ms")},
+                    tokens_in=batch["tokens_in"][n],
+                    tokens_out=batch["tokens_out"][n],
+                    generate_batch_size=len(short),
+                )
 
-        summary_text = tokenizer.decode(summary_ids[0], skip_special_tokens=True)
-        logger.info(f"Raw summary: {summary_text}")
+        for i in pending:
+            if summaries[i] is None:
+                summaries[i], long_timings = summarize_long(texts[i], profile)
+                timings[i].update(long_timings)
+                logger.info("Long document summarized", extra={"event": "summary.long", "input_chars": len(texts[i]), **long_timings})
 
-        return summary_text
+        if settings.summary_cache_enabled:
+            for i in pending:
+                summary_cache.set(summary_cache_key(texts[i], profile), summaries[i])
 
     except Exception as e:
         logger.error(f"Error summarizing text: {str(e)}")
-        return f"[Error summarizing text: {str(e)}]"
+        for i in pending:
+            summaries[i] = SummarizationError(str(e))
+
+    logger.info("Summarized batch", extra={
+        "event": "summary.batch",
+        "profile": profile.value,
+        "texts": len(texts),
+        "generated": len(pending),
+        "input_chars": sum(len(texts[i]) for i in pending),
+        "output_chars": sum(len(summaries[i]) for i in pending if isinstance(summaries[i], str)),
+        "failed": sum(isinstance(summaries[i], SummarizationError) for i in pending),
+        "duration_ms": (time.perf_counter() - start) * 1000,
+    })
+    return summaries
+
+def ordinal(n: int) -> str:
+    if 10 <= n % 100 <= 20:
+        suffix = "th"
+    else:
+        suffix = {1: "st", 2: "nd", 3: "rd"}.get(n % 10, "th")
+    return f"{n}{suffix}"
 
 async def send_notification(db, user, message, type="info"):
     from crud import create_notification
-    return await create_notification(db, user, message, type)
\ No newline at end of file
+    return await create_notification(db, user, message, type)
@@ -0,0 +1,49 @@
+import asyncio
+import logging
+import os
+import threading
+from database import engine
+
+logger = logging.getLogger(__name__)
+
+class WorkerRuntime:
+    """
+    One long-lived event loop per worker process, running in a background thread.
+
+    Celery tasks are synchronous; they hand their coroutine to run(), which blocks until it
+    finishes. Because the loop outlives individual tasks, the async engine's pooled
+    connections are reused across jobs instead of being rebuilt for every task.
+    """
+
+    def __init__(self):
+        self._loop = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            # A forked child inherits the object but not the loop thread.
+            if self._loop is None or self._pid != os.getpid():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="worker-runtime", daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+                logger.info(f"Worker runtime event loop started in process {self._pid}")
+            return self._loop
+
+    def run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop()).result()
+
+    def shutdown(self):
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid():
+                return
+            loop = self._loop
+            self._loop = None
+        asyncio.run_coroutine_threadsafe(engine.dispose(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        self._thread.join(timeout=5)
+        loop.close()
+
+runtime = WorkerRuntime()
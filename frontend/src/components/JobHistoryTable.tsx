@@ -18,6 +18,15 @@ import {
 } from "@/components/ui/dialog";
 import { Button } from "@/components/ui/button";
 import { FileText, FileOutput } from "lucide-react";
+import api from "@/lib/api";
+
+interface JobListItem {
+  id: number;
+  status: string;
+  created_at: string;
+  input_preview: string;
+  output_preview?: string;
+}
 
 interface Job {
   id: number;
@@ -28,16 +37,29 @@ interface Job {
 }
 
 interface JobHistoryTableProps {
-  jobs: Job[];
+  jobs: JobListItem[];
   isLoading: boolean;
+  hasMore?: boolean;
+  isLoadingMore?: boolean;
+  onLoadMore?: () => void;
 }
 
 export default function JobHistoryTable({
   jobs,
   isLoading,
+  hasMore,
+  isLoadingMore,
+  onLoadMore,
 }: JobHistoryTableProps) {
   const [selectedJob, setSelectedJob] = useState<Job | null>(null);
 
+  // The list only carries previews; the full text is fetched when a job is opened.
+  const openJob = async (id: number) => {
+    setSelectedJob(null);
+    const { data } = await api.get(`/jobs/${id}`);
+    setSelectedJob(data);
+  };
+
   const convertDate = (date: any) => {
     let updatedData = date.split("-");
     let [y, m, d] = updatedData;
@@ -125,14 +147,14 @@ export default function JobHistoryTable({
                     {" "}
                     {convertDate(job.created_at.slice(0, 10))}
                   </TableCell>
-                  <TableCell title={job.input_text}>
-                    {job.input_text.slice(0, 50)}
-                    {job.input_text.length > 50 ? "..." : ""}
+                  <TableCell title={job.input_preview}>
+                    {job.input_preview.slice(0, 50)}
+                    {job.input_preview.length > 50 ? "..." : ""}
                   </TableCell>
                   <TableCell>
-                    {job.status === "completed" && job.output_text ? (
-                      job.output_text.slice(0, 50) +
-                      (job.output_text.length > 50 ? "..." : "")
+                    {job.status === "completed" && job.output_preview ? (
+                      job.output_preview.slice(0, 50) +
+                      (job.output_preview.length > 50 ? "..." : "")
                     ) : (
                       <span className="italic text-gray-400">{job.status}</span>
                     )}
@@ -144,7 +166,7 @@ export default function JobHistoryTable({
                           variant="outline"
                           size="sm"
                           className="text-primary1 hover:text-primary2 border-primary1 hover:border-primary2 transition-colors duration-200"
-                          onClick={() => setSelectedJob(job)}
+                          onClick={() => openJob(job.id)}
                         >
                           View Details
                         </Button>
@@ -214,6 +236,18 @@ export default function JobHistoryTable({
           </TableBody>
         </Table>
       </ScrollArea>
+      {hasMore && (
+        <div className="mt-4 flex justify-center">
+          <Button
+            variant="outline"
+            className="text-primary1 border-primary1 hover:text-primary2 hover:border-primary2"
+            onClick={onLoadMore}
+            disabled={isLoadingMore}
+          >
+            {isLoadingMore ? "Loading..." : "Load older jobs"}
+          </Button>
+        </div>
+      )}
     </div>
   );
 }
@@ -0,0 +1,50 @@
+import { useEffect, useState } from "react";
+import { useQueryClient } from "react-query";
+import api from "@/lib/api";
+
+export type ServerEvent =
+  | { type: "job"; job: { id: number; status: string } }
+  | { type: "jobs"; jobs: { ids: number[]; status: string } }
+  | { type: "notification"; notification: { id: number; message: string } };
+
+/**
+ * Subscribes to the backend's /events stream and refetches the given
+ * react-query keys whenever an event of a matching type arrives.
+ * Returns whether the stream is connected, so callers can fall back to polling.
+ */
+export function useEvents(
+  token: string | null,
+  invalidate: Partial<Record<ServerEvent["type"], string>>,
+  onEvent?: (event: ServerEvent) => void
+) {
+  const queryClient = useQueryClient();
+  const [connected, setConnected] = useState(false);
+
+  useEffect(() => {
+    if (!token) return;
+    const url = new URL("/events", api.defaults.baseURL);
+    url.searchParams.set("token", token);
+    const source = new EventSource(url.toString());
+
+    const handle = (message: MessageEvent) => {
+      const event = JSON.parse(message.data) as ServerEvent;
+      const key = invalidate[event.type];
+      if (key) queryClient.invalidateQueries(key);
+      onEvent?.(event);
+    };
+
+    source.onopen = () => setConnected(true);
+    source.onerror = () => setConnected(false);
+    source.addEventListener("job", handle as EventListener);
+    source.addEventListener("jobs", handle as EventListener);
+    source.addEventListener("notification", handle as EventListener);
+
+    return () => {
+      source.close();
+      setConnected(false);
+    };
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [token, queryClient]);
+
+  return connected;
+}
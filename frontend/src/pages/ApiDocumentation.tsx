@@ -131,6 +131,24 @@ export default function APIDocumentation() {
                   .
                 </p>
               </li>
+              <li>
+                <strong>GET /credits/transactions</strong>: Shows the user’s
+                credit ledger, newest first. Submitting a job reserves its cost
+                right away; when the job finishes the reservation is settled, or
+                refunded if the job failed.
+                <p className="mt-1">
+                  <strong>Sample Output:</strong>
+                </p>
+                <pre className="p-2 bg-gray-50 rounded-lg border border-gray-200 text-gray-700">
+                  {`{
+  "items": [
+    {"id": 3, "job_id": 1, "kind": "settle", "amount": 0, "balance_after": 90, "created_at": "2025-04-07T10:00:05"},
+    {"id": 2, "job_id": 1, "kind": "reserve", "amount": -10, "balance_after": 90, "created_at": "2025-04-07T10:00:00"}
+  ],
+  "next_cursor": null
+}`}
+                </pre>
+              </li>
             </ul>
             <h3 className="text-lg font-semibold text-primary1 mt-4 mb-2">
               Job Submission and History
@@ -187,63 +205,125 @@ export default function APIDocumentation() {
                 </p>
               </li>
               <li>
-                <strong>GET /jobs/my</strong>: Shows all the user’s past jobs.
+                <strong>POST /jobs/batch</strong>: Submits many texts at once.
+                All jobs are saved in one go and their credits are reserved
+                together, so either the whole batch is accepted or none of it.
+                <p className="mt-1">
+                  <strong>Sample Input:</strong>
+                </p>
+                <pre className="p-2 bg-gray-50 rounded-lg border border-gray-200 text-gray-700">
+                  {`{
+  "jobs": [
+    {"input_text": "First document...", "profile": "fast"},
+    {"input_text": "Second document..."}
+  ]
+}`}
+                </pre>
                 <p className="mt-1">
                   <strong>Sample Output:</strong>
                 </p>
                 <pre className="p-2 bg-gray-50 rounded-lg border border-gray-200 text-gray-700">
-                  {`[
-  {
-    "id": 1,
-    "status": "completed",
-    "created_at": "2025-04-25T10:00:00Z",
-    "input_text": "Climate change is a major issue affecting the planet...",
-    "output_text": "Climate change causes rising temperatures, melting ice caps, and higher sea levels..."
-  },
-  {
-    "id": 2,
-    "status": "pending",
-    "created_at": "2025-04-25T10:05:00Z",
-    "input_text": "Technology is advancing rapidly, with AI playing a big role...",
-    "output_text": null
-  }
-]`}
+                  {`{
+  "job_ids": [7, 8],
+  "credits_reserved": 14,
+  "credits_remaining": 86
+}`}
                 </pre>
                 <p className="mt-1">
-                  If the user has no jobs, it returns an empty list:{" "}
-                  <code>[]</code>. It needs the user’s token to make sure they
-                  only see their own jobs.
+                  For very large uploads, <code>POST /jobs/batch/ndjson</code>{" "}
+                  takes the same job objects one per line.
                 </p>
               </li>
+              <li>
+                <strong>GET /jobs/&#123;job_id&#125;/stream</strong>: Follows a
+                job submitted with <code>"stream": true</code> (fast profile
+                only) as the summary is written. Each <code>token</code> event
+                has the new piece and the text so far; a final{" "}
+                <code>done</code> event has the finished job, including{" "}
+                <code>ttft_ms</code>, the milliseconds until the first piece.
+                Pass the token as <code>?token=</code>.
+                <pre className="p-2 bg-gray-50 rounded-lg border border-gray-200 text-gray-700">
+                  {`event: token
+data: {"id": 9, "delta": " Climate", "text": "Climate"}
+
+event: done
+data: {"id": 9, "status": "completed", "output_text": "Climate change ...", "ttft_ms": 42.5, ...}`}
+                </pre>
+              </li>
+              <li>
+                <strong>GET /jobs/my</strong>: Shows the user’s jobs, newest
+                first, 20 at a time (<code>?limit=</code> up to 100). Only the
+                first 100 characters of the input and summary are included.
+                Filter with <code>?status=completed</code> and get the next page
+                with <code>?cursor=</code> set to <code>next_cursor</code>.
+                <p className="mt-1">
+                  <strong>Sample Output:</strong>
+                </p>
+                <pre className="p-2 bg-gray-50 rounded-lg border border-gray-200 text-gray-700">
+                  {`{
+  "items": [
+    {
+      "id": 2,
+      "status": "pending",
+      "created_at": "2025-04-25T10:05:00Z",
+      "input_preview": "Technology is advancing rapidly, with AI playing a big role...",
+      "output_preview": null
+    },
+    {
+      "id": 1,
+      "status": "completed",
+      "created_at": "2025-04-25T10:00:00Z",
+      "input_preview": "Climate change is a major issue affecting the planet...",
+      "output_preview": "Climate change causes rising temperatures, melting ice caps..."
+    }
+  ],
+  "next_cursor": null
+}`}
+                </pre>
+                <p className="mt-1">
+                  If the user has no jobs, <code>items</code> is an empty list.
+                  It needs the user’s token to make sure they only see their own
+                  jobs.
+                </p>
+              </li>
+              <li>
+                <strong>GET /jobs/id</strong>: Returns one job with its full
+                input and summary text, e.g. <code>/jobs/1</code>.
+              </li>
             </ul>
             <h3 className="text-lg font-semibold text-primary1 mt-4 mb-2">
               Notifications
             </h3>
             <ul className="list-disc pl-5 text-gray-700">
               <li>
-                <strong>GET /notifications</strong>: Shows all notifications for
-                the user.
+                <strong>GET /notifications</strong>: Shows the user’s
+                notifications, newest first, 20 at a time. Add{" "}
+                <code>?unread_only=true</code> for unread ones and page with{" "}
+                <code>?cursor=</code> like <code>/jobs/my</code>.
                 <p className="mt-1">
                   <strong>Sample Output:</strong>
                 </p>
                 <pre className="p-2 bg-gray-50 rounded-lg border border-gray-200 text-gray-700">
-                  {`[
-  {
-    "id": 1,
-    "message": "Job 1 completed successfully",
-    "is_read": false,
-    "created_at": "2025-04-25T10:00:00Z"
-  },
-  {
-    "id": 2,
-    "message": "Job 2 failed to process",
-    "is_read": false,
-    "created_at": "2025-04-25T10:05:00Z"
-  }
-]`}
+                  {`{
+  "items": [
+    {
+      "id": 2,
+      "message": "Job 2 failed to process",
+      "is_read": false,
+      "created_at": "2025-04-25T10:05:00Z"
+    },
+    {
+      "id": 1,
+      "message": "Job 1 completed successfully",
+      "is_read": false,
+      "created_at": "2025-04-25T10:00:00Z"
+    }
+  ],
+  "next_cursor": null
+}`}
                 </pre>
                 <p className="mt-1">
-                  If there are no notifications, it returns: <code>[]</code>. It
+                  If there are no notifications, <code>items</code> is empty. It
                   needs the user’s token in the header.
                 </p>
               </li>
@@ -267,6 +347,22 @@ export default function APIDocumentation() {
                   <code>{'{ "detail": "Notification not found" }'}</code>.
                 </p>
               </li>
+              <li>
+                <strong>GET /events?token=...</strong>: A Server-Sent Events
+                stream of the user’s job and notification updates, so the pages
+                refresh as soon as something changes instead of polling.
+                <p className="mt-1">
+                  <strong>Sample Output:</strong>
+                </p>
+                <pre className="p-2 bg-gray-50 rounded-lg border border-gray-200 text-gray-700">
+                  {`event: job
+data: {"type": "job", "job": {"id": 1, "user_job_number": 1, "status": "completed", "profile": "quality"}}`}
+                </pre>
+                <p className="mt-1">
+                  The token goes in the query string because browsers can’t set
+                  headers on an <code>EventSource</code>.
+                </p>
+              </li>
             </ul>
             <h3 className="text-lg font-semibold text-primary1 mt-4 mb-2">
               Why I Designed the API This Way
@@ -1,6 +1,6 @@
 import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card";
 import { Alert, AlertDescription } from "@/components/ui/alert";
-import { useQuery, useMutation } from "react-query";
+import { useInfiniteQuery, useMutation } from "react-query";
 import { useAuth } from "@/App";
 import JobSubmissionForm from "@/components/JobSubmissionForm";
 import JobHistoryTable from "@/components/JobHistoryTable";
@@ -8,13 +8,19 @@ import api from "@/lib/api";
 import { toast } from "react-toastify";
 import { useState } from "react";
 import { FileText } from "lucide-react";
+import { useEvents } from "@/hooks/use-events";
 
-interface Job {
+interface JobListItem {
   id: number;
   status: string;
   created_at: string;
-  input_text: string;
-  output_text?: string;
+  input_preview: string;
+  output_preview?: string;
+}
+
+interface JobPage {
+  items: JobListItem[];
+  next_cursor: string | null;
 }
 
 export default function JobsPage() {
@@ -22,14 +28,18 @@ export default function JobsPage() {
   const [summary, setSummary] = useState<string | null>(null);
   const [error, setError] = useState<string>("");
   const { login } = useAuth();
+  // Job updates are pushed over /events; poll slowly only while the stream is down.
+  const streaming = useEvents(token, { job: "jobs", jobs: "jobs" });
 
-  const jobsQuery = useQuery<Job[], Error>(
+  // Newest jobs first, 20 per page; older pages are fetched with the previous page's next_cursor.
+  const jobsQuery = useInfiniteQuery<JobPage, Error>(
     ["jobs", token],
-    async () => {
+    async ({ pageParam }) => {
       const { data } = await api.get("/jobs/my", {
+        params: { limit: 20, cursor: pageParam },
         headers: { Authorization: `Bearer ${token}` },
       });
-      let processing = data.some(
+      let processing = data.items.some(
         (item: any) => item.status == "pending" || item.status == "processing"
       );
       if (!processing) {
@@ -39,7 +49,8 @@ export default function JobsPage() {
       return data;
     },
     {
-      refetchInterval: 5000,
+      getNextPageParam: (lastPage) => lastPage.next_cursor ?? undefined,
+      refetchInterval: streaming ? false : 30000,
       onError: (err: any) => {
         toast.error(
           err?.response?.data?.detail ||
@@ -76,7 +87,7 @@ export default function JobsPage() {
           setError("Your job is processing. Please check back soon.");
         }
         toast.success(
-          "Job submitted successfully. Credits will be deducted upon completion.",
+          "Job submitted successfully. Its credits are reserved and refunded if the job fails.",
           {
             position: "top-right",
             autoClose: 3000,
@@ -167,8 +178,11 @@ export default function JobsPage() {
         </CardContent>
       </Card>
       <JobHistoryTable
-        jobs={jobsQuery.data || []}
+        jobs={jobsQuery.data?.pages.flatMap((page) => page.items) || []}
         isLoading={jobsQuery.isLoading}
+        hasMore={jobsQuery.hasNextPage}
+        isLoadingMore={jobsQuery.isFetchingNextPage}
+        onLoadMore={() => jobsQuery.fetchNextPage()}
       />
     </div>
   );
@@ -1,11 +1,13 @@
 import { Card, CardHeader, CardTitle, CardContent } from "@/components/ui/card";
 import { Skeleton } from "@/components/ui/skeleton";
-import { useQuery, useMutation } from "react-query";
+import { Button } from "@/components/ui/button";
+import { useInfiniteQuery, useMutation } from "react-query";
 import { useAuth } from "@/App";
 import api from "@/lib/api";
 import NotificationItem from "@/components/NotificationItem";
 import { toast } from "react-toastify";
 import { Bell } from "lucide-react";
+import { useEvents } from "@/hooks/use-events";
 
 interface Notification {
   id: number;
@@ -15,19 +17,29 @@ interface Notification {
   created_at: string;
 }
 
+interface NotificationPage {
+  items: Notification[];
+  next_cursor: string | null;
+}
+
 export default function NotificationsPage() {
   const { token } = useAuth();
+  // New notifications are pushed over /events; poll slowly only while the stream is down.
+  const streaming = useEvents(token, { notification: "notifications" });
 
-  const notificationsQuery = useQuery<Notification[], Error>(
+  // Newest first, 50 per page; older pages are fetched with the previous page's next_cursor.
+  const notificationsQuery = useInfiniteQuery<NotificationPage, Error>(
     ["notifications", token],
-    async () => {
+    async ({ pageParam }) => {
       const { data } = await api.get("/notifications", {
+        params: { limit: 50, cursor: pageParam },
         headers: { Authorization: `Bearer ${token}` },
       });
       return data;
     },
     {
-      refetchInterval: 5000,
+      getNextPageParam: (lastPage) => lastPage.next_cursor ?? undefined,
+      refetchInterval: streaming ? false : 30000,
       onError: (err: any) => {
         toast.error(
           err?.response?.data?.detail ||
@@ -88,6 +100,9 @@ export default function NotificationsPage() {
     }
   );
 
+  const notifications =
+    notificationsQuery.data?.pages.flatMap((page) => page.items) || [];
+
   return (
     <div>
       <h1 className="text-3xl font-bold mb-6 text-primary1 flex items-center gap-2">
@@ -108,21 +123,32 @@ export default function NotificationsPage() {
               ))}
             </div>
           )}
-          {!notificationsQuery.isLoading &&
-            (!notificationsQuery.data ||
-              notificationsQuery.data.length === 0) && (
-              <p className="text-gray-500 text-center py-4">
-                No notifications available yet.
-              </p>
-            )}
-          {notificationsQuery.data &&
-            notificationsQuery.data.map((notification) => (
-              <NotificationItem
-                key={notification.id}
-                notification={notification}
-                onMarkAsRead={(id) => markAsReadMutation.mutate(id)}
-              />
-            ))}
+          {!notificationsQuery.isLoading && notifications.length === 0 && (
+            <p className="text-gray-500 text-center py-4">
+              No notifications available yet.
+            </p>
+          )}
+          {notifications.map((notification) => (
+            <NotificationItem
+              key={notification.id}
+              notification={notification}
+              onMarkAsRead={(id) => markAsReadMutation.mutate(id)}
+            />
+          ))}
+          {notificationsQuery.hasNextPage && (
+            <div className="mt-4 flex justify-center">
+              <Button
+                variant="outline"
+                className="text-primary1 border-primary1 hover:text-primary2 hover:border-primary2"
+                onClick={() => notificationsQuery.fetchNextPage()}
+                disabled={notificationsQuery.isFetchingNextPage}
+              >
+                {notificationsQuery.isFetchingNextPage
+                  ? "Loading..."
+                  : "Load older notifications"}
+              </Button>
+            </div>
+          )}
         </CardContent>
       </Card>
     </div>